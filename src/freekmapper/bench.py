@@ -0,0 +1,417 @@
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from .cache import cache_dir
+from .image_cache import IMAGE_CACHE
+from .latency import LatencyStats
+from .memory_manager import MemoryManager
+from .sequencer import Sequencer
+from .show_clock import EventScheduler, ManualClock, ShowClock
+from .show_file import SHOW_EXTENSION, load_config, save_show
+from .slot_cache import PreparedConfig, diff_surfaces
+from .video_source import open_source
+
+BENCH_VERSION = 1
+CLIP_SIZE = (1280, 720)
+CLIP_FPS = 30
+CANVAS = (1920, 1080)
+DECODER_COUNTS = (1, 2, 4, 8)
+SURFACE_COUNTS = (1, 10, 50, 100, 200)
+
+
+# --------- SYNTHETIC MEDIA --------- #
+def _pattern(w, h, i):
+    """Moving gradients plus a frame counter, so consecutive frames really differ."""
+    x = np.arange(w, dtype=np.uint16)
+    y = np.arange(h, dtype=np.uint16)[:, None]
+    frame = np.empty((h, w, 3), dtype=np.uint8)
+    frame[..., 0] = (x * 255 // w + i * 4) % 256
+    frame[..., 1] = (y * 255 // h + i * 2) % 256
+    frame[..., 2] = ((x + y) * 255 // (w + h) + i) % 256
+    cv2.putText(frame, str(i), (w // 10, h // 2), cv2.FONT_HERSHEY_SIMPLEX, h / 200, (255, 255, 255), max(h // 100, 1))
+    return frame
+
+
+def make_clip(path, seconds, size=CLIP_SIZE, fps=CLIP_FPS, fourcc="MJPG"):
+    w, h = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (w, h))
+    if not writer.isOpened():
+        raise IOError(f"cv2.VideoWriter can't write {fourcc} to {path}")
+    for i in range(int(seconds * fps)):
+        writer.write(_pattern(w, h, i))
+    writer.release()
+    return path
+
+
+def make_still(path, size):
+    if not cv2.imwrite(path, _pattern(size[0], size[1], 0)):
+        raise IOError(f"Could not write {path}")
+    return path
+
+
+def generate_media(directory, clips=4, clip_seconds=2.0):
+    """Synthetic clips and stills in `directory` (reused if already there)."""
+    os.makedirs(directory, exist_ok=True)
+    media = {"clips": [], "still": os.path.join(directory, "still.png")}
+    for n in range(clips):
+        path = os.path.join(directory, f"clip_{n}_{int(clip_seconds * 1000)}ms.avi")
+        if not os.path.exists(path):
+            make_clip(path, clip_seconds)
+        media["clips"].append(path)
+    if not os.path.exists(media["still"]):
+        make_still(media["still"], CANVAS)
+    return media
+
+
+def rss_bytes():
+    """Current resident set size (peak size where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def grid_points(n, canvas=CANVAS):
+    """Corner points of `n` surfaces laid out in a grid over the canvas."""
+    cols = math.ceil(math.sqrt(n))
+    rows = math.ceil(n / cols)
+    w, h = canvas[0] / cols, canvas[1] / rows
+    points = []
+    for i in range(n):
+        x, y = (i % cols) * w, (i // cols) * h
+        points.append(np.array([[x, y], [x + w, y], [x + w, y + h], [x, y + h]], dtype=np.float32))
+    return points
+
+
+# --------- DECODE --------- #
+def bench_decode(clip, counts=DECODER_COUNTS, seconds=3.0):
+    """Decode throughput with 1..N sources driven by a manual clock (one frame per source per step)."""
+    results = []
+    for n in counts:
+        clock = ManualClock()
+        sources = [open_source(clip, loop=True, clock=clock) for _ in range(n)]
+        step = 1.0 / sources[0].fps
+        frames = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            now = clock.advance(step)
+            for vs in sources:
+                before = vs.current_frame
+                vs.read_frame(now)
+                if vs.current_frame is not before:
+                    frames += 1
+        elapsed = time.perf_counter() - start
+        for vs in sources:
+            vs.release()
+        fps = frames / elapsed
+        results.append({
+            "sources": n,
+            "frames": frames,
+            "fps_total": fps,
+            "fps_per_source": fps / n,
+            "realtime_streams": fps / CLIP_FPS,
+        })
+    return results
+
+
+# --------- GL --------- #
+def open_gl_window(width, height):
+    """Hidden GLFW window with a current context (use xvfb-run + LIBGL_ALWAYS_SOFTWARE=1 for llvmpipe)."""
+    import glfw
+    if not glfw.init():
+        raise RuntimeError("GLFW init failed (no display?)")
+    glfw.window_hint(glfw.VISIBLE, glfw.FALSE)
+    window = glfw.create_window(width, height, "freekmapper-bench", None, None)
+    if not window:
+        glfw.terminate()
+        raise RuntimeError("Could not create a GL context")
+    glfw.make_context_current(window)
+    glfw.swap_interval(0)
+    return window
+
+
+def gl_info():
+    from OpenGL.GL import glGetString, GL_RENDERER, GL_VERSION
+    return {"renderer": glGetString(GL_RENDERER).decode(), "version": glGetString(GL_VERSION).decode()}
+
+
+def bench_upload(size=CLIP_SIZE, uploads=240):
+    """Texture upload throughput for alternating frames of `size` (every acquire uploads)."""
+    from OpenGL.GL import glFinish
+    from .texture_manager import TextureManager
+
+    textures = TextureManager(name="bench")
+    frames = [_pattern(size[0], size[1], 0), _pattern(size[0], size[1], 1)]
+    stats = LatencyStats(uploads)
+    start = time.perf_counter()
+    for i in range(uploads):
+        t0 = time.perf_counter()
+        textures.begin_frame()
+        textures.acquire("bench", frames[i % 2])
+        glFinish()
+        textures.end_frame()
+        stats.record((time.perf_counter() - t0) * 1000.0)
+    elapsed = time.perf_counter() - start
+    textures.clear()
+    nbytes = frames[0].nbytes * uploads
+    return dict(stats.summary(), width=size[0], height=size[1], mb_per_s=nbytes / (1024 * 1024) / elapsed)
+
+
+def bench_render(window, still, counts=SURFACE_COUNTS, frames=120):
+    """Frame time (draw + glFinish) of the output renderer versus surface count."""
+    import glfw
+    from OpenGL.GL import glFinish
+    from .renderers import GLFullscreenRenderer
+
+    frame = IMAGE_CACHE.get(still)
+    width, height = glfw.get_framebuffer_size(window)
+    results = []
+    for n in counts:
+        surfaces = [
+            {"points": pts, "opacity": 1.0, "name": f"S{i}", "video_id": None,
+             "media_type": "image", "media_path": still, "static_frame": frame}
+            for i, pts in enumerate(grid_points(n))
+        ]
+        renderer = GLFullscreenRenderer(surfaces, lambda s, i: s["static_frame"],
+                                        canvas_width=CANVAS[0], canvas_height=CANVAS[1])
+        renderer.edit_mode = False
+        stats = LatencyStats(frames)
+        for i in range(frames + 10):
+            t0 = time.perf_counter()
+            renderer.draw(width, height)
+            glFinish()
+            glfw.swap_buffers(window)
+            if i >= 10:  # Skip the first upload / shader compile
+                stats.record((time.perf_counter() - t0) * 1000.0)
+        renderer.textures.clear()
+        summary = stats.summary()
+        results.append(dict(summary, surfaces=n, fps=1000.0 / summary["p50_ms"] if summary["p50_ms"] else None))
+    return results
+
+
+# --------- CONFIG SWITCH --------- #
+def _show_config(paths):
+    points = grid_points(len(paths))
+    return {
+        "surfaces": [
+            {"points": points[i], "opacity": 1.0, "name": f"S{i}", "media_path": path}
+            for i, path in enumerate(paths)
+        ],
+        "playback_mode": "concurrent",
+        "sequence_steps": [],
+        "continuous_surfaces": [],
+    }
+
+
+def bench_switch(clips, directory, runs=10):
+    """Config switch latency, cold (parse + open) versus prepared ahead like a Control Panel slot.
+
+    The two shows alternate between different clips (plus a shared still),
+    so every switch opens new sources.
+    """
+    still = os.path.join(directory, "still.png")
+    half = max(len(clips) // 2, 1)
+    shows = []
+    for name, paths in (("a", clips[:half]), ("b", clips[half:] or clips[:half])):
+        path = os.path.join(directory, f"switch_{name}{SHOW_EXTENSION}")
+        save_show(path, _show_config(list(paths) + [still]), media={})
+        shows.append(path)
+
+    surfaces, sources = [], {}
+
+    def apply(config, prepared=None):
+        new_surfaces, new_sources = diff_surfaces(surfaces, config["surfaces"], prepared)
+        sources.update(new_sources)
+        surfaces[:] = new_surfaces
+        in_use = {s["video_id"] for s in surfaces if s.get("video_id")}
+        for vid in [vid for vid in sources if vid not in in_use]:
+            sources.pop(vid).release()
+        if prepared is not None:
+            prepared.discard()
+
+    results = {}
+    for mode in ("cold", "prepared"):
+        stats = LatencyStats(runs * 2)
+        for run in range(runs * 2):
+            path = shows[run % 2]
+            prepared = None
+            if mode == "prepared":
+                prepared = PreparedConfig(path)
+                prepared.prepare()  # Done before the trigger, like a slot warmed in the background
+            t0 = time.perf_counter()
+            apply(prepared.config if prepared else load_config(path), prepared)
+            stats.record((time.perf_counter() - t0) * 1000.0)
+        results[mode] = stats.summary()
+    for vs in sources.values():
+        vs.release()
+    return results
+
+
+# --------- LONG SEQUENTIAL RUN --------- #
+def bench_sequence(clips, seconds=60.0, surface_count=24, fps=60):
+    """Sequential show over `surface_count` surfaces: cue stall times, transition delays and RSS growth."""
+    clock = ShowClock()
+    scheduler = EventScheduler()
+    surfaces, sources, steps = [], {}, []
+    for i, pts in enumerate(grid_points(surface_count)):
+        path = clips[i % len(clips)]
+        vid = f"video_{i}"
+        sources[vid] = open_source(path, loop=True, clock=clock)
+        surfaces.append({"points": pts, "opacity": 1.0, "name": f"S{i}", "video_id": vid,
+                         "media_type": "video", "media_path": path, "static_frame": None})
+        transition = {"type": "crossfade", "duration": 0.5} if i % 2 else {"type": "cut"}
+        steps.append({"surface_index": i, "media_path": path, "media_type": "video", "transition": transition})
+
+    sequencer = Sequencer(surfaces, sources, clock, scheduler)
+    sequencer.mode = "sequential"
+    sequencer.steps = steps
+    memory = MemoryManager()
+    sequencer.reset()
+
+    cue_stats = LatencyStats(1000)
+    delay_stats = LatencyStats(1000)
+    last_report = None
+    samples = []
+    period = 1.0 / fps
+    start = time.perf_counter()
+    next_sample = next_memory = 0.0
+    while True:
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            break
+        now = clock.now()
+        sequencer.update(now)
+        t0 = time.perf_counter()
+        if scheduler.run_due(now):
+            cue_stats.record((time.perf_counter() - t0) * 1000.0)
+        for vs in list(sources.values()):
+            vs.read_frame(now)
+        report = sequencer.last_transition_report
+        if report is not None and report is not last_report:
+            delay_stats.record(report["start_delay_ms"])
+            last_report = report
+        if elapsed >= next_memory:
+            memory.update(sequencer, surfaces, sources)
+            next_memory = elapsed + 0.5
+        if elapsed >= next_sample:
+            samples.append([round(elapsed, 1), rss_bytes() / (1024 * 1024)])
+            next_sample = elapsed + 1.0
+        time.sleep(max(period - (time.perf_counter() - start - elapsed), 0.0))
+
+    sequencer.cancel_pending()
+    memory.shutdown()
+    for vs in list(sources.values()):
+        vs.release()
+    mb = [m for _, m in samples]
+    return {
+        "seconds": seconds,
+        "surfaces": surface_count,
+        "cue_stall": cue_stats.summary(),
+        "transition_delay": delay_stats.summary(),
+        "memory": {
+            "start_mb": mb[0],
+            "end_mb": mb[-1],
+            "max_mb": max(mb),
+            "growth_mb": mb[-1] - mb[0],
+            "evictions": memory.evictions,
+            "samples": samples,
+        },
+    }
+
+
+# --------- CLI --------- #
+def _run(results, name, func, *args, **kwargs):
+    print(f"[{name}] running...", flush=True)
+    try:
+        results[name] = func(*args, **kwargs)
+    except Exception as e:
+        print(f"[{name}] failed: {e}")
+        results[name] = {"error": str(e)}
+
+
+def _version():
+    try:
+        from importlib.metadata import version
+        return version("freekmapper")
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="freekmapper-bench", description="Headless freekmapper benchmarks")
+    parser.add_argument("--out", default="freekmapper-bench.json", help="JSON results file")
+    parser.add_argument("--media", default=None, help="directory for the synthetic media (default: cache)")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of the long sequential run")
+    parser.add_argument("--quick", action="store_true", help="short runs (smoke test)")
+    parser.add_argument("--no-gl", action="store_true", help="skip the upload and render benchmarks")
+    args = parser.parse_args(argv)
+
+    quick = args.quick
+    directory = args.media or cache_dir("bench")
+    media = generate_media(directory, clip_seconds=1.0 if quick else 2.0)
+    results = {}
+
+    _run(results, "decode", bench_decode, media["clips"][0], seconds=1.0 if quick else 3.0)
+    gl = {"skipped": "--no-gl"}
+    if not args.no_gl:
+        try:
+            window = open_gl_window(*CANVAS)
+            gl = gl_info()
+        except Exception as e:
+            window = None
+            gl = {"skipped": str(e)}
+            print(f"GL benchmarks skipped: {e}")
+        if window is not None:
+            _run(results, "upload", bench_upload, uploads=60 if quick else 240)
+            _run(results, "render", bench_render, window, media["still"], frames=30 if quick else 120)
+            import glfw
+            glfw.destroy_window(window)
+            glfw.terminate()
+    _run(results, "switch", bench_switch, media["clips"], directory, runs=3 if quick else 10)
+    _run(results, "sequence", bench_sequence, media["clips"], seconds=min(args.duration, 10.0) if quick else args.duration)
+
+    data = {
+        "version": BENCH_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "freekmapper": _version(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "gl": gl,
+        "quick": quick,
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(data, f, indent=2)
+
+    for row in results.get("decode", []) if isinstance(results.get("decode"), list) else []:
+        print(f"decode  {row['sources']:>3} sources: {row['fps_total']:.0f} fps ({row['realtime_streams']:.1f} real-time streams)")
+    if "mb_per_s" in results.get("upload", {}):
+        print(f"upload  {results['upload']['mb_per_s']:.0f} MB/s")
+    for row in results.get("render", []) if isinstance(results.get("render"), list) else []:
+        print(f"render  {row['surfaces']:>3} surfaces: p50 {row['p50_ms']:.2f} ms, p95 {row['p95_ms']:.2f} ms")
+    for mode, summary in results.get("switch", {}).items():
+        if isinstance(summary, dict):
+            print(f"switch  {mode:<8}: p50 {summary['p50_ms']:.1f} ms, max {summary['max_ms']:.1f} ms")
+    seq = results.get("sequence", {})
+    if "memory" in seq:
+        stall = seq["cue_stall"] or {}
+        print(f"cues    stall p95 {stall.get('p95_ms', 0):.1f} ms; RSS {seq['memory']['start_mb']:.0f} -> "
+              f"{seq['memory']['end_mb']:.0f} MB over {seq['seconds']:.0f} s")
+    print(f"Results written to {args.out}")
+    return 1 if any(isinstance(r, dict) and "error" in r for r in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
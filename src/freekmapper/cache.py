@@ -0,0 +1,17 @@
+import hashlib
+import os
+
+
+def cache_dir(name):
+    """Per-user cache directory for derived media data (created on demand)."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    path = os.path.join(base, "freekmapper", name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def media_key(path, *extra):
+    """Cache key for a media file: changes whenever the file is modified or replaced."""
+    st = os.stat(path)
+    raw = "|".join([os.path.abspath(path), str(st.st_mtime_ns), str(st.st_size)] + [str(e) for e in extra])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
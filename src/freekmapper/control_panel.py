@@ -2,13 +2,23 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
 
+from .show_file import SHOW_EXTENSION
+
 class LiveControlPanel(tk.Toplevel):
-    def __init__(self, master, load_config_callback, toggle_blackout_callback=None):
+    def __init__(self, master, load_config_callback, toggle_blackout_callback=None, scheduler=None, clock=None, jump_callback=None, prepare_callback=None, forget_callback=None):
         super().__init__(master)
         self.title("Live Control Panel")
         self.geometry("400x500")
         self.load_config_callback = load_config_callback
         self.toggle_blackout_callback = toggle_blackout_callback
+        # Loop steps are show-clock events (no after() chaining drift)
+        self.scheduler = scheduler
+        self.clock = clock
+        self.loop_event = None
+        self.jump_callback = jump_callback
+        # Assigned configs are parsed and their media pre-warmed ahead of GO
+        self.prepare_callback = prepare_callback
+        self.forget_callback = forget_callback  # Releases a config no slot holds any more
         
         self.config_slots = [None] * 5 # Paths for slots 1-5
         self.loop_active = False
@@ -16,6 +26,8 @@ class LiveControlPanel(tk.Toplevel):
         self.loop_slots = [] # Indices of slots to loop
         
         self.setup_ui()
+        # Closing the window must run destroy() below (Tk's default bypasses it)
+        self.protocol("WM_DELETE_WINDOW", self.destroy)
         
     def setup_ui(self):
         ttk.Label(self, text="Live Config Switcher", font=("Arial", 12, "bold")).pack(pady=10)
@@ -63,6 +75,18 @@ class LiveControlPanel(tk.Toplevel):
         self.loop_btn = ttk.Button(loop_frame, text="Start Loop", command=self.toggle_loop)
         self.loop_btn.pack(side=tk.RIGHT)
         
+        # Timestamp Cue
+        if self.jump_callback:
+            jump_frame = ttk.LabelFrame(self, text="Jump To", padding=10)
+            jump_frame.pack(fill=tk.X, padx=10, pady=5)
+            ttk.Label(jump_frame, text="Time (sec):").pack(side=tk.LEFT)
+            self.jump_entry = ttk.Entry(jump_frame, width=7)
+            self.jump_entry.insert(0, "0")
+            self.jump_entry.pack(side=tk.LEFT, padx=5)
+            self.jump_btn = ttk.Button(jump_frame, text="Jump", command=self.trigger_jump)
+            self.jump_btn.pack(side=tk.RIGHT)
+            self.slot_btns.append(self.jump_btn)
+        
         # Show Control
         self.show_enabled = True
         self.show_btn = ttk.Button(self, text="Disable Show", command=self.toggle_show)
@@ -71,6 +95,19 @@ class LiveControlPanel(tk.Toplevel):
         self.status_lbl = ttk.Label(self, text="Ready", foreground="gray")
         self.status_lbl.pack(pady=10)
 
+    def destroy(self):
+        # Scheduled loop steps would otherwise outlive the window
+        self.loop_active = False
+        if self.loop_event is not None:
+            self.loop_event.cancel()
+            self.loop_event = None
+        # The slots go with the window: release their pre-warmed decoders
+        if self.forget_callback:
+            for path in set(self.config_slots) - {None}:
+                self.forget_callback(path)
+        self.config_slots = [None] * len(self.config_slots)
+        super().destroy()
+
     def toggle_show(self):
         self.show_enabled = not self.show_enabled
         
@@ -113,11 +150,20 @@ class LiveControlPanel(tk.Toplevel):
         if not self.show_enabled: return
         filename = filedialog.askopenfilename(
             title=f"Assign Config to Slot {idx+1}",
-            filetypes=[("NumPy files", "*.npy"), ("All files", "*.*")],
+            filetypes=[
+                ("Show files", "*" + SHOW_EXTENSION),
+                ("Legacy NumPy configs", "*.npy"),
+                ("All files", "*.*"),
+            ],
         )
         if filename:
+            old = self.config_slots[idx]
             self.config_slots[idx] = filename
+            if old and old not in self.config_slots and self.forget_callback:
+                self.forget_callback(old)
             self.slot_frames[idx].config(text=f"Slot {idx+1}: {os.path.basename(filename)}")
+            if self.prepare_callback:
+                self.prepare_callback(filename)
 
     def trigger_slot(self, idx):
         if not self.show_enabled: return
@@ -129,11 +175,24 @@ class LiveControlPanel(tk.Toplevel):
         else:
             messagebox.showwarning("Empty Slot", f"Slot {idx+1} is empty")
 
+    def trigger_jump(self):
+        if not self.show_enabled: return
+        try:
+            seconds = max(float(self.jump_entry.get()), 0.0)
+        except ValueError:
+            messagebox.showwarning("Invalid Time", "Enter the time in seconds")
+            return
+        self.jump_callback(seconds)
+        self.status_lbl.config(text=f"Jumped to {seconds:.2f}s", foreground="green")
+
     def toggle_loop(self):
         if not self.show_enabled: return
         
         if self.loop_active:
             self.loop_active = False
+            if self.loop_event is not None:
+                self.loop_event.cancel()
+                self.loop_event = None
             self.loop_btn.config(text="Start Loop")
             self.status_lbl.config(text="Loop Stopped", foreground="red")
         else:
@@ -154,7 +213,7 @@ class LiveControlPanel(tk.Toplevel):
             self.status_lbl.config(text="Loop Running...", foreground="green")
             self.run_loop_step()
 
-    def run_loop_step(self):
+    def run_loop_step(self, due=None):
         if not self.loop_active:
             return
         
@@ -163,4 +222,10 @@ class LiveControlPanel(tk.Toplevel):
         
         self.current_loop_index = (self.current_loop_index + 1) % len(self.loop_slots)
         
-        self.after(int(self.loop_duration), self.run_loop_step)
+        if self.scheduler is not None:
+            # Anchor the next step to when this one was due, not when it ran
+            if due is None:
+                due = self.clock.now()
+            self.loop_event = self.scheduler.schedule(due + self.loop_duration / 1000.0, self.run_loop_step)
+        else:
+            self.after(int(self.loop_duration), self.run_loop_step)
@@ -0,0 +1,110 @@
+"""Per-surface effects: colour correction, chroma key and blur, run on the GPU.
+
+surface["effects"] is None or a dict of settings; missing keys are at identity:
+
+    brightness     added to r, g, b                      0.0   (-1..1)
+    contrast       scale around mid grey                 1.0   (0..4)
+    saturation     0 = grey                              1.0   (0..4)
+    hue            rotation in degrees                   0.0   (-180..180)
+    gamma          output = input ** (1 / gamma)         1.0   (0.1..5)
+    blur           gaussian radius in media pixels       0.0   (0..64)
+    key_color      [r, g, b] 0..1 keyed out              [0, 1, 0]
+    key_threshold  chroma distance fully keyed           0.0   (0 = no key)
+    key_softness   width of the edge above it            0.1
+
+The renderers (renderers.EffectChain) run only the passes whose settings
+differ from identity, in the order of EFFECT_PASSES, so a surface without
+effects costs nothing. Like masks, the dict is replaced rather than edited
+in place, and a surface's effect output is only redrawn when its frame or
+its effects object changes.
+"""
+import math
+
+import numpy as np
+
+EFFECT_DEFAULTS = {
+    "brightness": 0.0,
+    "contrast": 1.0,
+    "saturation": 1.0,
+    "hue": 0.0,
+    "gamma": 1.0,
+    "blur": 0.0,
+    "key_color": (0.0, 1.0, 0.0),
+    "key_threshold": 0.0,
+    "key_softness": 0.1,
+}
+EFFECT_RANGES = {
+    "brightness": (-1.0, 1.0),
+    "contrast": (0.0, 4.0),
+    "saturation": (0.0, 4.0),
+    "hue": (-180.0, 180.0),
+    "gamma": (0.1, 5.0),
+    "blur": (0.0, 64.0),
+    "key_threshold": (0.0, 1.0),
+    "key_softness": (0.0, 1.0),
+}
+# Key on the source colours, correct what is left, then blur (separably)
+EFFECT_PASSES = ("key", "color", "blur_x", "blur_y")
+COLOR_SETTINGS = ("brightness", "contrast", "saturation", "hue", "gamma")
+LUMA = np.array([0.2126, 0.7152, 0.0722])  # Rec. 709
+
+
+def effect_value(effects, name):
+    value = (effects or {}).get(name)
+    return EFFECT_DEFAULTS[name] if value is None else value
+
+
+def effect_passes(effects):
+    """Names of the passes `effects` needs, in order; empty at identity."""
+    if not effects:
+        return ()
+    passes = []
+    if effect_value(effects, "key_threshold") > 0.0:
+        passes.append("key")
+    if any(effect_value(effects, name) != EFFECT_DEFAULTS[name] for name in COLOR_SETTINGS):
+        passes.append("color")
+    if effect_value(effects, "blur") >= 0.5:
+        passes += ["blur_x", "blur_y"]
+    return tuple(passes)
+
+
+def set_effect(effects, name, value):
+    """Effects with `name` set to `value` (clamped): a new dict, the same one if unchanged, or None if all default."""
+    if name == "key_color":
+        value = tuple(min(max(float(v), 0.0), 1.0) for v in value)
+        if len(value) != 3:
+            raise ValueError("key_color must be r, g, b")
+        current = tuple(effect_value(effects, name))
+    elif name in EFFECT_RANGES:
+        lo, hi = EFFECT_RANGES[name]
+        value = min(max(float(value), lo), hi)
+        current = effect_value(effects, name)
+    else:
+        raise ValueError(f"Unknown effect '{name}'")
+    if current == value:
+        return effects
+    updated = dict(effects or {}, **{name: value})
+    if value == EFFECT_DEFAULTS[name]:
+        del updated[name]  # Keep only what differs from the defaults
+    return updated or None
+
+
+def color_matrix(hue, saturation):
+    """3x3 RGB matrix rotating hue (degrees) around the grey axis and scaling saturation."""
+    grey = np.tile(LUMA, (3, 1))
+    # Rotation about the grey (1, 1, 1) axis (Rodrigues): greys stay put, hues turn
+    angle = math.radians(hue)
+    k = np.array([[0.0, -1.0, 1.0], [1.0, 0.0, -1.0], [-1.0, 1.0, 0.0]]) / math.sqrt(3.0)
+    rotation = np.eye(3) + math.sin(angle) * k + (1.0 - math.cos(angle)) * (k @ k)
+    return (grey + saturation * (np.eye(3) - grey)) @ rotation
+
+
+def parse_color(text):
+    """'#00ff00' or '0,1,0' -> (r, g, b) in 0..1."""
+    text = text.strip()
+    if text.startswith("#") and len(text) == 7:
+        return tuple(int(text[i:i + 2], 16) / 255.0 for i in (1, 3, 5))
+    values = tuple(float(v) for v in text.replace(" ", "").split(","))
+    if len(values) != 3:
+        raise ValueError("Colour must be #rrggbb or r,g,b")
+    return values
@@ -0,0 +1,363 @@
+from collections import OrderedDict
+
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.GL import shaders
+
+from .effects import color_matrix, effect_value
+
+# ==========================
+# Surface shader (PyOpenGL, compatibility profile)
+# ==========================
+# The renderers submit quads with glBegin/glEnd and grid meshes from VBOs via
+# client arrays, so the shaders use GLSL 1.20 built-ins (gl_MultiTexCoord0,
+# gl_TexCoord) which work in both the pyopengltk and the GLFW context.
+
+SURFACE_VERTEX_SHADER = """
+#version 120
+varying vec2 canvas_pos;
+void main() {
+    canvas_pos = gl_Vertex.xy;  // GL canvas coordinates (homography input)
+    gl_TexCoord[0] = gl_MultiTexCoord0;
+    gl_TexCoord[1] = gl_MultiTexCoord1;  // Surface UV (mask lookup; differs from [0] on pyramid tiles)
+    gl_Position = gl_ModelViewProjectionMatrix * gl_Vertex;
+}
+"""
+
+# Two layers (outgoing A, incoming B) blended by mix_amount.
+# A missing layer counts as fully transparent, so a surface with only A fades
+# out and a surface with only B fades in. Output is premultiplied alpha.
+# Quads are warped per pixel: `homography` maps the canvas position to the
+# surface UV, and tex_rect selects the part of it the bound texture covers
+# (a pyramid tile). Meshes and the fallback use interpolated texcoords.
+# The surface mask scales coverage (rgba); the output's edge blend scales
+# light only (rgb), so overlapping surfaces are attenuated as a whole.
+SURFACE_FRAGMENT_SHADER = """
+#version 120
+uniform sampler2D tex_a;
+uniform sampler2D tex_b;
+uniform sampler2D mask_tex;
+uniform sampler2D blend_tex;
+uniform float has_a;
+uniform float has_b;
+uniform float has_mask;
+uniform float has_blend;
+uniform vec2 viewport_size;
+uniform float use_homography;
+uniform mat3 homography;
+uniform vec4 tex_rect;  // u0, v0, u1, v1 of the texture within the surface
+varying vec2 canvas_pos;
+uniform float mix_amount;
+uniform float opacity;
+uniform int mode;  // 0 = crossfade, 1 = dissolve
+
+float hash(vec2 p) {
+    return fract(sin(dot(p, vec2(12.9898, 78.233))) * 43758.5453);
+}
+
+void main() {
+    vec2 uv = gl_TexCoord[0].st;
+    vec2 surface_uv = gl_TexCoord[1].st;
+    if (use_homography > 0.5) {
+        vec3 h = homography * vec3(canvas_pos, 1.0);
+        surface_uv = h.xy / h.z;
+        uv = (surface_uv - tex_rect.xy) / (tex_rect.zw - tex_rect.xy);
+    }
+    vec4 a = texture2D(tex_a, uv) * has_a;
+    vec4 b = texture2D(tex_b, uv) * has_b;
+    vec4 c;
+    if (mode == 1) {
+        c = hash(floor(gl_FragCoord.xy)) < mix_amount ? b : a;
+    } else {
+        c = mix(a, b, mix_amount);
+    }
+    c *= opacity * mix(1.0, texture2D(mask_tex, surface_uv).r, has_mask);
+    c.rgb *= mix(1.0, texture2D(blend_tex, gl_FragCoord.xy / viewport_size).r, has_blend);
+    gl_FragColor = c;
+}
+"""
+
+TRANSITION_MODES = {"cut": 0, "crossfade": 0, "dissolve": 1}
+MASK_UNIT = 2  # Texture units of the surface mask and the output edge blend
+BLEND_UNIT = 3
+
+
+class SurfaceProgram:
+    """Compiled surface shader for the current GL context."""
+
+    def __init__(self):
+        self.program = shaders.compileProgram(
+            shaders.compileShader(SURFACE_VERTEX_SHADER, GL_VERTEX_SHADER),
+            shaders.compileShader(SURFACE_FRAGMENT_SHADER, GL_FRAGMENT_SHADER),
+        )
+        self.locations = {
+            name: glGetUniformLocation(self.program, name)
+            for name in (
+                "tex_a", "tex_b", "mask_tex", "blend_tex", "has_a", "has_b", "has_mask", "has_blend",
+                "viewport_size", "use_homography", "homography", "tex_rect", "mix_amount", "opacity", "mode",
+            )
+        }
+        glUseProgram(self.program)
+        glUniform1i(self.locations["tex_a"], 0)
+        glUniform1i(self.locations["tex_b"], 1)
+        glUniform1i(self.locations["mask_tex"], MASK_UNIT)
+        glUniform1i(self.locations["blend_tex"], BLEND_UNIT)
+        glUniform1f(self.locations["has_blend"], 0.0)
+        glUniform2f(self.locations["viewport_size"], 1.0, 1.0)
+        glUseProgram(0)
+
+    def set_blend(self, blend_tex, width, height):
+        """Bind an output's edge-blend texture (None = no blend) for the rest of the frame."""
+        glActiveTexture(GL_TEXTURE0 + BLEND_UNIT)
+        glBindTexture(GL_TEXTURE_2D, blend_tex or 0)
+        glActiveTexture(GL_TEXTURE0)
+        glUseProgram(self.program)
+        glUniform1f(self.locations["has_blend"], 1.0 if blend_tex else 0.0)
+        glUniform2f(self.locations["viewport_size"], float(width), float(height))
+        glUseProgram(0)
+
+    def use(self, has_a, has_b, mix_amount, opacity, mode="crossfade", has_mask=False, homography=None, tex_rect=(0.0, 0.0, 1.0, 1.0)):
+        """Bind the program for one draw; `homography` is a 3x3 GL position -> surface UV matrix (or None)."""
+        loc = self.locations
+        glUseProgram(self.program)
+        glUniform1f(loc["use_homography"], 1.0 if homography is not None else 0.0)
+        if homography is not None:
+            glUniformMatrix3fv(loc["homography"], 1, GL_TRUE, homography)
+            glUniform4f(loc["tex_rect"], *tex_rect)
+        glUniform1f(loc["has_a"], 1.0 if has_a else 0.0)
+        glUniform1f(loc["has_b"], 1.0 if has_b else 0.0)
+        glUniform1f(loc["has_mask"], 1.0 if has_mask else 0.0)
+        glUniform1f(loc["mix_amount"], mix_amount)
+        glUniform1f(loc["opacity"], opacity)
+        glUniform1i(loc["mode"], TRANSITION_MODES.get(mode, 0))
+        # Shader writes premultiplied alpha
+        glBlendFunc(GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
+
+    def release(self):
+        glUseProgram(0)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+
+def create_surface_program():
+    """Compile the surface shader, or return None if the driver can't (fixed-function fallback)."""
+    try:
+        return SurfaceProgram()
+    except Exception as e:
+        print(f"Surface shader unavailable, falling back to fixed-function: {e}")
+        return None
+
+
+# ==========================
+# Generator shaders (shader_source.ShaderSource)
+# ==========================
+# Drawn as a full-target quad straight in clip space, so the renderer's
+# matrices don't matter; `uv` runs 0..1 across the texture.
+GENERATOR_VERTEX_SHADER = """
+#version 120
+varying vec2 uv;
+void main() {
+    uv = gl_MultiTexCoord0.st;
+    gl_Position = gl_Vertex;
+}
+"""
+GENERATOR_PROGRAM_CACHE = 32  # Compiled generator programs kept per context group (hot reload adds one per edit)
+
+
+class GeneratorPrograms:
+    """Compiled generator shaders of one context group, keyed by the hash of their source.
+
+    A source that fails to compile is reported once and cached as failed;
+    the texture key it was meant for keeps its last working program, so a
+    bad edit during hot reload leaves the previous version on screen.
+    """
+
+    def __init__(self, size=GENERATOR_PROGRAM_CACHE):
+        self.size = size
+        self.programs = OrderedDict()  # digest -> (program, {uniform: location}) or None if it failed
+        self.current = {}  # texture key -> digest of its last working program
+
+    def get(self, key, frame):
+        """(program, locations) to draw `frame` (a ShaderFrame) into `key`, or None."""
+        if frame.digest not in self.programs:
+            self.programs[frame.digest] = self._compile(frame.code)
+            self._trim()
+        self.programs.move_to_end(frame.digest)
+        entry = self.programs[frame.digest]
+        if entry is not None:
+            self.current[key] = frame.digest
+            return entry
+        return self.programs.get(self.current.get(key))
+
+    def _compile(self, code):
+        try:
+            program = shaders.compileProgram(
+                shaders.compileShader(GENERATOR_VERTEX_SHADER, GL_VERTEX_SHADER),
+                shaders.compileShader(code, GL_FRAGMENT_SHADER),
+            )
+        except Exception as e:
+            print(f"Generator shader failed to compile: {e}")
+            return None
+        return program, {}
+
+    def _trim(self):
+        # Programs drawn every frame are always the most recently used
+        while len(self.programs) > self.size:
+            _, entry = self.programs.popitem(last=False)
+            if entry is not None:
+                glDeleteProgram(entry[0])
+
+    def use(self, entry, time, width, height, params):
+        """Bind a program with its uniforms set (unknown or unused uniforms are ignored)."""
+        program, locations = entry
+        glUseProgram(program)
+        values = dict(params, time=time)
+        for name, value in values.items():
+            if name not in locations:
+                locations[name] = glGetUniformLocation(program, name)
+            if locations[name] != -1:
+                glUniform1f(locations[name], value)
+        if "resolution" not in locations:
+            locations["resolution"] = glGetUniformLocation(program, "resolution")
+        if locations["resolution"] != -1:
+            glUniform2f(locations["resolution"], float(width), float(height))
+
+    def clear(self):
+        for entry in self.programs.values():
+            if entry is not None:
+                glDeleteProgram(entry[0])
+        self.programs.clear()
+        self.current.clear()
+
+
+# ==========================
+# Effect passes (effects.py, renderers.EffectChain)
+# ==========================
+# Each pass reads `source` and writes a texture of the same size (drawn with
+# the generator vertex shader). Output is premultiplied alpha, like the
+# surface shader expects: the key pass makes it transparent, the others keep it.
+EFFECT_FRAGMENT_SHADERS = {
+    "key": """
+#version 120
+uniform sampler2D source;
+uniform vec3 key_color;
+uniform float threshold;
+uniform float softness;
+varying vec2 uv;
+
+vec2 chroma(vec3 c) {  // CbCr (BT.601): independent of brightness, so shadows on the screen key too
+    return vec2(dot(c, vec3(-0.169, -0.331, 0.5)), dot(c, vec3(0.5, -0.419, -0.081)));
+}
+
+void main() {
+    vec4 c = texture2D(source, uv);
+    float d = distance(chroma(c.rgb), chroma(key_color));
+    gl_FragColor = c * smoothstep(threshold, threshold + softness, d);
+}
+""",
+    "color": """
+#version 120
+uniform sampler2D source;
+uniform mat3 color_matrix;  // hue and saturation (effects.color_matrix)
+uniform float brightness;
+uniform float contrast;
+uniform float gamma;
+varying vec2 uv;
+
+void main() {
+    vec4 c = texture2D(source, uv);
+    vec3 rgb = c.a > 0.0 ? c.rgb / c.a : vec3(0.0);
+    rgb = color_matrix * rgb;
+    rgb = (rgb - 0.5) * contrast + 0.5 + brightness;
+    rgb = pow(clamp(rgb, 0.0, 1.0), vec3(1.0 / gamma));
+    gl_FragColor = vec4(rgb * c.a, c.a);
+}
+""",
+    "blur": """
+#version 120
+uniform sampler2D source;
+uniform vec2 texel_step;  // One tap along the blur direction, in texture coordinates
+uniform float sigma;  // In taps
+varying vec2 uv;
+
+void main() {
+    vec4 sum = vec4(0.0);
+    float total = 0.0;
+    for (int i = -BLUR_TAPS; i <= BLUR_TAPS; i++) {
+        float x = float(i);
+        float w = exp(-0.5 * x * x / (sigma * sigma));
+        sum += texture2D(source, uv + texel_step * x) * w;
+        total += w;
+    }
+    gl_FragColor = sum / total;
+}
+""",
+}
+BLUR_TAPS = 16  # Taps each side; wider blurs space them out (linear filtering fills in between)
+EFFECT_UNIFORMS = {
+    "key": ("key_color", "threshold", "softness"),
+    "color": ("color_matrix", "brightness", "contrast", "gamma"),
+    "blur": ("texel_step", "sigma"),
+}
+
+
+class EffectPrograms:
+    """Compiled effect pass shaders of one context group, compiled on first use.
+
+    A pass that fails to compile is reported once and skipped from then on.
+    """
+
+    def __init__(self):
+        self.programs = {}  # shader name -> (program, {uniform: location}) or None if it failed
+
+    def get(self, name):
+        """(program, locations) of pass `name` (blur_x and blur_y share one shader), or None."""
+        shader = name.partition("_")[0]
+        if shader not in self.programs:
+            self.programs[shader] = self._compile(shader)
+        return self.programs[shader]
+
+    def _compile(self, name):
+        code = EFFECT_FRAGMENT_SHADERS[name].replace("BLUR_TAPS", str(BLUR_TAPS))
+        try:
+            program = shaders.compileProgram(
+                shaders.compileShader(GENERATOR_VERTEX_SHADER, GL_VERTEX_SHADER),
+                shaders.compileShader(code, GL_FRAGMENT_SHADER),
+            )
+        except Exception as e:
+            print(f"Effect shader '{name}' failed to compile, skipping it: {e}")
+            return None
+        locations = {u: glGetUniformLocation(program, u) for u in ("source",) + EFFECT_UNIFORMS[name]}
+        glUseProgram(program)
+        glUniform1i(locations["source"], 0)
+        glUseProgram(0)
+        return program, locations
+
+    def use(self, entry, name, effects, width, height):
+        """Bind pass `name` with its uniforms set from `effects`, for a source of width x height pixels."""
+        program, loc = entry
+        glUseProgram(program)
+        if name == "key":
+            glUniform3f(loc["key_color"], *effect_value(effects, "key_color"))
+            glUniform1f(loc["threshold"], effect_value(effects, "key_threshold"))
+            glUniform1f(loc["softness"], max(effect_value(effects, "key_softness"), 1e-3))
+        elif name == "color":
+            matrix = color_matrix(effect_value(effects, "hue"), effect_value(effects, "saturation"))
+            glUniformMatrix3fv(loc["color_matrix"], 1, GL_TRUE, matrix.astype(np.float32))
+            glUniform1f(loc["brightness"], effect_value(effects, "brightness"))
+            glUniform1f(loc["contrast"], effect_value(effects, "contrast"))
+            glUniform1f(loc["gamma"], effect_value(effects, "gamma"))
+        else:
+            # Sigma of radius / 2 pixels; taps spread out once the radius exceeds BLUR_TAPS
+            radius = effect_value(effects, "blur")
+            spacing = max(radius / BLUR_TAPS, 1.0)
+            if name == "blur_x":
+                glUniform2f(loc["texel_step"], spacing / width, 0.0)
+            else:
+                glUniform2f(loc["texel_step"], 0.0, spacing / height)
+            glUniform1f(loc["sigma"], max(radius / 2.0 / spacing, 0.5))
+
+    def clear(self):
+        for entry in self.programs.values():
+            if entry is not None:
+                glDeleteProgram(entry[0])
+        self.programs.clear()
@@ -0,0 +1,161 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import cv2
+
+from .cache import media_key
+from .image_pyramid import image_size
+
+IMAGE_CACHE_BUDGET = 512 * 1024 * 1024  # Bytes of decoded RGB frames
+MAX_SIZE = 1280
+
+
+REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def decode_image(path, max_size=MAX_SIZE):
+    """imread -> fit into max_size -> RGB, or None if the file can't be read.
+
+    Large stills are decoded at 1/2, 1/4 or 1/8 scale when that still covers
+    max_size (JPEG decodes at reduced scale directly), so a 16k image never
+    has to sit in RAM at full resolution.
+    """
+    flag = cv2.IMREAD_COLOR
+    size = image_size(path, decode_fallback=False)
+    if size is not None:
+        for factor, reduced in REDUCED_FLAGS:
+            if max(size) // factor >= max_size:
+                flag = reduced
+                break
+    img = cv2.imread(path, flag)
+    if img is None:
+        return None
+    h, w = img.shape[:2]
+    if w > max_size or h > max_size:
+        scale = max_size / max(w, h)
+        new_w, new_h = int(w * scale), int(h * scale)
+        img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    frame = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    frame.setflags(write=False)  # Shared between surfaces, steps and configs
+    return frame
+
+
+class ImageCache:
+    """Decoded still images shared by every user, LRU-evicted to a byte budget.
+
+    Entries are keyed by path + mtime + size + target size, so an edited file
+    is decoded again. Frames are read-only numpy arrays: the same object is
+    handed to every surface showing the image, which also lets the renderers
+    skip re-uploading it.
+    """
+
+    def __init__(self, budget=IMAGE_CACHE_BUDGET, workers=2):
+        self.budget = budget
+        self.workers = workers
+        self.pool = None
+        self.frames = OrderedDict()  # key -> frame, least recently used first
+        self.in_flight = {}  # key -> Future
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def _lookup(self, path, max_size):
+        """(key, frame or None, future to wait on or None, future to fill or None)."""
+        key = media_key(path, max_size)
+        with self.lock:
+            frame = self.frames.get(key)
+            if frame is not None:
+                self.frames.move_to_end(key)
+                self.hits += 1
+                return key, frame, None, None
+            self.misses += 1
+            future = self.in_flight.get(key)
+            if future is not None:
+                return key, None, future, None  # Someone is decoding it already
+            future = Future()
+            self.in_flight[key] = future
+            return key, None, None, future
+
+    def _decode(self, path, max_size, key, future):
+        try:
+            frame = decode_image(path, max_size)
+        except Exception as e:
+            with self.lock:
+                self.in_flight.pop(key, None)
+            future.set_exception(e)
+            return
+        with self.lock:
+            self.in_flight.pop(key, None)
+            if frame is not None:
+                self._store(key, frame)
+        future.set_result(frame)
+
+    def _store(self, key, frame):
+        self.frames[key] = frame
+        self.bytes += frame.nbytes
+        while self.bytes > self.budget and len(self.frames) > 1:
+            _, old = self.frames.popitem(last=False)
+            self.bytes -= old.nbytes
+            self.evictions += 1
+
+    def get(self, path, max_size=MAX_SIZE):
+        """Decoded RGB frame for `path` (decoding on this thread on a miss), or None."""
+        try:
+            key, frame, waiting, future = self._lookup(path, max_size)
+        except OSError:
+            return None
+        if frame is not None:
+            return frame
+        if waiting is not None:
+            return waiting.result()
+        self._decode(path, max_size, key, future)
+        return future.result()
+
+    def load_async(self, path, max_size=MAX_SIZE):
+        """Future resolving to the frame (or None); already done on a cache hit."""
+        try:
+            key, frame, waiting, future = self._lookup(path, max_size)
+        except OSError:
+            done = Future()
+            done.set_result(None)
+            return done
+        if frame is not None:
+            done = Future()
+            done.set_result(frame)
+            return done
+        if waiting is not None:
+            return waiting
+        with self.lock:
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-decode")
+        self.pool.submit(self._decode, path, max_size, key, future)
+        return future
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.frames),
+                "bytes": self.bytes,
+                "budget": self.budget,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else None,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.frames.clear()
+            self.bytes = 0
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+
+
+# Shared by surfaces, sequence steps and prepared configs
+IMAGE_CACHE = ImageCache()
@@ -0,0 +1,172 @@
+import json
+import math
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from .cache import cache_dir, media_key
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow reads sizes from the header; without it a 1/8 scale decode is used
+    Image = None
+
+PYRAMID_VERSION = 1
+TILE_SIZE = 512
+LARGE_IMAGE_SIZE = 2048  # Stills with a longer side than this get a tile pyramid
+
+
+def image_size(path, decode_fallback=True):
+    """(width, height) of a still without a full decode, or None if unknown/unreadable."""
+    if Image is not None:
+        try:
+            with Image.open(path) as img:
+                return img.size
+        except Exception:
+            return None
+    if not decode_fallback:
+        return None
+    img = cv2.imread(path, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if img is None:
+        return None
+    return img.shape[1] * 8, img.shape[0] * 8  # Approximate (rounded to 8 px)
+
+
+class ImagePyramid:
+    """Mip levels of a still, cut into TILE_SIZE tiles stored as raw .npy (memory-mapped on use).
+
+    Level 0 is full resolution; each further level halves it, down to a
+    single tile.
+    """
+
+    def __init__(self, directory, manifest):
+        self.directory = directory
+        self.width = manifest["width"]
+        self.height = manifest["height"]
+        self.tile_size = manifest["tile_size"]
+        self.levels = manifest["levels"]  # [{"width", "height", "cols", "rows"}]
+        self.key = os.path.basename(directory)
+
+    def level_for(self, footprint_w, footprint_h):
+        """Coarsest level that still has at least the on-screen resolution of the footprint."""
+        ratio = min(self.width / max(footprint_w, 1.0), self.height / max(footprint_h, 1.0))
+        if ratio <= 1.0:
+            return 0
+        return min(int(math.log2(ratio)), len(self.levels) - 1)
+
+    def tiles(self, level):
+        """(tx, ty, (u0, v0, u1, v1)) of every tile of a level, uv relative to the whole image."""
+        info = self.levels[level]
+        for ty in range(info["rows"]):
+            for tx in range(info["cols"]):
+                x0, y0 = tx * self.tile_size, ty * self.tile_size
+                x1 = min(x0 + self.tile_size, info["width"])
+                y1 = min(y0 + self.tile_size, info["height"])
+                yield tx, ty, (x0 / info["width"], y0 / info["height"], x1 / info["width"], y1 / info["height"])
+
+    def tile(self, level, tx, ty):
+        return np.load(os.path.join(self.directory, f"{level}_{ty}_{tx}.npy"), mmap_mode="r")
+
+
+def build_pyramid(path, directory, tile_size=TILE_SIZE):
+    """Decode `path` once and write its tiled mip levels to `directory`."""
+    img = cv2.imread(path, cv2.IMREAD_COLOR)
+    if img is None:
+        raise IOError(f"Could not read {path}")
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    height, width = img.shape[:2]
+
+    tmp = directory + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    levels = []
+    level = 0
+    while True:
+        h, w = img.shape[:2]
+        cols, rows = math.ceil(w / tile_size), math.ceil(h / tile_size)
+        for ty in range(rows):
+            for tx in range(cols):
+                tile = img[ty * tile_size:(ty + 1) * tile_size, tx * tile_size:(tx + 1) * tile_size]
+                np.save(os.path.join(tmp, f"{level}_{ty}_{tx}.npy"), np.ascontiguousarray(tile))
+        levels.append({"width": w, "height": h, "cols": cols, "rows": rows})
+        if max(w, h) <= tile_size:
+            break
+        img = cv2.resize(img, (max((w + 1) // 2, 1), max((h + 1) // 2, 1)), interpolation=cv2.INTER_AREA)
+        level += 1
+
+    manifest = {"version": PYRAMID_VERSION, "width": width, "height": height, "tile_size": tile_size, "levels": levels}
+    with open(os.path.join(tmp, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp, directory)
+    return ImagePyramid(directory, manifest)
+
+
+class PyramidCache:
+    """Builds pyramids for large stills in the background, once per file (path + mtime + size)."""
+
+    def __init__(self, workers=1):
+        self.workers = workers
+        self.pool = None
+        self.directory = None
+        self.pyramids = {}  # key -> ImagePyramid
+        self.paths = {}  # path -> key
+        self.in_flight = set()
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        """Pyramid for `path` if built (never blocks)."""
+        with self.lock:
+            key = self.paths.get(path)
+            return self.pyramids.get(key) if key else None
+
+    def request(self, path):
+        """Queue a build if `path` is a still larger than LARGE_IMAGE_SIZE."""
+        size = image_size(path) if path and os.path.isfile(path) else None
+        if size is None or max(size) <= LARGE_IMAGE_SIZE:
+            return
+        try:
+            key = media_key(path, TILE_SIZE)
+        except OSError:
+            return
+        with self.lock:
+            self.paths[path] = key
+            if key in self.pyramids or key in self.in_flight:
+                return
+            self.in_flight.add(key)
+            if self.pool is None:
+                self.directory = cache_dir("pyramids")
+                self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-pyramid")
+        self.pool.submit(self._load_or_build, path, key)
+
+    def _load_or_build(self, path, key):
+        pyramid = None
+        directory = os.path.join(self.directory, key)
+        try:
+            manifest_file = os.path.join(directory, "manifest.json")
+            if os.path.exists(manifest_file):
+                with open(manifest_file) as f:
+                    manifest = json.load(f)
+                if manifest.get("version") == PYRAMID_VERSION:
+                    pyramid = ImagePyramid(directory, manifest)
+            if pyramid is None:
+                pyramid = build_pyramid(path, directory)
+                print(f"Built {len(pyramid.levels)}-level tile pyramid for {os.path.basename(path)}")
+        except Exception as e:
+            print(f"Tile pyramid failed for {path}: {e}")
+        finally:
+            with self.lock:
+                self.in_flight.discard(key)
+                if pyramid is not None:
+                    self.pyramids[key] = pyramid
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+
+
+PYRAMIDS = PyramidCache()
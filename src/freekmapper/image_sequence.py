@@ -0,0 +1,344 @@
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from .image_cache import decode_image
+from .instrumentation import FRAME_STATS, source_name
+from .keyframe_index import SEEK_STATS
+from .show_clock import SHOW_CLOCK
+
+FRAME_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp')
+RAW_EXTENSION = '.npy'  # Uncompressed HxWx3 uint8 RGB frames, memory-mapped (no decode)
+SEQUENCE_SETTINGS = "sequence.json"  # Optional {"fps": 25, "drop_policy": "drop" | "hold"}
+DEFAULT_FPS = 25.0
+DROP_POLICIES = ("drop", "hold")
+
+
+def _natural_key(name):
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+
+def list_frames(folder):
+    """Frame files of a sequence folder in natural order (frame_9 before frame_10)."""
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return []
+    raw = [n for n in names if n.lower().endswith(RAW_EXTENSION)]
+    # A folder of raw frames wins over stray previews next to it
+    frames = raw or [n for n in names if n.lower().endswith(FRAME_EXTENSIONS)]
+    return [os.path.join(folder, n) for n in sorted(frames, key=_natural_key)]
+
+
+def is_image_sequence(path):
+    return bool(path) and os.path.isdir(path) and bool(list_frames(path))
+
+
+def sequence_settings(folder):
+    """Frame rate and drop policy from the folder's sequence.json (defaults if absent)."""
+    settings = {"fps": DEFAULT_FPS, "drop_policy": "drop"}
+    try:
+        with open(os.path.join(folder, SEQUENCE_SETTINGS)) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return settings
+    if isinstance(data.get("fps"), (int, float)) and data["fps"] > 0:
+        settings["fps"] = float(data["fps"])
+    if data.get("drop_policy") in DROP_POLICIES:
+        settings["drop_policy"] = data["drop_policy"]
+    return settings
+
+
+def load_frame(path, max_size=1280):
+    """RGB frame for one sequence file; raw .npy frames are memory-mapped, not copied."""
+    if path.lower().endswith(RAW_EXTENSION):
+        frame = np.load(path, mmap_mode="r")
+        if frame.ndim != 3 or frame.shape[2] != 3 or frame.dtype != np.uint8:
+            raise ValueError(f"{path}: raw frames must be HxWx3 uint8 RGB")
+        h, w = frame.shape[:2]
+        if w > max_size or h > max_size:
+            scale = max_size / max(w, h)
+            frame = cv2.resize(np.asarray(frame), (int(w * scale), int(h * scale)), interpolation=cv2.INTER_LINEAR)
+        return frame
+    frame = decode_image(path, max_size)
+    if frame is None:
+        raise IOError(f"Could not read {path}")
+    return frame
+
+
+class ImageSequenceSource:
+    """Folder of still frames played like a video (same interface as VideoSource).
+
+    Frames are decoded ahead of the play position on a worker pool into a
+    bounded ring of ring_size frames. The frame rate and drop policy come
+    from the folder's sequence.json unless given: "drop" skips frames that
+    aren't ready in time to stay on the show clock, "hold" shows every frame
+    and lets the sequence slip instead.
+    """
+
+    def __init__(self, folder, max_size=1280, loop=True, playing=True, clock=None, meta=None,
+                 fps=None, drop_policy=None, ring_size=8, workers=2):
+        self.filepath = folder
+        self.frames = list_frames(folder)
+        settings = sequence_settings(folder)
+        self.current_frame = None
+        self.playing = playing
+        self.loop = loop
+        self.finished = False
+        self.lock = threading.Lock()
+        self.max_size = max_size
+
+        self.clock = clock or SHOW_CLOCK
+        self.fps = fps or settings["fps"]
+        self.drop_policy = drop_policy or settings["drop_policy"]
+        self.frame_count = len(self.frames)
+        self.frame_index = 0  # Frames shown or skipped since the last rewind
+        self.start_time = self.clock.now()
+        self.dropped_frames = 0
+        self.late_frames = 0  # read_frame calls where the due frame wasn't decoded yet
+        self.timeline = None
+
+        self.ring_size = max(ring_size, 1)
+        self.ring = {}  # frame number -> Future
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-sequence")
+        self.waiting = False
+        self.blocking = False  # Wait for the due frame instead of holding (offline renders: same output every run)
+        self.suspended = False  # Ring and workers freed by the memory manager; restarted on use
+        name = source_name(folder)
+        self.stat_names = (f"lock_wait:{name}", f"decode:{name}", f"late:{name}", f"dropped:{name}")
+
+    # --- Prefetch ring --- #
+    def _window(self, start):
+        if self.frame_count <= 0:
+            return []
+        if self.loop:
+            return [(start + i) % self.frame_count for i in range(min(self.ring_size, self.frame_count))]
+        return list(range(start, min(start + self.ring_size, self.frame_count)))
+
+    def _prefetch(self, start):
+        """Keep the next ring_size frames from `start` queued or decoded; drop the rest."""
+        if self.pool is None:
+            return
+        wanted = set(self._window(start))
+        for n in list(self.ring):
+            if n not in wanted:
+                self.ring.pop(n).cancel()
+        for n in self._window(start):
+            if n not in self.ring:
+                self.ring[n] = self.pool.submit(self._load, self.frames[n])
+
+    def _load(self, path):
+        t0 = time.perf_counter()
+        frame = load_frame(path, self.max_size)
+        FRAME_STATS.record(self.stat_names[1], time.perf_counter() - t0)
+        return frame
+
+    def _take(self, n, wait):
+        """Frame number `n` from the ring (None if not decoded yet and not waiting)."""
+        if self.pool is None or not (0 <= n < self.frame_count):
+            return None
+        future = self.ring.get(n)
+        if future is None:
+            self._prefetch(n)
+            future = self.ring[n]
+        if not (wait or future.done()):
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"Image sequence frame failed: {e}")
+            self.ring.pop(n, None)
+            return self.current_frame
+
+    def _show(self, n, frame):
+        self.current_frame = frame
+        self.frame_index = n + 1
+        self._prefetch(self.frame_index)
+
+    # --- Playback --- #
+    def _synced(self):
+        return self.timeline is not None and self.loop
+
+    def _target_frames(self, now):
+        if self._synced():
+            return int(self.timeline.position(now) * self.fps) + 1
+        return int((now - self.start_time) * self.fps) + 1
+
+    def read_frame(self, now=None):
+        """Show the frame due at `now` if it has been decoded (or once it is, when blocking); called from the reader thread."""
+        lock_stage, _, late_counter, dropped_counter = self.stat_names
+        t0 = time.perf_counter()
+        with self.lock:
+            FRAME_STATS.record(lock_stage, time.perf_counter() - t0)
+            self.waiting = False
+            if self.pool is None or not self.playing or self.finished or self.frame_count <= 0:
+                return self.current_frame
+
+            now = self.clock.now() if now is None else now
+            target = self._target_frames(now)
+            if self._synced():
+                target = min(target, self.frame_count)  # Hold the last frame until the group wraps
+                if target < self.frame_index - 1:
+                    self.frame_index = 0  # Group wrapped
+            elif target > self.frame_count:
+                if not self.loop:
+                    self.finished = True
+                    self.playing = False
+                    return self.current_frame
+                passes = (target - 1) // self.frame_count
+                self.start_time += passes * self.frame_count / self.fps
+                self.frame_index = 0
+                target = self._target_frames(now)
+
+            if target <= self.frame_index:
+                return self.current_frame  # Early: hold
+
+            n = self.frame_index if self.drop_policy == "hold" else target - 1
+            frame = self._take(n, wait=self.blocking)
+            if frame is None:
+                # Not decoded yet: keep the current frame and retry shortly
+                self.late_frames += 1
+                FRAME_STATS.count(late_counter)
+                self.waiting = True
+                self._prefetch(self.frame_index)
+                return self.current_frame
+
+            self.dropped_frames += max(n - self.frame_index, 0)
+            if n > self.frame_index:
+                FRAME_STATS.count(dropped_counter, n - self.frame_index)
+            if self.drop_policy == "hold" and not self._synced() and target - 1 > n:
+                self.start_time = now - n / self.fps  # Slip instead of skipping
+            self._show(n, frame)
+            return self.current_frame
+
+    def seek(self, seconds, index=None, start_time=None):
+        """Show the frame at `seconds` (every frame is a keyframe, so this is one decode)."""
+        t0 = time.perf_counter()
+        with self.lock:
+            self._resume()
+            if self.pool is None or self.frame_count <= 0:
+                return self.current_frame
+            n = min(max(int(round(seconds * self.fps)), 0), self.frame_count - 1)
+            frame = self._take(n, wait=True)
+            if frame is not None:
+                self._show(n, frame)
+            self.finished = False
+            now = self.clock.now() if start_time is None else start_time
+            self.start_time = now - max(self.frame_index - 1, 0) / self.fps
+            frame = self.current_frame
+        SEEK_STATS.record((time.perf_counter() - t0) * 1000.0, True)
+        return frame
+
+    def next_due(self):
+        if not self.playing or self.finished:
+            return None
+        if self.waiting:
+            return self.clock.now() + 0.002  # Poll the ring until the late frame lands
+        if self._synced():
+            return None
+        return self.start_time + self.frame_index / self.fps
+
+    def prime(self):
+        """Decode the first frame without starting playback (pre-buffering)."""
+        with self.lock:
+            self._resume()
+            if self.frame_index > 0:
+                return self.current_frame
+            frame = self._take(0, wait=True)
+            if frame is not None:
+                self._show(0, frame)
+            return self.current_frame
+
+    def end_time(self):
+        if self.frame_count <= 0:
+            return None
+        return self.start_time + self.frame_count / self.fps
+
+    def remaining_time(self, now=None):
+        end = self.end_time()
+        if end is None:
+            return None
+        now = self.clock.now() if now is None else now
+        return max(end - now, 0.0)
+
+    def get_current_frame(self):
+        with self.lock:
+            return self.current_frame
+
+    def play(self, start_time=None):
+        with self.lock:
+            self._resume()
+            now = self.clock.now() if start_time is None else start_time
+            if self.finished:
+                self.finished = False
+                self.frame_index = 0
+                self._prefetch(0)
+            if not self.playing or start_time is not None:
+                self.start_time = now - max(self.frame_index - 1, 0) / self.fps
+            self.playing = True
+
+    def pause(self):
+        with self.lock:
+            self.playing = False
+
+    def stop(self):
+        with self.lock:
+            self.playing = False
+            self.finished = False
+            self.frame_index = 0
+            self._prefetch(0)
+
+    def is_finished(self):
+        with self.lock:
+            return self.finished
+
+    def suspend(self):
+        """Free the prefetch ring and workers of an idle sequence; the next play/seek/prime restarts it."""
+        with self.lock:
+            if self.pool is None:
+                return
+            self._shutdown_pool()
+            self.current_frame = None
+            self.playing = False
+            self.finished = False
+            self.frame_index = 0
+            self.suspended = True
+
+    def _resume(self):
+        if self.suspended:
+            self.suspended = False
+            self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-sequence")
+
+    def memory_usage(self):
+        """Bytes held by this source: decoded frames in the ring (memory-mapped raw frames are not counted)."""
+        with self.lock:
+            frames = [self.current_frame]
+            frames += [f.result() for f in self.ring.values() if f.done() and not f.cancelled() and f.exception() is None]
+            seen = set()
+            total = 0
+            for frame in frames:
+                if frame is None or id(frame) in seen or isinstance(frame, np.memmap):
+                    continue
+                seen.add(id(frame))
+                total += frame.nbytes
+            return {"decoder": 0, "frames": total, "open": self.pool is not None}
+
+    def _shutdown_pool(self):
+        for future in self.ring.values():
+            future.cancel()
+        self.ring.clear()
+        self.pool.shutdown(wait=False)
+        self.pool = None
+
+    def release(self):
+        with self.lock:
+            self.suspended = False
+            if self.pool is not None:
+                self._shutdown_pool()
@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from .latency import LatencyStats
+
+
+class FrameStats:
+    """Per-stage frame timings with rolling percentiles, byte totals and drop counters.
+
+    Stages are free-form names such as "decode:clip.mp4", "convert:clip.mp4",
+    "lock_wait:clip.mp4", "upload:preview", "draw:output", "swap:output" or
+    "frame:preview" (interval between presented frames). Recording is a
+    perf_counter delta plus a deque append, cheap enough to stay on during
+    shows.
+    """
+
+    def __init__(self, size=600):
+        self.size = size
+        self.stages = {}  # stage -> LatencyStats (ms)
+        self.bytes = defaultdict(int)  # stage -> bytes moved (uploads)
+        self.counters = defaultdict(int)  # e.g. "dropped:clip.mp4", "late:output"
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def _stage(self, stage):
+        stats = self.stages.get(stage)
+        if stats is None:
+            with self.lock:
+                stats = self.stages.setdefault(stage, LatencyStats(self.size))
+        return stats
+
+    def record(self, stage, seconds, nbytes=0, flagged=False):
+        self._stage(stage).record(seconds * 1000.0, flagged)
+        if nbytes:
+            with self.lock:
+                self.bytes[stage] += nbytes
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+            self.bytes.clear()
+            self.counters.clear()
+            self.started = time.perf_counter()
+
+    def summary(self):
+        """{"elapsed_s", "stages": {stage: percentiles (+ bytes, mb_per_s)}, "counters": {...}}."""
+        with self.lock:
+            stages = dict(self.stages)
+            totals = dict(self.bytes)
+            counters = dict(self.counters)
+            elapsed = time.perf_counter() - self.started
+        result = {}
+        for stage in sorted(stages):
+            summary = stages[stage].summary()
+            if summary is None:
+                continue
+            if stage in totals:
+                summary["bytes"] = totals[stage]
+                summary["mb_per_s"] = totals[stage] / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+            result[stage] = summary
+        return {"elapsed_s": elapsed, "stages": result, "counters": counters}
+
+    def stage_summary(self, prefix):
+        """Percentiles over every stage starting with `prefix` (e.g. "decode:" for all sources)."""
+        with self.lock:
+            stages = [s for name, s in self.stages.items() if name.startswith(prefix)]
+        merged = LatencyStats(self.size * max(len(stages), 1))
+        for stats in stages:
+            with stats.lock:
+                samples = list(stats.samples)
+            for ms, flagged in samples:
+                merged.record(ms, flagged)
+        return merged.summary()
+
+    def total(self, prefix):
+        """Sum of counters starting with `prefix`."""
+        with self.lock:
+            return sum(n for name, n in self.counters.items() if name.startswith(prefix))
+
+    def dump(self, path):
+        """Write summary() as JSON (tmp file, then replace)."""
+        data = dict(self.summary(), timestamp=time.time())
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, path)
+        return data
+
+
+def source_name(path):
+    return os.path.basename(os.path.normpath(path)) if path else "?"
+
+
+# Shared by the decode thread, renderers and the main loop
+FRAME_STATS = FrameStats()
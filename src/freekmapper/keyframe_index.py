@@ -0,0 +1,171 @@
+import bisect
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from .cache import cache_dir, media_key
+from .latency import LatencyStats
+
+INDEX_VERSION = 1
+
+
+class KeyframeIndex:
+    """Keyframe positions and frame timestamps of one media file.
+
+    `timestamps` (ms per frame) is only stored for variable frame rate files;
+    constant frame rate files map time to frame with fps alone.
+    """
+
+    def __init__(self, fps, frame_count, keyframes, timestamps=None):
+        self.fps = fps or 30.0
+        self.frame_count = frame_count
+        self.keyframes = keyframes  # Sorted frame numbers; [0] if unknown
+        self.timestamps = timestamps
+
+    def frame_for_time(self, seconds):
+        if self.timestamps:
+            i = bisect.bisect_right(self.timestamps, seconds * 1000.0) - 1
+            frame = max(i, 0)
+        else:
+            frame = int(round(seconds * self.fps))
+        if self.frame_count > 0:
+            frame = min(frame, self.frame_count - 1)
+        return max(frame, 0)
+
+    def keyframe_before(self, frame):
+        i = bisect.bisect_right(self.keyframes, frame) - 1
+        return self.keyframes[max(i, 0)] if self.keyframes else 0
+
+    def has_keyframes(self):
+        return len(self.keyframes) > 1
+
+    def to_dict(self):
+        return {
+            "version": INDEX_VERSION,
+            "fps": self.fps,
+            "frame_count": self.frame_count,
+            "keyframes": self.keyframes,
+            "timestamps": self.timestamps,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError("Unsupported keyframe index version")
+        return cls(data["fps"], data["frame_count"], data["keyframes"], data.get("timestamps"))
+
+
+def scan_keyframes(path):
+    """Build an index by reading packets (FFmpeg raw mode, no decoding) where supported."""
+    has_flag = hasattr(cv2, "CAP_PROP_LRF_HAS_KEY_FRAME")
+    cap = None
+    if has_flag:
+        try:
+            cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+        except cv2.error:
+            cap = None
+    if cap is None or not cap.isOpened():
+        # Older OpenCV: grab() without conversion still gives timestamps, but no keyframe flags
+        has_flag = False
+        cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open {path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    keyframes = []
+    timestamps = []
+    try:
+        frame = 0
+        while cap.grab():
+            timestamps.append(round(cap.get(cv2.CAP_PROP_POS_MSEC), 3))
+            if has_flag and cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                keyframes.append(frame)
+            frame += 1
+    finally:
+        cap.release()
+
+    # Packets arrive in decode order; B-frames make their timestamps non-monotonic
+    timestamps.sort()
+    if not keyframes or keyframes[0] != 0:
+        keyframes.insert(0, 0)
+    # Constant frame rate files don't need per-frame timestamps
+    period = 1000.0 / fps
+    cfr = all(abs(t - i * period) <= period / 2 for i, t in enumerate(timestamps))
+    return KeyframeIndex(fps, len(timestamps), keyframes, None if cfr else timestamps)
+
+
+# Seek latency samples; flagged = seek used a keyframe index
+SEEK_STATS = LatencyStats()
+
+
+class KeyframeIndexer:
+    """Background scanner with an on-disk cache keyed by path + mtime + size."""
+
+    def __init__(self, workers=1):
+        self.directory = cache_dir("keyframes")
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="keyframe-index")
+        self.indexes = {}  # key -> KeyframeIndex
+        self.paths = {}  # path -> key
+        self.in_flight = set()
+        self.lock = threading.Lock()
+
+    def _cache_file(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, path):
+        """Index for `path` if it is ready (never blocks on a scan)."""
+        with self.lock:
+            key = self.paths.get(path)
+            return self.indexes.get(key) if key else None
+
+    def request(self, path):
+        """Load the cached index or queue a one-time background scan."""
+        if not path or not os.path.isfile(path):
+            return
+        try:
+            key = media_key(path)
+        except OSError:
+            return
+        with self.lock:
+            if key in self.indexes or key in self.in_flight:
+                self.paths[path] = key
+                return
+            self.in_flight.add(key)
+        self.pool.submit(self._load_or_scan, path, key)
+
+    def _load_or_scan(self, path, key):
+        index = None
+        try:
+            cache_file = self._cache_file(key)
+            if os.path.exists(cache_file):
+                try:
+                    with open(cache_file) as f:
+                        index = KeyframeIndex.from_dict(json.load(f))
+                except (ValueError, KeyError):
+                    index = None
+            if index is None:
+                start = time.perf_counter()
+                index = scan_keyframes(path)
+                print(
+                    f"Indexed {os.path.basename(path)}: {index.frame_count} frames, "
+                    f"{len(index.keyframes)} keyframes in {time.perf_counter() - start:.2f}s"
+                )
+                tmp = cache_file + ".tmp"
+                with open(tmp, "w") as f:
+                    json.dump(index.to_dict(), f)
+                os.replace(tmp, cache_file)
+        except Exception as e:
+            print(f"Keyframe index failed for {path}: {e}")
+        finally:
+            with self.lock:
+                self.in_flight.discard(key)
+                if index is not None:
+                    self.indexes[key] = index
+                    self.paths[path] = key
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
@@ -0,0 +1,33 @@
+import threading
+from collections import deque
+
+
+class LatencyStats:
+    """Rolling latency samples (ms) with percentile summaries."""
+
+    def __init__(self, size=500):
+        self.samples = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def record(self, ms, flagged=False):
+        with self.lock:
+            self.samples.append((ms, flagged))
+
+    def summary(self):
+        with self.lock:
+            values = sorted(ms for ms, _ in self.samples)
+            flagged = sum(1 for _, f in self.samples if f)
+        if not values:
+            return None
+
+        def pct(p):
+            return values[min(int(p * len(values)), len(values) - 1)]
+
+        return {
+            "count": len(values),
+            "flagged": flagged,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_ms": values[-1],
+        }
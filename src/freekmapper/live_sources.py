@@ -0,0 +1,521 @@
+"""Live surface sources: cameras and frames shared by another local process.
+
+Media paths:
+    camera:0              cv2.VideoCapture(0) (V4L2 on Linux)
+    camera:/dev/video2    a capture device by path
+    shm:NAME              the shared-memory ring NAME written by a local producer
+
+Live sources keep one frame slot: a newer frame replaces one that hasn't
+been shown yet (counted as dropped), so nothing is buffered and the newest
+capture is always the one drawn. They never finish; in a sequence a live
+step lasts the image duration.
+
+Shared-memory ring protocol (version 1, little-endian, one producer):
+
+    header, 64 bytes
+         0  4s   magic b"FMRB"
+         4  u32  version (1)
+         8  u32  width
+        12  u32  height
+        16  u32  channels (3: RGB, uint8)
+        20  u32  slot count N
+        24  u64  slot stride in bytes (multiple of 64)
+        32  u64  frames published; the newest is frame published - 1
+        40       reserved
+    slot i at 64 + i * stride, holding frames f with f % N == i
+         0  u64  sequence: 2f + 1 while frame f is written, 2f + 2 once complete
+         8  f64  capture time, time.monotonic() of the producer (same machine)
+        16       reserved
+        64       width * height * 3 bytes, rows top to bottom
+
+A producer writes frame f into slot f % N (odd sequence, pixels, capture
+time, even sequence) and then sets published to f + 1. Pixels can be
+rendered straight into the slot (SharedFrameWriter.frame() returns a numpy
+view of it), so the producer side is zero-copy. The consumer copies the
+newest complete slot and re-reads its sequence afterwards (a seqlock): a
+slot the producer lapped during the copy is discarded, never shown torn.
+"""
+import argparse
+import struct
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import cv2
+import numpy as np
+
+from .instrumentation import FRAME_STATS, source_name
+from .show_clock import SHOW_CLOCK
+
+LIVE_POLL_SECONDS = 0.004  # Reader wake-up interval for live sources (frames arrive on their own clock)
+LIVE_FPS = 30.0  # Nominal rate when the device doesn't report one
+PRIME_TIMEOUT = 1.0  # Seconds prime() waits for the first frame
+CAMERA_RETRY_SECONDS = 0.05  # Pause after a failed read before trying again
+SHM_RETRY_SECONDS = 1.0  # Reattach interval while the ring is missing or its producer is silent
+
+RING_MAGIC = b"FMRB"
+RING_VERSION = 1
+RING_HEADER = struct.Struct("<4sIIIIIQQ")  # magic, version, width, height, channels, slots, stride, published
+HEADER_SIZE = 64
+SLOT_HEADER_SIZE = 64
+PUBLISHED_OFFSET = 32
+
+
+class LiveSource:
+    """Common part of the live sources (same interface as VideoSource, without an end or a timeline)."""
+
+    live = True
+    endless = True  # No end: a sequence step holds it for the image duration
+    prime_timeout = PRIME_TIMEOUT
+
+    def __init__(self, path, max_size=1280, loop=True, playing=True, clock=None, meta=None):
+        self.filepath = path
+        self.current_frame = None  # RGB frame
+        self.capture_time = None  # time.monotonic() at which current_frame was captured
+        self.reported_time = None  # capture_time whose latency was last recorded
+        self.latest = None  # Newest (frame, capture time) not taken yet: the single slot
+        self.slot_lock = threading.Lock()
+        self.playing = playing
+        self.loop = loop
+        self.finished = False
+        self.lock = threading.Lock()
+        self.max_size = max_size
+
+        self.clock = clock or SHOW_CLOCK
+        self.fps = LIVE_FPS
+        self.frame_count = 0  # Unknown length: never ends
+        self.width = self.height = 0
+        self.frame_index = 0  # Frames shown since opening
+        self.start_time = self.clock.now()
+        self.dropped_frames = 0  # Frames replaced before they were shown
+        self.timeline = None
+        self.suspended = False
+        name = source_name(path)
+        self.stat_names = (f"lock_wait:{name}", f"convert:{name}", f"dropped:{name}", f"live_latency:{name}")
+
+    # --- Subclass hooks --- #
+    def _open(self):
+        raise NotImplementedError
+
+    def _close(self):
+        raise NotImplementedError
+
+    def _poll(self):
+        """Fetch a new frame into the slot if one is ready (sources without a capture thread)."""
+
+    def _is_open(self):
+        raise NotImplementedError
+
+    # --- Frame slot --- #
+    def _resize_frame(self, frame):
+        h, w = frame.shape[:2]
+        if w <= self.max_size and h <= self.max_size:
+            return frame
+        scale = self.max_size / max(w, h)
+        return cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_LINEAR)
+
+    def _offer(self, frame, capture_time):
+        """Put a new frame in the slot; an unshown frame it replaces is dropped."""
+        with self.slot_lock:
+            if self.latest is not None and self.playing:
+                self.dropped_frames += 1
+                FRAME_STATS.count(self.stat_names[2])
+            self.latest = (frame, capture_time)
+
+    def _take(self):
+        with self.slot_lock:
+            latest, self.latest = self.latest, None
+        if latest is not None:
+            self.current_frame, self.capture_time = latest
+            self.frame_index += 1
+
+    def read_frame(self, now=None):
+        """Show the newest captured frame, if any arrived since the last call."""
+        t0 = time.perf_counter()
+        with self.lock:
+            FRAME_STATS.record(self.stat_names[0], time.perf_counter() - t0)
+            if self.playing and not self.suspended:
+                self._poll()
+                self._take()
+            return self.current_frame
+
+    def presented(self, t):
+        """Record capture -> present latency (time.monotonic() seconds) of the frame on screen."""
+        capture_time = self.capture_time
+        if capture_time is None or capture_time == self.reported_time:
+            return  # Nothing new since the last presentation
+        self.reported_time = capture_time
+        FRAME_STATS.record(self.stat_names[3], max(t - capture_time, 0.0))
+
+    # --- VideoSource interface --- #
+    def seek(self, seconds, index=None, start_time=None):
+        """Live input can't seek: shows the newest frame."""
+        return self.prime()
+
+    def next_due(self):
+        if not self.playing:
+            return None
+        return self.clock.now() + LIVE_POLL_SECONDS
+
+    def prime(self):
+        """Open the input and wait (up to prime_timeout) for its first frame."""
+        with self.lock:
+            self._resume()
+        deadline = time.monotonic() + self.prime_timeout
+        while True:
+            with self.lock:
+                self._poll()
+                self._take()
+                if self.current_frame is not None or not self._is_open():
+                    return self.current_frame
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.01)
+
+    def end_time(self):
+        return None
+
+    def remaining_time(self, now=None):
+        return None
+
+    def get_current_frame(self):
+        with self.lock:
+            return self.current_frame
+
+    def play(self, start_time=None):
+        with self.lock:
+            self._resume()
+            self.start_time = self.clock.now() if start_time is None else start_time
+            self.playing = True
+
+    def pause(self):
+        with self.lock:
+            self.playing = False
+
+    def stop(self):
+        with self.lock:
+            self.playing = False
+
+    def is_finished(self):
+        return False
+
+    def suspend(self):
+        """Close the device or ring of an idle source; the next play/seek/prime reopens it."""
+        with self.lock:
+            if self.suspended:
+                return
+            self._close()
+            with self.slot_lock:
+                self.latest = None
+            self.current_frame = None
+            self.capture_time = None
+            self.playing = False
+            self.suspended = True
+
+    def _resume(self):
+        if self.suspended:
+            self.suspended = False
+            self._open()
+
+    def memory_usage(self):
+        with self.lock:
+            frames = 0
+            latest = self.latest
+            for frame in (self.current_frame, latest[0] if latest else None):
+                if frame is not None:
+                    frames += frame.nbytes
+            return {"decoder": 0, "frames": frames, "open": self._is_open()}
+
+    def release(self):
+        with self.lock:
+            self.suspended = False
+            self._close()
+
+
+class CameraSource(LiveSource):
+    """Capture device read on its own thread (cv2.VideoCapture, V4L2 on Linux)."""
+
+    def __init__(self, path, **kwargs):
+        super().__init__(path, **kwargs)
+        device = path.split(":", 1)[1]
+        self.device = int(device) if device.isdigit() else device
+        self.cap = None
+        self.thread = None
+        self.running = False
+        self._open()
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.device)
+        if not cap.isOpened():
+            print(f"Could not open camera {self.device}")
+            return
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Keep the driver queue short: old frames only add latency
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or LIVE_FPS
+        self.width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 0)
+        self.height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0)
+        self.cap = cap
+        self.running = True
+        self.thread = threading.Thread(target=self._capture, args=(cap,), daemon=True, name=f"camera-{self.device}")
+        self.thread.start()
+
+    def _capture(self, cap):
+        convert_stage = self.stat_names[1]
+        while self.running:
+            ret, frame = cap.read()  # Blocks until the device delivers a frame
+            captured = time.monotonic()
+            if not ret:
+                time.sleep(CAMERA_RETRY_SECONDS)
+                continue
+            t0 = time.perf_counter()
+            frame = cv2.cvtColor(self._resize_frame(frame), cv2.COLOR_BGR2RGB)
+            FRAME_STATS.record(convert_stage, time.perf_counter() - t0)
+            self._offer(frame, captured)
+
+    def _close(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)  # A read in progress returns within a frame period
+            self.thread = None
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def _is_open(self):
+        return self.cap is not None
+
+
+def attach_shared_memory(name):
+    """Attach to an existing segment without letting this process's resource tracker unlink it at exit."""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except (AttributeError, KeyError):
+        pass  # No tracker on this platform
+    return shm
+
+
+def ring_layout(width, height, slots):
+    """(slot stride, total size) in bytes of a ring for width x height RGB frames."""
+    stride = SLOT_HEADER_SIZE + width * height * 3
+    stride = (stride + 63) // 64 * 64
+    return stride, HEADER_SIZE + slots * stride
+
+
+class SharedMemorySource(LiveSource):
+    """Reads the newest frame of a shared-memory ring (protocol in the module docstring)."""
+
+    def __init__(self, path, **kwargs):
+        super().__init__(path, **kwargs)
+        self.name = path.split(":", 1)[1]
+        self.shm = None
+        self.views = None  # (published, sequences, times, pixels) numpy views into the segment
+        self.last_published = 0
+        self.last_frame_at = 0.0
+        self.retry_at = 0.0
+        self.torn_frames = 0  # Copies discarded because the producer overwrote the slot meanwhile
+        self._open()
+
+    def _open(self):
+        self.retry_at = time.monotonic() + SHM_RETRY_SECONDS
+        try:
+            shm = attach_shared_memory(self.name)
+        except FileNotFoundError:
+            return  # Producer not running yet: retried from _poll
+        try:
+            magic, version, width, height, channels, slots, stride, _ = RING_HEADER.unpack_from(shm.buf, 0)
+            if magic != RING_MAGIC or version != RING_VERSION or channels != 3 or slots < 1:
+                raise ValueError("not a version 1 RGB frame ring")
+            if stride < SLOT_HEADER_SIZE + width * height * 3 or shm.size < HEADER_SIZE + slots * stride:
+                raise ValueError("ring smaller than its header says")
+        except (ValueError, struct.error) as e:
+            print(f"Shared memory {self.name}: {e}")
+            shm.close()
+            return
+        buf = shm.buf
+        published = np.ndarray((1,), dtype="<u8", buffer=buf, offset=PUBLISHED_OFFSET)
+        sequences, times, pixels = [], [], []
+        for i in range(slots):
+            base = HEADER_SIZE + i * stride
+            sequences.append(np.ndarray((1,), dtype="<u8", buffer=buf, offset=base))
+            times.append(np.ndarray((1,), dtype="<f8", buffer=buf, offset=base + 8))
+            pixels.append(np.ndarray((height, width, 3), dtype=np.uint8, buffer=buf, offset=base + SLOT_HEADER_SIZE))
+        self.shm = shm
+        self.views = (published, sequences, times, pixels)
+        self.width, self.height = width, height
+        self.last_published = 0
+        self.last_frame_at = time.monotonic()
+
+    def _poll(self):
+        now = time.monotonic()
+        if self.shm is None:
+            if now < self.retry_at:
+                return
+            self._open()
+            if self.shm is None:
+                return
+        published, sequences, times, pixels = self.views
+        count = int(published[0])
+        if count == self.last_published:
+            if now - self.last_frame_at > SHM_RETRY_SECONDS:
+                # Silent producer: it may have restarted with a new segment under the same name
+                self._close()
+                self._open()
+            return  # Frames of a reattached ring are picked up by the next poll
+        self.last_frame_at = now
+        if count < self.last_published:
+            self.last_published = 0  # Producer restarted on the same segment
+        if self.last_published and count - self.last_published > 1:
+            # Published but never picked up: replaced by a newer frame
+            skipped = count - self.last_published - 1
+            self.dropped_frames += skipped
+            FRAME_STATS.count(self.stat_names[2], skipped)
+        self.last_published = count
+
+        slot = (count - 1) % len(pixels)
+        expected = 2 * (count - 1) + 2
+        if int(sequences[slot][0]) != expected:
+            self._torn()
+            return
+        t0 = time.perf_counter()
+        frame = np.array(pixels[slot])  # The only copy, out of the producer's slot
+        captured = float(times[slot][0])
+        if int(sequences[slot][0]) != expected:
+            self._torn()  # Lapped during the copy
+            return
+        frame = self._resize_frame(frame)
+        FRAME_STATS.record(self.stat_names[1], time.perf_counter() - t0, nbytes=frame.nbytes)
+        self._offer(frame, captured)
+
+    def _torn(self):
+        self.torn_frames += 1
+        self.dropped_frames += 1
+        FRAME_STATS.count(self.stat_names[2])
+
+    def _close(self):
+        # The numpy views export the buffer: drop them before closing the mapping
+        self.views = None
+        if self.shm is not None:
+            self.shm.close()
+            self.shm = None
+
+    def _is_open(self):
+        return self.shm is not None
+
+
+class SharedFrameWriter:
+    """Producer side of the shared-memory ring (for generators written in Python).
+
+        writer = SharedFrameWriter("generator", 1280, 720)
+        frame = writer.frame()  # numpy view of the next slot: render into it
+        ...
+        writer.publish()
+
+    Other languages can write the same layout directly (see the module docstring).
+    """
+
+    def __init__(self, name, width, height, slots=3):
+        self.width = width
+        self.height = height
+        self.slots = slots
+        self.stride, size = ring_layout(width, height, slots)
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a producer that crashed: readers still attached keep their mapping
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        buf = self.shm.buf
+        RING_HEADER.pack_into(buf, 0, RING_MAGIC, RING_VERSION, width, height, 3, slots, self.stride, 0)
+        self.published = np.ndarray((1,), dtype="<u8", buffer=buf, offset=PUBLISHED_OFFSET)
+        self.sequences = []
+        self.times = []
+        self.pixels = []
+        for i in range(slots):
+            base = HEADER_SIZE + i * self.stride
+            self.sequences.append(np.ndarray((1,), dtype="<u8", buffer=buf, offset=base))
+            self.times.append(np.ndarray((1,), dtype="<f8", buffer=buf, offset=base + 8))
+            self.pixels.append(np.ndarray((height, width, 3), dtype=np.uint8, buffer=buf, offset=base + SLOT_HEADER_SIZE))
+            self.sequences[i][0] = 0
+        self.frame_number = 0
+        self.writing = False
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def frame(self):
+        """Writable HxWx3 RGB view of the slot of the next frame (marks it as being written)."""
+        slot = self.frame_number % self.slots
+        if not self.writing:
+            self.sequences[slot][0] = 2 * self.frame_number + 1
+            self.writing = True
+        return self.pixels[slot]
+
+    def publish(self, capture_time=None):
+        """Make the frame written into frame() the newest one."""
+        slot = self.frame_number % self.slots
+        if not self.writing:
+            self.frame()
+        self.times[slot][0] = time.monotonic() if capture_time is None else capture_time
+        self.sequences[slot][0] = 2 * self.frame_number + 2
+        self.frame_number += 1
+        self.published[0] = self.frame_number
+        self.writing = False
+
+    def write(self, frame, capture_time=None):
+        """Copy an RGB frame into the ring and publish it."""
+        self.frame()[...] = frame
+        self.publish(capture_time)
+
+    def close(self, unlink=True):
+        self.published = self.sequences = self.times = self.pixels = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def open_live_source(path, **kwargs):
+    """CameraSource for camera:..., SharedMemorySource for shm:..."""
+    if path.startswith("camera:"):
+        return CameraSource(path, **kwargs)
+    return SharedMemorySource(path, **kwargs)
+
+
+def produce(name, size, fps, seconds=None):
+    """Demo producer: moving test pattern into the ring `name` (stop with Ctrl+C)."""
+    from .bench import _pattern
+
+    w, h = size
+    writer = SharedFrameWriter(name, w, h)
+    print(f"Writing {w}x{h} at {fps:g} fps to shm:{writer.name} (Ctrl+C to stop)")
+    start = time.monotonic()
+    try:
+        while seconds is None or time.monotonic() - start < seconds:
+            writer.frame()[...] = _pattern(w, h, writer.frame_number)
+            writer.publish()
+            time.sleep(max(start + writer.frame_number / fps - time.monotonic(), 0.0))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m freekmapper.live_sources", description="Shared-memory test producer")
+    parser.add_argument("name", help="segment name (map it with the media path shm:NAME)")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=float, default=LIVE_FPS, help=f"frame rate (default {LIVE_FPS:g})")
+    parser.add_argument("--seconds", type=float, default=None, help="stop after this long")
+    args = parser.parse_args(argv)
+    if args.fps <= 0 or args.width <= 0 or args.height <= 0:
+        parser.error("--fps, --width and --height must be positive")
+    produce(args.name, (args.width, args.height), args.fps, args.seconds)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,54 @@
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
-import cv2
+from tkinter import ttk, colorchooser, filedialog, messagebox
 import numpy as np
 import threading
 import time
 import os
+import sys
 import glfw
 
-from .video_source import VideoSource
+from .video_source import VideoSource, open_source
+from .image_sequence import is_image_sequence
 from .renderers import GLTkRenderer, GLFullscreenRenderer
+from .outputs import OutputSet, parse_region, split_canvas
+from .masks import parse_blend, parse_polygon
+from .effects import EFFECT_DEFAULTS, EFFECT_RANGES, effect_value, set_effect
+from .warp import corner_indices, corner_points, grid_from_quad, rotate_points
 from .control_panel import LiveControlPanel
-from .sequence_setup import SequenceEditorDialog
+from .sequence_setup import SequenceEditorDialog, ask_live_path
+from .sequencer import Sequencer
+from .show_clock import SHOW_CLOCK, EventScheduler
+from .sync_groups import SyncGroups
+from .keyframe_index import KeyframeIndexer, SEEK_STATS
+from .image_cache import IMAGE_CACHE
+from .image_pyramid import PYRAMIDS
+from .memory_manager import MemoryManager
+from .instrumentation import FRAME_STATS, source_name
+from .trace import TRACE
+from .remote import RemoteServer
+from .slot_cache import SlotBank, SWITCH_STATS, diff_surfaces
+from .media_probe import MEDIA_PROBE, describe_media
+from .network_source import NetworkSource
+from .shader_source import ShaderSource
+from .show_file import SHOW_EXTENSION, load_config, save_show
+
+# Rows of the Performance panel's frame stage table: (title, stage prefix merged over sources)
+FRAME_STAT_GROUPS = (
+    ("decode", "decode:"), ("convert", "convert:"), ("lock wait", "lock_wait:"), ("live", "live_latency:"),
+    ("generate", "generate:"), ("effects", "effects:"),
+)
+# Effect sliders: (setting, label, slider units per setting unit); ranges from effects.EFFECT_RANGES
+EFFECT_CONTROLS = (
+    ("brightness", "Brightness", 100), ("contrast", "Contrast", 100), ("saturation", "Saturation", 100),
+    ("hue", "Hue", 1), ("gamma", "Gamma", 100), ("blur", "Blur", 1),
+    ("key_threshold", "Key", 100), ("key_softness", "Key Soft", 100),
+)
+FRAME_STAT_STAGES = (
+    ("upload", "upload:preview"), ("draw", "draw:preview"), ("swap", "swap:preview"),
+    ("upload out", "upload:output"), ("draw out", "draw:output"), ("swap out", "swap:output"),
+    ("frame", "frame:render_loop"),
+)
+
 
 class ProjectionMapper:
     def __init__(self, root: tk.Tk):
@@ -29,6 +67,18 @@ class ProjectionMapper:
         self.stop_thread = False
         self.target_fps = 30
 
+        # Show clock: every source, cue and control-panel loop derives its timing from it
+        self.clock = SHOW_CLOCK
+        self.scheduler = EventScheduler()
+        self.frame_period = 1.0 / 60
+        self.next_frame_time = None
+        self.last_frame_time = None  # perf_counter() of the last render loop pass (frame stats)
+
+        # Sync groups: surfaces locked to a shared timeline (surface["sync_group"])
+        self.sync_groups = SyncGroups(self.clock)
+        self.sync_group_var = tk.StringVar()
+        self.next_stats_time = 0.0
+
         # Display info
         self.displays = self.detect_displays()
         
@@ -44,20 +94,26 @@ class ProjectionMapper:
         self.quality_var = tk.StringVar(value="low")
         self.display_var = tk.StringVar()
         
-        # Fullscreen State
-        self.fullscreen_window = None
-        self.fullscreen_renderer = None
+        # Fullscreen outputs (one GLFW window per projector, shared textures)
+        self.outputs = OutputSet()
         
-        # Sequencing State
+        # Sequencing State (steps, continuous surfaces, transitions live in the Sequencer)
+        self.sequencer = Sequencer(self.surfaces, self.video_sources, self.clock, self.scheduler)
+        # Keyframe/timestamp index per media file, built once in the background
+        self.keyframe_indexer = KeyframeIndexer()
+        self.sequencer.indexer = self.keyframe_indexer
+        # Live Control Panel slots: configs parsed and media opened before GO
+        self.slot_bank = SlotBank()
+        self.switch_started = None  # perf_counter() of the last config trigger
+        self.control_panel = None
+        self.remote = None  # RemoteServer while remote control is enabled
+        # RAM budgets for decoders/frames/stills; evicts idle steps in long sequential shows
+        self.memory_manager = MemoryManager()
+        self.texture_sources = set()  # Video ids the renderers may hold textures for
+        self.thumbnails = {}  # Probe thumbnail path -> PhotoImage (Tk needs the reference kept)
         self.playback_mode = tk.StringVar(value="concurrent") # 'concurrent' or 'sequential'
-        self.sequence_steps = [] # List of {"surface_index": int, "media_path": str, "media_type": str}
-        self.continuous_surfaces = set() # Set of surface indices
-        self.current_sequence_index = 0
-        self.sequence_active = False
-        
-        # Image Duration State
-        self.current_clip_start_time = 0
-        self.image_duration = 5.0 # Seconds
+        self.playback_mode.trace_add("write", self.on_playback_mode_changed)
+        self.last_transition_report = None
 
         self.setup_ui()
         
@@ -70,6 +126,42 @@ class ProjectionMapper:
             
         self.start_video_thread()
 
+    # --------- SEQUENCING STATE --------- #
+    @property
+    def sequence_steps(self):
+        return self.sequencer.steps
+
+    @sequence_steps.setter
+    def sequence_steps(self, steps):
+        self.sequencer.steps = steps
+
+    @property
+    def continuous_surfaces(self):
+        return self.sequencer.continuous_surfaces
+
+    @continuous_surfaces.setter
+    def continuous_surfaces(self, surfaces):
+        self.sequencer.continuous_surfaces = surfaces
+
+    @property
+    def current_sequence_index(self):
+        return self.sequencer.current_index
+
+    @current_sequence_index.setter
+    def current_sequence_index(self, index):
+        self.sequencer.current_index = index
+
+    @property
+    def image_duration(self):
+        return self.sequencer.image_duration
+
+    @image_duration.setter
+    def image_duration(self, seconds):
+        self.sequencer.image_duration = seconds
+
+    def on_playback_mode_changed(self, *args):
+        self.sequencer.mode = self.playback_mode.get()
+
     # --------- UI SETUP --------- #
     def setup_ui(self):
         main_frame = ttk.Frame(self.root)
@@ -144,10 +236,27 @@ class ProjectionMapper:
         ttk.Button(media_frame, text="Load Image", command=self.load_image_to_surface).pack(
             fill=tk.X, pady=2
         )
+        ttk.Button(media_frame, text="Load Image Sequence", command=self.load_sequence_to_surface).pack(
+            fill=tk.X, pady=2
+        )
+        ttk.Button(media_frame, text="Load Live Input", command=self.load_live_to_surface).pack(
+            fill=tk.X, pady=2
+        )
+        ttk.Button(media_frame, text="Load Shader", command=self.load_shader_to_surface).pack(
+            fill=tk.X, pady=2
+        )
 
-        self.media_label = ttk.Label(media_frame, text="No media", foreground="gray")
+        self.media_label = ttk.Label(media_frame, text="No media", foreground="gray", compound=tk.TOP)
         self.media_label.pack(pady=5)
 
+        ttk.Label(media_frame, text="Sync Group:").pack(anchor=tk.W)
+        sync_combo = ttk.Combobox(
+            media_frame, textvariable=self.sync_group_var, values=("", "A", "B", "C", "D"), width=10
+        )
+        sync_combo.pack(fill=tk.X, pady=2)
+        sync_combo.bind("<<ComboboxSelected>>", self.set_sync_group)
+        sync_combo.bind("<Return>", self.set_sync_group)
+
         # Transform frame
         transform_frame = ttk.LabelFrame(left_panel, text="Transform", padding=10)
         transform_frame.pack(fill=tk.X, pady=5)
@@ -173,7 +282,60 @@ class ProjectionMapper:
         ttk.Button(rotation_buttons, text="↺ CCW", command=self.rotate_surface_ccw).pack(
             side=tk.LEFT, expand=True, padx=1
         )
+
+        # Grid warp: (cols + 1) x (rows + 1) control points through a smooth mesh
+        grid_row = ttk.Frame(transform_frame)
+        grid_row.pack(fill=tk.X, pady=(10, 2))
+        ttk.Label(grid_row, text="Grid:").pack(side=tk.LEFT)
+        self.grid_cols_var = tk.IntVar(value=3)
+        ttk.Spinbox(grid_row, from_=1, to=16, textvariable=self.grid_cols_var, width=3).pack(side=tk.LEFT, padx=2)
+        ttk.Label(grid_row, text="x").pack(side=tk.LEFT)
+        self.grid_rows_var = tk.IntVar(value=3)
+        ttk.Spinbox(grid_row, from_=1, to=16, textvariable=self.grid_rows_var, width=3).pack(side=tk.LEFT, padx=2)
+        grid_buttons = ttk.Frame(transform_frame)
+        grid_buttons.pack(fill=tk.X, pady=2)
+        ttk.Button(grid_buttons, text="Make Grid", command=self.make_surface_grid).pack(side=tk.LEFT, expand=True, padx=1)
+        ttk.Button(grid_buttons, text="Reset to Quad", command=self.reset_surface_quad).pack(side=tk.LEFT, expand=True, padx=1)
+
+        # Soft mask: polygon in surface UVs (0..1), rasterized once per edit
+        ttk.Label(transform_frame, text="Mask polygon (u,v u,v ...):").pack(anchor=tk.W, pady=(10, 0))
+        self.mask_var = tk.StringVar(value="")
+        ttk.Entry(transform_frame, textvariable=self.mask_var).pack(fill=tk.X, pady=2)
+        mask_row = ttk.Frame(transform_frame)
+        mask_row.pack(fill=tk.X)
+        ttk.Label(mask_row, text="Feather %:").pack(side=tk.LEFT)
+        self.mask_feather_var = tk.DoubleVar(value=0.0)
+        ttk.Spinbox(mask_row, from_=0, to=25, increment=0.5, textvariable=self.mask_feather_var, width=5).pack(side=tk.LEFT, padx=2)
+        self.mask_invert_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(mask_row, text="Invert", variable=self.mask_invert_var).pack(side=tk.LEFT)
+        mask_buttons = ttk.Frame(transform_frame)
+        mask_buttons.pack(fill=tk.X, pady=2)
+        ttk.Button(mask_buttons, text="Apply Mask", command=self.apply_surface_mask).pack(side=tk.LEFT, expand=True, padx=1)
+        ttk.Button(mask_buttons, text="Clear Mask", command=self.clear_surface_mask).pack(side=tk.LEFT, expand=True, padx=1)
         
+        # Effects: GPU passes per surface (see effects.py), skipped while at their defaults
+        effects_frame = ttk.LabelFrame(left_panel, text="Effects", padding=10)
+        effects_frame.pack(fill=tk.X, pady=5)
+        effects_frame.columnconfigure(1, weight=1)
+        self.effect_scales = {}
+        for row, (name, label, units) in enumerate(EFFECT_CONTROLS):
+            lo, hi = EFFECT_RANGES[name]
+            ttk.Label(effects_frame, text=label).grid(row=row, column=0, sticky=tk.W)
+            scale = ttk.Scale(
+                effects_frame,
+                from_=lo * units,
+                to=hi * units,
+                orient=tk.HORIZONTAL,
+                command=lambda value, name=name, units=units: self.update_effect(name, float(value) / units),
+            )
+            scale.set(EFFECT_DEFAULTS[name] * units)
+            scale.grid(row=row, column=1, sticky=tk.EW, pady=1)
+            self.effect_scales[name] = (scale, units)
+        effect_buttons = ttk.Frame(effects_frame)
+        effect_buttons.grid(row=len(EFFECT_CONTROLS), column=0, columnspan=2, sticky=tk.EW, pady=(5, 0))
+        ttk.Button(effect_buttons, text="Key Color...", command=self.pick_key_color).pack(side=tk.LEFT, expand=True, padx=1)
+        ttk.Button(effect_buttons, text="Reset Effects", command=self.reset_surface_effects).pack(side=tk.LEFT, expand=True, padx=1)
+
         # Sequencing Frame
         seq_frame = ttk.LabelFrame(left_panel, text="Playback Sequencing", padding=10)
         seq_frame.pack(fill=tk.X, pady=5)
@@ -200,6 +362,38 @@ class ProjectionMapper:
         self.fps_label = ttk.Label(perf_frame, text="FPS: --")
         self.fps_label.pack(pady=2)
 
+        self.transition_label = ttk.Label(perf_frame, text="Transition: --", font=("Arial", 8))
+        self.transition_label.pack(pady=2)
+
+        self.sync_label = ttk.Label(perf_frame, text="Sync: --", font=("Arial", 8))
+        self.sync_label.pack(pady=2)
+
+        self.seek_label = ttk.Label(perf_frame, text="Seek: --", font=("Arial", 8))
+        self.seek_label.pack(pady=2)
+
+        self.switch_label = ttk.Label(perf_frame, text="Switch: --", font=("Arial", 8))
+        self.switch_label.pack(pady=2)
+
+        self.image_cache_label = ttk.Label(perf_frame, text="Image cache: --", font=("Arial", 8))
+        self.image_cache_label.pack(pady=2)
+
+        self.texture_label = ttk.Label(perf_frame, text="Textures: --", font=("Arial", 8))
+        self.texture_label.pack(pady=2)
+
+        self.memory_label = ttk.Label(perf_frame, text="Memory: --", font=("Arial", 8))
+        self.memory_label.pack(pady=2)
+        ttk.Button(perf_frame, text="Memory Report", command=self.print_memory_report).pack(fill=tk.X, pady=2)
+
+        # Frame stage timings (p50/p95 ms) and drops
+        self.frame_stats_label = ttk.Label(perf_frame, text="Frame stages: --", font=("Courier", 8), justify=tk.LEFT)
+        self.frame_stats_label.pack(anchor=tk.W, pady=2)
+        ttk.Button(perf_frame, text="Save Frame Stats...", command=self.save_frame_stats).pack(fill=tk.X, pady=2)
+
+        # Span trace ring (Chrome trace / Perfetto); dumped automatically on a hitch while recording
+        self.trace_var = tk.BooleanVar(value=TRACE.enabled)
+        ttk.Checkbutton(perf_frame, text="Record Trace", variable=self.trace_var, command=self.toggle_trace).pack(anchor=tk.W)
+        ttk.Button(perf_frame, text="Save Trace...", command=self.save_trace).pack(fill=tk.X, pady=2)
+
         # Output frame
         output_frame = ttk.LabelFrame(left_panel, text="Output", padding=10)
         output_frame.pack(fill=tk.X, pady=5)
@@ -220,9 +414,35 @@ class ProjectionMapper:
         )
         display_dropdown.pack(fill=tk.X, pady=2)
 
+        ttk.Label(output_frame, text="Canvas region x,y,w,h (empty = all):").pack(anchor=tk.W)
+        self.region_var = tk.StringVar(value="")
+        ttk.Entry(output_frame, textvariable=self.region_var).pack(fill=tk.X, pady=2)
+
+        ttk.Label(output_frame, text="Edge blend L,R,T,B px / gamma:").pack(anchor=tk.W)
+        blend_row = ttk.Frame(output_frame)
+        blend_row.pack(fill=tk.X, pady=2)
+        self.blend_var = tk.StringVar(value="")
+        ttk.Entry(blend_row, textvariable=self.blend_var, width=16).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.blend_gamma_var = tk.DoubleVar(value=2.2)
+        ttk.Spinbox(blend_row, from_=1.0, to=3.0, increment=0.1, textvariable=self.blend_gamma_var, width=4).pack(side=tk.LEFT, padx=2)
+        ttk.Button(output_frame, text="Apply Blend to Display", command=self.apply_output_blend).pack(
+            fill=tk.X, pady=2
+        )
+
         ttk.Button(output_frame, text="▶ Fullscreen Output", command=self.fullscreen_output).pack(
             fill=tk.X, pady=5
         )
+        ttk.Button(output_frame, text="Span All Displays", command=self.span_outputs).pack(
+            fill=tk.X, pady=2
+        )
+        ttk.Button(output_frame, text="Close Outputs", command=self.close_fullscreen).pack(
+            fill=tk.X, pady=2
+        )
+        # Archive of what the first output presents (frames are dropped, not waited for, under load)
+        self.record_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(output_frame, text="● Record Output", variable=self.record_var, command=self.toggle_record).pack(anchor=tk.W)
+        self.record_label = ttk.Label(output_frame, text="Recording: off", font=("Arial", 8))
+        self.record_label.pack(anchor=tk.W)
         ttk.Button(output_frame, text="Save Config", command=self.save_config).pack(
             fill=tk.X, pady=2
         )
@@ -232,6 +452,14 @@ class ProjectionMapper:
         ttk.Button(output_frame, text="🎛 Live Control Panel", command=self.launch_control_panel).pack(
             fill=tk.X, pady=5
         )
+        self.remote_var = tk.BooleanVar(value=False)
+        self.remote_lan_var = tk.BooleanVar(value=False)
+        remote_row = ttk.Frame(output_frame)
+        remote_row.pack(fill=tk.X)
+        ttk.Checkbutton(remote_row, text="Remote Control", variable=self.remote_var, command=self.toggle_remote).pack(side=tk.LEFT)
+        ttk.Checkbutton(remote_row, text="LAN", variable=self.remote_lan_var).pack(side=tk.LEFT)
+        self.remote_label = ttk.Label(output_frame, text="Remote: off", font=("Arial", 8))
+        self.remote_label.pack(anchor=tk.W)
 
         self.status_label = ttk.Label(
             output_frame, text="Ready", foreground="green", font=("Arial", 8)
@@ -268,6 +496,8 @@ class ProjectionMapper:
             master=right_panel,
             surfaces=self.surfaces,
             get_frame_callback=self.get_surface_frame,
+            get_layers_callback=self.get_surface_layers,
+            get_pyramid_callback=self.get_surface_pyramid,
             fps_callback=fps_callback,
             width=800,
             height=600,
@@ -281,28 +511,71 @@ class ProjectionMapper:
 
         # Start a simple animation loop for OpenGL preview
         def gl_step():
-            # 0. Update Playback Logic
-            self.update_playback_logic()
+            t_frame = time.perf_counter()
+            if self.last_frame_time is not None:
+                interval = t_frame - self.last_frame_time
+                FRAME_STATS.record("frame:render_loop", interval, flagged=interval > self.frame_period * 1.5)
+                if interval > self.frame_period * 1.5:
+                    FRAME_STATS.count("late:render_loop")
+                TRACE.check_hitch(interval, t_frame)
+            self.last_frame_time = t_frame
+
+            # Remote commands received since the last frame are applied before it is drawn
+            remote_commands = self.remote.drain() if self.remote else []
+            for command in remote_commands:
+                self.apply_remote_command(command)
+
+            # 0. Fire cues due for this frame, then update Playback Logic
+            now = self.clock.now()
+            with TRACE.span("playback", "render"):
+                self.update_playback_logic(now)
+                self.scheduler.run_due(now)
+                self.sync_groups.update(self.surfaces, self.video_sources, now)
+                self.update_transition_label()
+            if now >= self.next_stats_time:
+                self.next_stats_time = now + 0.5
+                with TRACE.span("stats", "render"):
+                    self.update_sync_label()
+                    self.update_seek_label()
+                    self.update_switch_label()
+                    self.update_image_cache_label()
+                    self.update_texture_label()
+                    self.update_record_label()
+                    self.update_memory()
+                    self.update_frame_stats_label()
+                    self.update_remote()
+                    self.refresh_surface_list()
+            self.release_textures()
             
             # 1. Update Preview
-            self.opengl_view.redraw()
+            with TRACE.span("preview", "render"):
+                self.opengl_view.redraw()
             
-            # 2. Update Fullscreen (if active)
-            if self.fullscreen_window:
-                if glfw.window_should_close(self.fullscreen_window):
-                    self.close_fullscreen()
-                else:
-                    glfw.make_context_current(self.fullscreen_window)
-                    w_fb, h_fb = glfw.get_framebuffer_size(self.fullscreen_window)
-                    self.fullscreen_renderer.draw(w_fb, h_fb)
-                    glfw.swap_buffers(self.fullscreen_window)
-                    glfw.poll_events()
-                    
-                    # Restore Tkinter context implicitly handled by redraw's tkMakeCurrent next frame,
-                    # but good to be safe if we do other things.
-                    # self.opengl_view.tkMakeCurrent() # redraw does this now.
-
-            self.opengl_view.after(16, gl_step)  # ~60 FPS
+            # 2. Update fullscreen outputs (all windows drawn, then swapped together)
+            if self.outputs:
+                self.outputs.render()
+                # Tkinter context is made current again by redraw's tkMakeCurrent next frame
+
+            # Live inputs: capture -> present latency of the frames just swapped in
+            presented = time.monotonic()
+            for vs in list(self.video_sources.values()):
+                if getattr(vs, "live", False):
+                    vs.presented(presented)
+
+            # Config switch latency: trigger -> first frame of the new config presented
+            if self.switch_started is not None:
+                SWITCH_STATS.record((time.perf_counter() - self.switch_started) * 1000.0)
+                self.switch_started = None
+            if remote_commands:
+                self.remote.presented(remote_commands)
+
+            # ~60 FPS, paced against the show clock so timer jitter doesn't accumulate
+            if self.next_frame_time is None or now - self.next_frame_time > self.frame_period:
+                self.next_frame_time = now
+            self.next_frame_time += self.frame_period
+            delay_ms = int((self.next_frame_time - self.clock.now()) * 1000)
+            self.opengl_view.after(max(delay_ms, 1), gl_step)
+            TRACE.complete("gl_step", t_frame, time.perf_counter(), "render")
 
         # Delay start of GL loop to ensure window is mapped and context is ready
         self.root.after(100, gl_step)
@@ -415,11 +688,27 @@ class ProjectionMapper:
             self.video_thread.join(timeout=0.5)
 
     def video_reader_thread(self):
-        sleep_time = 1.0 / max(self.target_fps, 1)
+        period = 1.0 / max(self.target_fps, 1)
         while not self.stop_thread:
+            start = time.perf_counter()
+            now = self.clock.now()
+            active = 0
+            next_due = now + period
             for vs in list(self.video_sources.values()):
-                vs.read_frame()
-            time.sleep(sleep_time)
+                if vs.playing:
+                    active += 1
+                # Sources decode up to the frame due on the show clock
+                vs.read_frame(now)
+                due = vs.next_due()
+                if due is not None:
+                    next_due = min(next_due, due)
+            busy = time.perf_counter() - start
+            FRAME_STATS.record("decode_pass:reader", busy, flagged=busy > period)
+            TRACE.complete("decode pass", start, start + busy, "decode", {"active": active})
+            # Report decode load (two decoders run during a transition overlap)
+            self.sequencer.record_decode_load(active, busy, period)
+            # Sleep until the earliest source has its next frame due
+            time.sleep(max(next_due - self.clock.now(), 0.001))
 
     # --------- SURFACES --------- #
     def add_quad_surface(self):
@@ -446,6 +735,10 @@ class ProjectionMapper:
             "media_type": None,
             "media_path": None, # Store path for config
             "static_frame": None,
+            "sync_group": None,
+            "mask": None,  # Soft mask polygons in surface UVs (see masks.py)
+            "grid": None,  # [cols, rows] of a grid-mesh surface (see warp.py); None = quad
+            "effects": None,  # Colour correction / key / blur settings (see effects.py)
         }
 
         self.surfaces.append(surface)
@@ -470,6 +763,7 @@ class ProjectionMapper:
             self.video_sources[vid].release()
             del self.video_sources[vid]
 
+        self.sequencer.cancel_pending()
         self.surfaces.pop(idx)
         # Update sequence steps - remove steps referencing this surface
         self.sequence_steps = [s for s in self.sequence_steps if s["surface_index"] != idx]
@@ -481,7 +775,7 @@ class ProjectionMapper:
         self.surface_listbox.delete(idx)
         self.selected_surface = None
         self.opengl_view.selected_surface_index = None
-        self.media_label.config(text="No media", foreground="gray")
+        self.media_label.config(text="No media", foreground="gray", image="")
 
     def on_surface_select(self, event):
         selection = self.surface_listbox.curselection()
@@ -491,19 +785,56 @@ class ProjectionMapper:
         self.opengl_view.selected_surface_index = self.selected_surface
         surface = self.surfaces[self.selected_surface]
         self.opacity_scale.set(surface["opacity"] * 100)
+        self.sync_group_var.set(surface.get("sync_group") or "")
+        self.show_surface_mask(surface)
+        self.show_surface_effects(surface)
         self.update_media_label()
 
     def update_media_label(self):
         if self.selected_surface is None:
-            self.media_label.config(text="No surface selected", foreground="gray")
+            self.media_label.config(text="No surface selected", foreground="gray", image="")
             return
         surface = self.surfaces[self.selected_surface]
+        path = surface.get("media_path")
+        meta = MEDIA_PROBE.get(path) if surface["media_type"] else None
+        details = f"{os.path.basename(path)}\n{describe_media(meta)}" if path else ""
         if surface["media_type"] == "video":
-            self.media_label.config(text="Video loaded", foreground="green")
+            self.media_label.config(text=f"Video: {details}", foreground="green")
         elif surface["media_type"] == "image":
-            self.media_label.config(text="Image loaded", foreground="blue")
+            self.media_label.config(text=f"Image: {details}", foreground="blue")
         else:
             self.media_label.config(text="No media", foreground="gray")
+        self.media_label.config(image=self.thumbnail_image(meta) or "")
+
+    def thumbnail_image(self, meta):
+        path = meta.get("thumbnail") if meta else None
+        if not path:
+            return None
+        if path not in self.thumbnails:
+            try:
+                self.thumbnails[path] = tk.PhotoImage(file=path)
+            except tk.TclError:
+                self.thumbnails[path] = None
+        return self.thumbnails[path]
+
+    def surface_list_text(self, surface):
+        path = surface.get("media_path")
+        if not (path and surface.get("media_type")):
+            return surface["name"]
+        return f"{surface['name']} - {describe_media(MEDIA_PROBE.get(path))}"
+
+    def refresh_surface_list(self):
+        """Update list entries whose probe info arrived since they were drawn."""
+        for i, surface in enumerate(self.surfaces):
+            text = self.surface_list_text(surface)
+            if i < self.surface_listbox.size() and self.surface_listbox.get(i) != text:
+                selected = self.surface_listbox.selection_includes(i)
+                self.surface_listbox.delete(i)
+                self.surface_listbox.insert(i, text)
+                if selected:
+                    self.surface_listbox.selection_set(i)
+                if i == self.selected_surface:
+                    self.update_media_label()
 
     # --------- MEDIA LOADING --------- #
     def load_video_to_surface(self):
@@ -515,9 +846,45 @@ class ProjectionMapper:
             title="Select Video",
             filetypes=[("Video files", "*.mp4 *.avi *.mov *.mkv"), ("All files", "*.*")],
         )
-        if not filename:
+        if filename:
+            self.attach_video(filename)
+
+    def load_sequence_to_surface(self):
+        if self.selected_surface is None:
+            messagebox.showwarning("No Surface", "Please select a surface first")
             return
 
+        folder = filedialog.askdirectory(title="Select Image Sequence Folder")
+        if not folder:
+            return
+        if not is_image_sequence(folder):
+            messagebox.showerror("Error", "No PNG/JPEG/TIFF or .npy frames in that folder")
+            return
+        self.attach_video(folder)
+
+    def load_live_to_surface(self):
+        if self.selected_surface is None:
+            messagebox.showwarning("No Surface", "Please select a surface first")
+            return
+
+        path = ask_live_path(self.root)
+        if path:
+            self.attach_video(path)
+
+    def load_shader_to_surface(self):
+        if self.selected_surface is None:
+            messagebox.showwarning("No Surface", "Please select a surface first")
+            return
+
+        filename = filedialog.askopenfilename(
+            title="Select Shader",
+            filetypes=[("GLSL fragment shaders", "*.frag *.glsl"), ("All files", "*.*")],
+        )
+        if filename:
+            self.attach_video(filename)
+
+    def attach_video(self, filename):
+        """Play a movie file, image-sequence folder, shader or live input on the selected surface."""
         surface = self.surfaces[self.selected_surface]
         old_vid = surface.get("video_id")
         if old_vid and old_vid in self.video_sources:
@@ -530,14 +897,14 @@ class ProjectionMapper:
         # So sequential videos should NOT loop individually.
         # But concurrent ones might.
         # Let's default to loop=True, but override in playback logic.
-        self.video_sources[video_id] = VideoSource(filename, loop=True)
+        self.video_sources[video_id] = open_source(filename, loop=True)
 
         surface["video_id"] = video_id
         surface["media_type"] = "video"
         surface["media_path"] = filename
         surface["static_frame"] = None
 
-        self.media_label.config(text=f"Video: {os.path.basename(filename)}", foreground="green")
+        self.update_media_label()
         self.reset_playback() # Restart sequence logic when media changes
 
     def load_image_to_surface(self):
@@ -552,32 +919,42 @@ class ProjectionMapper:
         if not filename:
             return
 
+        # Decode off the Tk thread; the surface keeps its old media until the image is ready
         surface = self.surfaces[self.selected_surface]
-        old_vid = surface.get("video_id")
-        if old_vid and old_vid in self.video_sources:
-            self.video_sources[old_vid].release()
-            del self.video_sources[old_vid]
+        self.attach_image_when_ready(surface, filename, IMAGE_CACHE.load_async(filename))
 
-        img = cv2.imread(filename)
-        if img is None:
+    def attach_image_when_ready(self, surface, filename, future):
+        if not future.done():
+            self.root.after(15, self.attach_image_when_ready, surface, filename, future)
+            return
+        try:
+            static_frame = future.result()
+        except Exception:
+            static_frame = None
+        if static_frame is None:
             messagebox.showerror("Error", "Failed to load image")
             return
+        if not any(s is surface for s in self.surfaces):
+            return  # Surface was deleted (or a config loaded) meanwhile
 
-        h, w = img.shape[:2]
-        max_size = 1280
-        if w > max_size or h > max_size:
-            scale = max_size / max(w, h)
-            new_w, new_h = int(w * scale), int(h * scale)
-            img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
-
-        static_frame = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        old_vid = surface.get("video_id")
+        if old_vid and old_vid in self.video_sources:
+            self.video_sources[old_vid].release()
+            del self.video_sources[old_vid]
 
         surface["video_id"] = None
         surface["media_type"] = "image"
         surface["media_path"] = filename
         surface["static_frame"] = static_frame
+        PYRAMIDS.request(filename)  # Large stills get a tile pyramid in the background
 
-        self.media_label.config(text=f"Image: {os.path.basename(filename)}", foreground="blue")
+        self.update_media_label()
+
+    def set_sync_group(self, event=None):
+        if self.selected_surface is None:
+            return
+        name = self.sync_group_var.get().strip()
+        self.surfaces[self.selected_surface]["sync_group"] = name or None
 
     # --------- TRANSFORM CONTROLS --------- #
     def update_opacity(self, value):
@@ -587,17 +964,102 @@ class ProjectionMapper:
         if 0 <= idx < len(self.surfaces):
             self.surfaces[idx]["opacity"] = float(value) / 100.0
 
+    def show_surface_mask(self, surface):
+        mask = surface.get("mask") or {}
+        polygons = mask.get("polygons") or []
+        self.mask_var.set(" ".join(f"{u:g},{v:g}" for u, v in polygons[0]) if polygons else "")
+        self.mask_feather_var.set(round(float(mask.get("feather") or 0.0) * 100.0, 2))
+        self.mask_invert_var.set(bool(mask.get("invert")))
+
+    def apply_surface_mask(self):
+        if self.selected_surface is None:
+            return
+        try:
+            polygon = parse_polygon(self.mask_var.get())
+            feather = max(float(self.mask_feather_var.get()), 0.0) / 100.0
+        except (ValueError, tk.TclError) as e:
+            messagebox.showerror("Invalid Mask", str(e))
+            return
+        # A new dict: renderers re-rasterize only when the mask object changes
+        mask = {"polygons": [polygon], "feather": feather, "invert": self.mask_invert_var.get()} if polygon else None
+        self.surfaces[self.selected_surface]["mask"] = mask
+
+    def clear_surface_mask(self):
+        if self.selected_surface is None:
+            return
+        self.surfaces[self.selected_surface]["mask"] = None
+        self.show_surface_mask(self.surfaces[self.selected_surface])
+
+    # --------- EFFECTS --------- #
+    def update_effect(self, name, value):
+        if self.selected_surface is None:
+            return
+        surface = self.surfaces[self.selected_surface]
+        # set_effect returns a new dict on change: renderers redraw only when the object changes
+        surface["effects"] = set_effect(surface.get("effects"), name, round(value, 4))
+
+    def show_surface_effects(self, surface):
+        for name, (scale, units) in self.effect_scales.items():
+            scale.set(effect_value(surface.get("effects"), name) * units)
+
+    def pick_key_color(self):
+        if self.selected_surface is None:
+            return
+        surface = self.surfaces[self.selected_surface]
+        r, g, b = (int(round(v * 255)) for v in effect_value(surface.get("effects"), "key_color"))
+        rgb, _ = colorchooser.askcolor(color=f"#{r:02x}{g:02x}{b:02x}", title="Key Color")
+        if rgb is None:
+            return
+        effects = set_effect(surface.get("effects"), "key_color", [v / 255.0 for v in rgb])
+        if effect_value(effects, "key_threshold") == 0.0:
+            effects = set_effect(effects, "key_threshold", 0.1)  # Picking a colour turns the key on
+        surface["effects"] = effects
+        self.show_surface_effects(surface)
+
+    def reset_surface_effects(self):
+        if self.selected_surface is None:
+            return
+        surface = self.surfaces[self.selected_surface]
+        surface["effects"] = None
+        self.show_surface_effects(surface)
+
+    def rotate_surface(self, s, clockwise=True):
+        s["points"], grid = rotate_points(s, clockwise)
+        if grid is not None:
+            s["grid"] = grid
+
     def rotate_surface_cw(self):
         if self.selected_surface is None:
             return
-        s = self.surfaces[self.selected_surface]
-        s["points"] = np.roll(s["points"], 1, axis=0)
+        self.rotate_surface(self.surfaces[self.selected_surface], True)
 
     def rotate_surface_ccw(self):
         if self.selected_surface is None:
             return
+        self.rotate_surface(self.surfaces[self.selected_surface], False)
+
+    def make_surface_grid(self):
+        """Replace the selected surface's quad by a control grid on its current perspective."""
+        if self.selected_surface is None:
+            return
+        try:
+            cols, rows = int(self.grid_cols_var.get()), int(self.grid_rows_var.get())
+        except (tk.TclError, ValueError):
+            messagebox.showerror("Invalid Grid", "Grid size must be whole numbers")
+            return
+        if not (1 <= cols <= 16 and 1 <= rows <= 16):
+            messagebox.showerror("Invalid Grid", "Grid size must be 1..16 per axis")
+            return
         s = self.surfaces[self.selected_surface]
-        s["points"] = np.roll(s["points"], -1, axis=0)
+        s["points"] = grid_from_quad(corner_points(s), cols, rows)
+        s["grid"] = [cols, rows]
+
+    def reset_surface_quad(self):
+        if self.selected_surface is None:
+            return
+        s = self.surfaces[self.selected_surface]
+        s["points"] = np.ascontiguousarray(corner_points(s))
+        s["grid"] = None
 
     # --------- OPENGL PREVIEW INPUT --------- #
     def on_gl_click(self, event):
@@ -654,29 +1116,8 @@ class ProjectionMapper:
         self.selected_point = None
 
     # --------- FRAME ACCESS --------- #
-    def get_surface_frame(self, surface, idx=None):
-        # Sequential Mode Visibility Logic
-        if self.playback_mode.get() == "sequential":
-            if idx is None:
-                try:
-                    idx = self.surfaces.index(surface)
-                except ValueError:
-                    pass
-            
-            if idx is not None:
-                # If continuous, always show
-                if idx in self.continuous_surfaces:
-                    pass # Allow through
-                else:
-                    # Determine active surface index
-                    active_idx = -1
-                    if self.sequence_steps and self.current_sequence_index < len(self.sequence_steps):
-                        active_idx = self.sequence_steps[self.current_sequence_index]["surface_index"]
-                    
-                    # Strict check: If this surface is not the active one, hide it.
-                    if idx != active_idx:
-                        return None
-
+    def get_media_frame(self, surface):
+        """Current frame of the surface's own media, ignoring sequencing."""
         if surface["media_type"] == "video":
             vid = surface.get("video_id")
             if vid and vid in self.video_sources:
@@ -685,12 +1126,58 @@ class ProjectionMapper:
             return surface.get("static_frame")
         return None
 
+    def get_surface_layers(self, surface, idx=None):
+        """(frame_a, frame_b, mix, mode): outgoing/incoming layers blended by the renderer's shader."""
+        if idx is None:
+            try:
+                idx = self.surfaces.index(surface)
+            except ValueError:
+                pass
+        # Sequential Mode Visibility Logic (hidden surfaces get no layers)
+        return self.sequencer.layers(surface, idx, self.get_media_frame(surface))
+
+    def get_surface_pyramid(self, surface):
+        """Tile pyramid of a large still on the surface, once built (None otherwise)."""
+        if surface.get("media_type") != "image":
+            return None
+        return PYRAMIDS.get(surface.get("media_path"))
+
+    def get_surface_frame(self, surface, idx=None):
+        frame_a, frame_b, _, _ = self.get_surface_layers(surface, idx)
+        return frame_a if frame_a is not None else frame_b
+
     # --------- FULLSCREEN OUTPUT (GLFW) --------- #
     def fullscreen_output(self):
-        if self.fullscreen_window:
-            messagebox.showinfo("Info", "Fullscreen window already open")
+        try:
+            region = parse_region(self.region_var.get(), self.canvas_width, self.canvas_height)
+        except ValueError as e:
+            messagebox.showerror("Invalid Region", str(e))
+            return
+        self.open_outputs([(self.get_selected_display(), region)])
+        self.apply_output_blend(quiet=True)
+
+    def apply_output_blend(self, quiet=False):
+        """Set the edge blend of the output on the selected display (rasterized once per change)."""
+        try:
+            blend = parse_blend(self.blend_var.get(), self.blend_gamma_var.get())
+        except (ValueError, tk.TclError) as e:
+            messagebox.showerror("Invalid Edge Blend", str(e))
+            return
+        output = self.outputs.for_display(self.get_selected_display())
+        if output is None:
+            if not quiet:
+                messagebox.showinfo("Info", "Open a fullscreen output on that display first")
             return
+        output.renderer.blend = blend
 
+    def span_outputs(self):
+        """One output per display, the canvas split across them left to right."""
+        displays = sorted(self.displays, key=lambda d: (d[0], d[1]))
+        regions = split_canvas(self.canvas_width, self.canvas_height, displays)
+        self.open_outputs(list(zip(displays, regions)))
+
+    def open_outputs(self, targets):
+        """Open a fullscreen window for each (display, canvas region) not already showing one."""
         if not self.surfaces or all(s.get("media_type") is None for s in self.surfaces):
             messagebox.showwarning("No Media", "Load media on at least one surface first")
             return
@@ -699,47 +1186,52 @@ class ProjectionMapper:
             messagebox.showwarning("No Media", "Waiting for media to load. Try again.")
             return
 
-        if not glfw.init():
-            messagebox.showerror("GLFW Error", "Failed to initialize GLFW")
+        targets = [(d, r) for d, r in targets if self.outputs.for_display(d) is None]
+        if not targets:
+            messagebox.showinfo("Info", "Fullscreen output already open on that display")
             return
 
-        target_display = self.get_selected_display()
-        monitor_info = self.find_matching_monitor(target_display)
-        if monitor_info is None:
-            monitor = glfw.get_primary_monitor()
-            mode = glfw.get_video_mode(monitor)
-            width, height = mode.size.width, mode.size.height
-        else:
-            monitor = monitor_info["monitor"]
-            width = monitor_info["width"]
-            height = monitor_info["height"]
-
-        glfw.window_hint(glfw.AUTO_ICONIFY, glfw.FALSE)
-
-        self.fullscreen_window = glfw.create_window(
-            width,
-            height,
-            "Projection Mapper Fullscreen",
-            monitor,  # choose monitor here
-            None,
-        )
-
-        if not self.fullscreen_window:
-            glfw.terminate()
-            messagebox.showerror("GLFW Error", "Failed to create fullscreen window")
+        if not glfw.init():
+            messagebox.showerror("GLFW Error", "Failed to initialize GLFW")
             return
 
-        glfw.make_context_current(self.fullscreen_window)
-        glfw.swap_interval(1)
+        for display, region in targets:
+            monitor_info = self.find_matching_monitor(display)
+            if monitor_info is None:
+                monitor = glfw.get_primary_monitor()
+                mode = glfw.get_video_mode(monitor)
+                width, height = mode.size.width, mode.size.height
+            else:
+                monitor = monitor_info["monitor"]
+                width = monitor_info["width"]
+                height = monitor_info["height"]
+
+            output = self.outputs.open(monitor, width, height, display, region, self.make_output_renderer)
+            if output is None:
+                messagebox.showerror("GLFW Error", "Failed to create fullscreen window")
+                break
+            self.bind_output_events(output)
+        # Note: We do NOT run the loop here anymore. It's handled in gl_step.
 
-        self.fullscreen_renderer = GLFullscreenRenderer(
+    def make_output_renderer(self, textures, tiles, meshes, generators, effects, region):
+        return GLFullscreenRenderer(
             self.surfaces,
             self.get_surface_frame,
             selected_index=self.selected_surface,
             canvas_width=self.canvas_width,
             canvas_height=self.canvas_height,
+            get_layers_callback=self.get_surface_layers,
+            get_pyramid_callback=self.get_surface_pyramid,
+            textures=textures,
+            tiles=tiles,
+            meshes=meshes,
+            generators=generators,
+            effects=effects,
+            region=region,
         )
 
+    def bind_output_events(self, output):
+        renderer = output.renderer
         drag_state = {"surface_idx": None, "point_idx": None}
 
         def key_callback(win, key, scancode, action, mods):
@@ -748,41 +1240,32 @@ class ProjectionMapper:
             if key == glfw.KEY_ESCAPE:
                 glfw.set_window_should_close(win, True)
             elif key == glfw.KEY_E:
-                self.fullscreen_renderer.edit_mode = not self.fullscreen_renderer.edit_mode
+                renderer.edit_mode = not renderer.edit_mode
             elif key == glfw.KEY_H:
-                self.fullscreen_renderer.show_controls = not self.fullscreen_renderer.show_controls
+                renderer.show_controls = not renderer.show_controls
             elif key == glfw.KEY_R:
-                idx = self.fullscreen_renderer.selected_surface_index
+                idx = renderer.selected_surface_index
                 if idx is not None and 0 <= idx < len(self.surfaces):
-                    s = self.surfaces[idx]
-                    s["points"] = np.roll(s["points"], 1, axis=0)
+                    self.rotate_surface(self.surfaces[idx], True)
 
         def mouse_button_callback(win, button, action, mods):
             if button != glfw.MOUSE_BUTTON_LEFT:
                 return
-            x, y = glfw.get_cursor_pos(win)
-            
-            # Scale to Canvas
-            w_win, h_win = glfw.get_window_size(win)
-            # Avoid div by zero
-            if w_win == 0 or h_win == 0: return
-            
-            sx = self.canvas_width / w_win
-            sy = self.canvas_height / h_win
-            
-            cx = x * sx
-            cy = y * sy
+            # Window -> canvas coordinates of this output's region
+            point = output.canvas_point(*glfw.get_cursor_pos(win))
+            if point is None:
+                return
+            cx, cy = point
 
-            if action == glfw.PRESS and self.fullscreen_renderer.edit_mode:
+            if action == glfw.PRESS and renderer.edit_mode:
                 for i, s in enumerate(self.surfaces):
                     pts = s["points"]
                     for j, p in enumerate(pts):
-                        # Threshold also scaled? Or just check distance in canvas units.
                         # 30px on canvas is reasonable.
                         if np.hypot(cx - p[0], cy - p[1]) < 30:
                             drag_state["surface_idx"] = i
                             drag_state["point_idx"] = j
-                            self.fullscreen_renderer.selected_surface_index = i
+                            renderer.selected_surface_index = i
                             break
             elif action == glfw.RELEASE:
                 drag_state["surface_idx"] = None
@@ -791,62 +1274,105 @@ class ProjectionMapper:
         def cursor_pos_callback(win, x, y):
             i = drag_state["surface_idx"]
             j = drag_state["point_idx"]
-            if i is not None and j is not None and self.fullscreen_renderer.edit_mode:
-                w_win, h_win = glfw.get_window_size(win)
-                if w_win == 0 or h_win == 0: return
-                
-                sx = self.canvas_width / w_win
-                sy = self.canvas_height / h_win
-                
-                cx = x * sx
-                cy = y * sy
-                
-                self.surfaces[i]["points"][j] = [cx, cy]
-
-        glfw.set_key_callback(self.fullscreen_window, key_callback)
-        glfw.set_mouse_button_callback(self.fullscreen_window, mouse_button_callback)
-        glfw.set_cursor_pos_callback(self.fullscreen_window, cursor_pos_callback)
-        
-        # Note: We do NOT run the loop here anymore. It's handled in gl_step.
+            if i is not None and j is not None and renderer.edit_mode:
+                point = output.canvas_point(x, y)
+                if point is not None:
+                    self.surfaces[i]["points"][j] = list(point)
+
+        glfw.set_key_callback(output.window, key_callback)
+        glfw.set_mouse_button_callback(output.window, mouse_button_callback)
+        glfw.set_cursor_pos_callback(output.window, cursor_pos_callback)
 
     def close_fullscreen(self):
-        if self.fullscreen_window:
-            glfw.destroy_window(self.fullscreen_window)
-            self.fullscreen_window = None
-            self.fullscreen_renderer = None
-            # Do NOT terminate glfw, as we might want to open it again.
-            # glfw.terminate()
+        self.outputs.close_all()
+        # Do NOT terminate glfw, as we might want to open it again.
 
     def toggle_blackout(self, enabled):
-        if self.fullscreen_renderer:
-            self.fullscreen_renderer.blackout = enabled
+        self.outputs.set_blackout(enabled)
+
+    def toggle_record(self):
+        if not self.record_var.get():
+            self.outputs.stop_recording()
+            self.update_record_label()
+            return
+        if not self.outputs:
+            messagebox.showinfo("Record Output", "Open a fullscreen output first")
+            self.record_var.set(False)
+            return
+        filename = filedialog.asksaveasfilename(
+            title="Record Output",
+            defaultextension=".mp4",
+            initialfile=time.strftime("performance_%Y%m%d_%H%M%S.mp4"),
+            filetypes=[("MP4 video", "*.mp4"), ("AVI (MJPG)", "*.avi")],
+        )
+        if not filename:
+            self.record_var.set(False)
+            return
+        try:
+            self.outputs.start_recording(filename, round(1.0 / self.frame_period))
+        except (IOError, RuntimeError) as e:
+            messagebox.showerror("Record Output", f"Could not start recording: {e}")
+            self.record_var.set(False)
+        self.update_record_label()
+
+    def update_record_label(self):
+        recorder = self.outputs.recording()
+        if recorder is None:
+            self.record_var.set(False)  # Output closed while recording
+            self.record_label.config(text="Recording: off")
+            return
+        stats = recorder.stats()
+        text = f"● REC {stats['seconds']:.0f} s: {stats['frames']} frames, {stats['dropped']} dropped"
+        if stats["error"]:
+            text += f" (encoder failed: {stats['error']})"
+        self.record_label.config(text=text)
 
     # --------- PLAYBACK LOGIC --------- #
     def reset_playback(self):
-        self.current_sequence_index = 0
-        self.sequence_active = True
-        
-        mode = self.playback_mode.get()
-        
+        self.index_media()
+        self.sequencer.mode = self.playback_mode.get()
+        self.sequencer.reset()
+        self.sync_groups.restart()
+
+    def index_media(self):
+        """Queue probes and keyframe index scans for all media in use (cached ones load instantly)."""
+        paths = {s.get("media_path") for s in self.surfaces if s.get("media_type") == "video"}
+        paths.update(step["media_path"] for step in self.sequence_steps if step.get("media_type") == "video")
+        for path in paths:
+            self.keyframe_indexer.request(path)
+        paths.update(s.get("media_path") for s in self.surfaces if s.get("media_type") == "image")
+        paths.update(step["media_path"] for step in self.sequence_steps)
+        for path in paths:
+            MEDIA_PROBE.request(path)
+        for s in self.surfaces:
+            if s.get("media_type") == "image":
+                PYRAMIDS.request(s.get("media_path"))
+        for step in self.sequence_steps:
+            if step.get("media_type") == "image":
+                PYRAMIDS.request(step["media_path"])
+
+    def jump_to(self, seconds):
+        """Jump playing videos to a timestamp (control-panel cue)."""
+        now = self.clock.now()
+        handled = set()
+        if self.playback_mode.get() == "sequential" and self.sequencer.seek_current(seconds, now):
+            handled.add(self.sequencer.active_surface_index())
+        grouped = set()
         for i, surface in enumerate(self.surfaces):
             vid = surface.get("video_id")
-            if vid and vid in self.video_sources:
-                vs = self.video_sources[vid]
-                if mode == "concurrent":
-                    vs.loop = True
-                    vs.play()
-                else:
-                    if i in self.continuous_surfaces:
-                        vs.loop = True
-                        vs.play()
-                    else:
-                        vs.loop = False
-                        vs.stop() # Stop all initially for sequential
-
-        if mode == "sequential" and self.surfaces:
-             # Start first one
-             # Start first one
-             self.play_next_in_sequence()
+            if i in handled or not (vid and vid in self.video_sources):
+                continue
+            vs = self.video_sources[vid]
+            if not vs.playing:
+                continue
+            if surface.get("sync_group"):
+                grouped.add(surface["sync_group"])  # Members follow the group position
+                continue
+            vs.seek(seconds, self.keyframe_indexer.get(vs.filepath), start_time=now)
+        for name in grouped:
+            group = self.sync_groups.groups.get(name)
+            if group is not None:
+                group.anchor = now - seconds
 
     def open_sequence_setup(self):
         SequenceEditorDialog(
@@ -854,7 +1380,8 @@ class ProjectionMapper:
             self.surfaces, 
             self.sequence_steps, 
             self.continuous_surfaces, 
-            self.apply_sequence_setup
+            self.apply_sequence_setup,
+            image_duration=self.image_duration,
         )
 
     def apply_sequence_setup(self, new_steps, new_continuous):
@@ -867,218 +1394,355 @@ class ProjectionMapper:
         self.reset_playback()
 
     def play_next_in_sequence(self):
-        # Find next valid step
-        while self.current_sequence_index < len(self.sequence_steps):
-            step = self.sequence_steps[self.current_sequence_index]
-            idx = step["surface_index"]
-            path = step["media_path"]
-            
-            if 0 <= idx < len(self.surfaces):
-                surface = self.surfaces[idx]
-                
-                # Check if we need to load media
-                current_path = surface.get("media_path")
-                if current_path != path:
-                    # Load new media
-                    if step["media_type"] == "video":
-                        old_vid = surface.get("video_id")
-                        if old_vid and old_vid in self.video_sources:
-                            self.video_sources[old_vid].release()
-                            del self.video_sources[old_vid]
-                            
-                        video_id = f"video_{len(self.video_sources)}_{time.time()}_{idx}"
-                        self.video_sources[video_id] = VideoSource(path, loop=False) # Sequential = No Loop
-                        surface["video_id"] = video_id
-                        surface["media_type"] = "video"
-                        surface["media_path"] = path
-                        surface["static_frame"] = None
-                        
-                    elif step["media_type"] == "image":
-                        img = cv2.imread(path)
-                        if img is not None:
-                            h, w = img.shape[:2]
-                            max_size = 1280
-                            if w > max_size or h > max_size:
-                                scale = max_size / max(w, h)
-                                new_w, new_h = int(w * scale), int(h * scale)
-                                img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
-                            surface["static_frame"] = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                            surface["media_type"] = "image"
-                            surface["media_path"] = path
-                            surface["video_id"] = None
-
-                # Play
-                vid = surface.get("video_id")
-                if vid and vid in self.video_sources:
-                    vs = self.video_sources[vid]
-                    vs.loop = False
-                    vs.play()
-                    self.current_clip_start_time = time.time()
-                    return # Started
-            
-                # If it's an image, we also "start" it by setting time
-                if surface["media_type"] == "image":
-                    self.current_clip_start_time = time.time()
-                    return
-            
-            # If invalid, skip
-            self.current_sequence_index += 1
-            
-        # Sequence finished -> Loop
-        self.current_sequence_index = 0
-        self.play_next_in_sequence()
-
-    def update_playback_logic(self):
-        if self.playback_mode.get() == "sequential":
-            # Check if current playing video is finished
-            if self.current_sequence_index < len(self.sequence_steps):
-                step = self.sequence_steps[self.current_sequence_index]
-                idx = step["surface_index"]
-                if 0 <= idx < len(self.surfaces):
-                    surface = self.surfaces[idx]
-                    vid = surface.get("video_id")
-                    if vid and vid in self.video_sources:
-                        vs = self.video_sources[vid]
-                        if vs.is_finished():
-                            self.current_sequence_index += 1
-                            self.play_next_in_sequence()
-                    elif surface["media_type"] == "image":
-                        # Check duration
-                        if time.time() - self.current_clip_start_time > self.image_duration:
-                            self.current_sequence_index += 1
-                            self.play_next_in_sequence()
+        self.sequencer.play_next()
+
+    def update_playback_logic(self, now=None):
+        # Step changes, pre-buffering and crossfades are scheduler events; this
+        # only records the frame time and catches clips that end early.
+        self.sequencer.update(now)
+
+    def update_seek_label(self):
+        summary = SEEK_STATS.summary()
+        if summary:
+            self.seek_label.config(
+                text=f"Seek p50/p95/max: {summary['p50_ms']:.0f}/{summary['p95_ms']:.0f}/"
+                f"{summary['max_ms']:.0f} ms ({summary['count']})"
+            )
+
+    def update_switch_label(self):
+        summary = SWITCH_STATS.summary()
+        if summary:
+            self.switch_label.config(
+                text=f"Switch p50/p95/max: {summary['p50_ms']:.0f}/{summary['p95_ms']:.0f}/"
+                f"{summary['max_ms']:.0f} ms ({summary['count']})"
+            )
+
+    def update_image_cache_label(self):
+        stats = IMAGE_CACHE.stats()
+        if stats["hit_rate"] is None:
+            return
+        self.image_cache_label.config(
+            text=f"Image cache: {stats['hit_rate'] * 100:.0f}% hits, {stats['entries']} images, "
+            f"{stats['bytes'] / (1024 * 1024):.0f} MB"
+        )
+
+    def release_textures(self):
+        """Recycle the GPU textures of video sources released since the last frame."""
+        live = set(self.video_sources)
+        released = self.texture_sources - live
+        self.texture_sources = live
+        if not released:
+            return
+        keys = list(released) + [(vid, "incoming") for vid in released]
+        self.opengl_view.textures.release(keys)
+        self.opengl_view.effects.release(keys)  # Their effect chain outputs
+        self.outputs.release(keys)
+
+    def update_texture_label(self):
+        stats = self.opengl_view.textures.stats()
+        text = f"Textures: {stats['textures']} (+{stats['pooled']} pooled), {stats['bytes'] / (1024 * 1024):.0f} MB"
+        fs = self.outputs.stats()
+        if fs is not None:
+            text += f" | Out ({len(self.outputs)}): {fs['textures']}, {fs['bytes'] / (1024 * 1024):.0f} MB"
+        self.texture_label.config(text=text)
+
+    def update_memory(self):
+        totals = self.memory_manager.update(self.sequencer, self.surfaces, self.video_sources, slot_bank=self.slot_bank)
+        self.memory_label.config(
+            text=f"Memory: {totals['decoders']} decoders, {totals['frame_bytes'] / (1024 * 1024):.0f} MB frames, "
+            f"{totals['image_bytes'] / (1024 * 1024):.0f} MB stills ({totals['evictions']} evicted)"
+        )
+
+    def update_frame_stats_label(self):
+        rows = [(title, FRAME_STATS.stage_summary(prefix)) for title, prefix in FRAME_STAT_GROUPS]
+        stages = FRAME_STATS.summary()["stages"]
+        rows += [(title, stages.get(stage)) for title, stage in FRAME_STAT_STAGES]
+        lines = []
+        for title, summary in rows:
+            if summary:
+                line = f"{title:<10}{summary['p50_ms']:6.2f}{summary['p95_ms']:7.2f}"
+                if "mb_per_s" in summary:
+                    line += f" {summary['mb_per_s']:.0f} MB/s"
+                lines.append(line)
+        if not lines:
+            return
+        late_frames = FRAME_STATS.total("late:render_loop")
+        lines.append(
+            f"dropped {FRAME_STATS.total('dropped:')}, late decode {FRAME_STATS.total('late:') - late_frames}, "
+            f"late frames {late_frames}"
+        )
+        for vs in list(self.video_sources.values()):
+            if isinstance(vs, NetworkSource):
+                s = vs.stats()
+                lines.append(
+                    f"{source_name(vs.url)}: {s['state']}, buffer {s['depth']}/{s['depth_limit']}, lost {s['lost']}, "
+                    f"underruns {s['underruns']}, stalls {s['stalls']}, reconnects {s['reconnects']}"
+                )
+        self.frame_stats_label.config(text=f"{'stage':<10}{'p50':>6}{'p95':>7} ms\n" + "\n".join(lines))
+
+    def save_frame_stats(self):
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".json", filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        try:
+            FRAME_STATS.dump(filename)
+            print(f"Frame stats saved to {filename}")
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not save frame stats: {e}")
+
+    def toggle_trace(self):
+        TRACE.enabled = self.trace_var.get()
+        if not TRACE.enabled:
+            TRACE.clear()
+
+    def save_trace(self):
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".json", filetypes=[("Chrome trace", "*.json"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        try:
+            count = TRACE.dump(filename)
+            print(f"{count} trace events saved to {filename} (open in ui.perfetto.dev or chrome://tracing)")
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not save trace: {e}")
+
+    def print_memory_report(self):
+        print(self.memory_manager.format_report())
+
+    def update_sync_label(self):
+        stats = self.sync_groups.stats()
+        if not stats:
+            self.sync_label.config(text="Sync: --")
+            return
+        parts = [f"{name}: {g['drift_frames']:.1f}f" for name, g in sorted(stats.items())]
+        self.sync_label.config(text="Sync drift " + ", ".join(parts))
+
+    def update_transition_label(self):
+        report = self.sequencer.last_transition_report
+        if report is self.last_transition_report:
+            return
+        self.last_transition_report = report
+        self.transition_label.config(
+            text=(
+                f"Transition ({report['type']}): {report['decoders']} decoders, "
+                f"{report['decode_ms_avg']:.1f}/{report['decode_ms_max']:.1f} ms, "
+                f"{report['late_iterations']} late"
+            )
+        )
 
     # --------- SAVE CONFIG --------- #
     def save_config(self):
         filename = filedialog.asksaveasfilename(
             title="Save Configuration",
-            defaultextension=".npy",
-            filetypes=[("NumPy files", "*.npy"), ("All files", "*.*")],
+            defaultextension=SHOW_EXTENSION,
+            filetypes=[("Show files", "*" + SHOW_EXTENSION), ("All files", "*.*")],
         )
         if not filename:
             return
+        if filename.lower().endswith(".npy"):
+            filename = os.path.splitext(filename)[0] + SHOW_EXTENSION  # .npy is read-only (legacy)
 
         config = {
-            "surfaces": [
-                {
-                    "points": s["points"].tolist(), 
-                    "opacity": s["opacity"], 
-                    "name": s["name"],
-                    "media_path": s.get("media_path")
-                }
-                for s in self.surfaces
-            ],
-            "playback_mode": self.playback_mode.get(),
+            "surfaces": self.surfaces,
             "playback_mode": self.playback_mode.get(),
             "sequence_steps": self.sequence_steps,
             "continuous_surfaces": list(self.continuous_surfaces)
         }
-        np.save(filename, config)
+        try:
+            save_show(filename, config)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save config: {e}")
+            return
         messagebox.showinfo("Saved", "Configuration saved successfully")
 
     def load_config(self):
         filename = filedialog.askopenfilename(
             title="Load Configuration",
-            filetypes=[("NumPy files", "*.npy"), ("All files", "*.*")],
+            filetypes=[
+                ("Show files", "*" + SHOW_EXTENSION),
+                ("Legacy NumPy configs", "*.npy"),
+                ("All files", "*.*"),
+            ],
         )
         if filename:
             self.load_config_from_file(filename)
 
     def load_config_from_file(self, filename, silent=False):
+        self.switch_started = time.perf_counter()
+        TRACE.instant("config load", "config", {"file": os.path.basename(filename)})
         try:
-            config = np.load(filename, allow_pickle=True).item()
-            if "surfaces" not in config:
-                messagebox.showerror("Error", "Invalid configuration file")
-                return
-
-            # Clear existing surfaces
-            self.surfaces.clear()
-            self.surface_listbox.delete(0, tk.END)
-            self.selected_surface = None
-            self.opengl_view.selected_surface_index = None
-            self.sequence_order = []
-            
-            # Release existing videos
-            for vs in list(self.video_sources.values()):
-                vs.release()
-            self.video_sources.clear()
-
-            # Load new surfaces
-            for i, s_data in enumerate(config["surfaces"]):
-                surface = {
-                    "points": np.array(s_data["points"], dtype=np.float32),
-                    "opacity": s_data["opacity"],
-                    "name": s_data["name"],
-                    "video_id": None,
-                    "media_type": None,
-                    "media_path": s_data.get("media_path"),
-                    "static_frame": None,
-                }
-                
-                # Load Media if path exists
-                path = surface["media_path"]
-                if path and os.path.exists(path):
-                    if path.lower().endswith(('.mp4', '.avi', '.mov', '.mkv')):
-                        video_id = f"video_{len(self.video_sources)}_{time.time()}_{i}"
-                        self.video_sources[video_id] = VideoSource(path, loop=True)
-                        surface["video_id"] = video_id
-                        surface["media_type"] = "video"
-                    elif path.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')):
-                        img = cv2.imread(path)
-                        if img is not None:
-                            h, w = img.shape[:2]
-                            max_size = 1280
-                            if w > max_size or h > max_size:
-                                scale = max_size / max(w, h)
-                                new_w, new_h = int(w * scale), int(h * scale)
-                                img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
-                            surface["static_frame"] = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                            surface["media_type"] = "image"
-
-                self.surfaces.append(surface)
-                self.surface_listbox.insert(tk.END, surface["name"])
-                
-            # Load settings
-            if "playback_mode" in config:
-                self.playback_mode.set(config["playback_mode"])
-            if "sequence_steps" in config:
-                self.sequence_steps = config["sequence_steps"]
-            elif "sequence_order" in config:
-                # Migrate old format
-                self.sequence_steps = []
-                for idx in config["sequence_order"]:
-                    if 0 <= idx < len(self.surfaces):
-                        s = self.surfaces[idx]
-                        if s["media_path"]:
-                            self.sequence_steps.append({
-                                "surface_index": idx,
-                                "media_path": s["media_path"],
-                                "media_type": s["media_type"]
-                            })
-            else:
-                self.sequence_steps = []
-            
-            if "continuous_surfaces" in config:
-                self.continuous_surfaces = set(config["continuous_surfaces"])
-            else:
-                self.continuous_surfaces = set()
-
-            self.reset_playback()
+            prepared = self.slot_bank.take(filename)
+            if prepared is not None and prepared.error is not None:
+                raise prepared.error
+            config = prepared.config if prepared is not None else load_config(filename)
+            self.apply_config(config, prepared)
             if not silent:
                 messagebox.showinfo("Loaded", "Configuration loaded successfully")
-            
+
         except Exception as e:
+            self.switch_started = None
             if not silent:
                 messagebox.showerror("Error", f"Failed to load config: {e}")
             else:
                 print(f"Error loading config: {e}")
 
+    def apply_config(self, config, prepared=None):
+        """Switch to a config, keeping sources whose media didn't change.
+
+        The new surface list is built off to the side (pre-warmed media from
+        `prepared` where available) and swapped in at once, so the renderer
+        never sees a half-loaded config.
+        """
+        start = time.perf_counter()
+        self.sequencer.cancel_pending()
+        self.sequencer.cancel_cues()
+
+        new_surfaces, new_sources = diff_surfaces(self.surfaces, config["surfaces"], prepared)
+        self.video_sources.update(new_sources)
+        self.surfaces[:] = new_surfaces
+
+        # Release sources no surface references anymore
+        in_use = {s["video_id"] for s in self.surfaces if s.get("video_id")}
+        for vid in [vid for vid in self.video_sources if vid not in in_use]:
+            self.video_sources.pop(vid).release()
+        if prepared is not None:
+            prepared.discard()
+
+        self.surface_listbox.delete(0, tk.END)
+        for surface in self.surfaces:
+            self.surface_listbox.insert(tk.END, self.surface_list_text(surface))
+        self.selected_surface = None
+        self.opengl_view.selected_surface_index = None
+
+        # Load settings
+        if "playback_mode" in config:
+            self.playback_mode.set(config["playback_mode"])
+        # Legacy .npy configs (incl. sequence_order) are migrated by the loader
+        self.sequence_steps = config.get("sequence_steps", [])
+        self.continuous_surfaces = set(config.get("continuous_surfaces", []))
+
+        self.reset_playback()
+        TRACE.complete("apply config", start, time.perf_counter(), "config", {"new_sources": len(new_sources)})
+        print(
+            f"Config applied in {(time.perf_counter() - start) * 1000:.1f} ms "
+            f"({len(new_sources)} new sources, {'prepared' if prepared else 'cold'})"
+        )
+
+    # --------- REMOTE CONTROL --------- #
+    def toggle_remote(self):
+        if self.remote:
+            self.remote.stop()
+            self.remote = None
+        if self.remote_var.get():
+            self.remote = RemoteServer(host="0.0.0.0" if self.remote_lan_var.get() else "127.0.0.1")
+            listening = self.remote.start()
+            print(f"Remote control listening on {', '.join(listening) or 'nothing'}")
+        self.update_remote()
+
+    def update_remote(self):
+        if not self.remote:
+            self.remote_label.config(text="Remote: off")
+            return
+        self.remote.publish(
+            {
+                "mode": self.playback_mode.get(),
+                "sequence_step": self.sequencer.current_index + 1,
+                "sequence_steps": len(self.sequence_steps),
+                "surfaces": len(self.surfaces),
+                "blackout": self.outputs.blackout,
+                "outputs": len(self.outputs),
+            }
+        )
+        text = f"Remote: OSC {self.remote.osc_port}, WS {self.remote.ws_port}"
+        summary = self.remote.latency.summary()
+        if summary:
+            text += f" | p50 {summary['p50_ms']:.1f} / p95 {summary['p95_ms']:.1f} ms"
+        self.remote_label.config(text=text)
+
+    def remote_surface(self, number):
+        if 1 <= number <= len(self.surfaces):
+            return self.surfaces[number - 1]
+        print(f"Remote: no surface {number}")
+        return None
+
+    def apply_remote_command(self, command):
+        """Apply a RemoteCommand on the render thread (called at the start of gl_step)."""
+        address, args = command.address, command.args
+        TRACE.instant("remote " + address, "remote", {"args": list(args), "source": command.source})
+        if address == "/slot/go":
+            panel = self.control_panel
+            if not (panel and panel.winfo_exists()):
+                print("Remote: open the Live Control Panel to use slots")
+            elif not panel.show_enabled:
+                print("Remote: show is disabled")
+            elif not (1 <= args[0] <= len(panel.config_slots) and panel.config_slots[args[0] - 1]):
+                print(f"Remote: slot {args[0]} is empty")
+            else:
+                self.load_config_from_file(panel.config_slots[args[0] - 1], silent=True)
+        elif address in ("/sequence/next", "/sequence/prev"):
+            if self.playback_mode.get() == "sequential":
+                self.sequencer.skip(1 if address == "/sequence/next" else -1)
+        elif address == "/blackout":
+            self.toggle_blackout(bool(args[0]))
+        elif address == "/surface/opacity":
+            surface = self.remote_surface(args[0])
+            if surface is not None:
+                surface["opacity"] = min(max(args[1], 0.0), 1.0)
+                if self.selected_surface == args[0] - 1:
+                    self.opacity_scale.set(surface["opacity"] * 100)
+        elif address == "/surface/corner":
+            surface = self.remote_surface(args[0])
+            if surface is not None and 1 <= args[1] <= 4:
+                surface["points"][corner_indices(surface)[args[1] - 1]] = [args[2], args[3]]
+        elif address == "/surface/param":
+            surface = self.remote_surface(args[0])
+            vs = self.video_sources.get(surface.get("video_id")) if surface is not None else None
+            if isinstance(vs, ShaderSource):
+                vs.set_param(args[1], args[2])
+        elif address == "/surface/effect":
+            surface = self.remote_surface(args[0])
+            if surface is not None:
+                try:
+                    surface["effects"] = set_effect(surface.get("effects"), args[1], args[2])
+                except ValueError as e:
+                    print(f"Remote: {e}")
+                else:
+                    if self.selected_surface == args[0] - 1:
+                        self.show_surface_effects(surface)
+        elif address == "/surface/points":
+            surface = self.remote_surface(args[0])
+            if surface is not None:
+                surface["points"] = np.array(args[1:], dtype=np.float32).reshape(4, 2)
+                surface["grid"] = None
+
     def launch_control_panel(self):
-        LiveControlPanel(self.root, self.load_config_from_file, self.toggle_blackout)
+        self.control_panel = LiveControlPanel(
+            self.root,
+            self.load_config_from_file,
+            self.toggle_blackout,
+            scheduler=self.scheduler,
+            clock=self.clock,
+            jump_callback=self.jump_to,
+            prepare_callback=self.slot_bank.prepare,
+            forget_callback=self.slot_bank.forget,
+        )
 
     # --------- CLEANUP --------- #
     def shutdown(self):
+        self.close_fullscreen()
+        if self.remote:
+            self.remote.stop()
+            self.remote = None
         self.stop_video_thread()
+        self.keyframe_indexer.shutdown()
+        self.slot_bank.release_all()
+        self.memory_manager.shutdown()
+        MEDIA_PROBE.shutdown()
+        IMAGE_CACHE.shutdown()
+        PYRAMIDS.shutdown()
         for vs in list(self.video_sources.values()):
             vs.release()
         self.video_sources.clear()
@@ -1093,7 +1757,13 @@ class ProjectionMapper:
 # ==========================
 # Entry Point
 # ==========================
-def main():
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["render"]:
+        # Headless offline render (no Tk window)
+        from .offline_render import main as render_main
+        return render_main(argv[1:])
+
     root = tk.Tk()
     app = ProjectionMapper(root)
 
@@ -1105,4 +1775,4 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,142 @@
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+MASK_SIZE = 512  # Surface masks are rasterized at MASK_SIZE x MASK_SIZE in texture space
+MASK_CACHE_ENTRIES = 512  # More than the masked surfaces of a show, or lookups would re-rasterize
+BLEND_GAMMA = 2.2
+BLEND_CURVE = 2.0  # Ramp steepness in linear light (1 = linear)
+
+
+def rasterize_mask(mask, size=MASK_SIZE):
+    """Surface mask settings -> (size, size) uint8 coverage, or None if there are no polygons.
+
+    `mask` is {"polygons": [[[u, v], ...], ...], "feather": f, "invert": bool}
+    with u, v in 0..1 over the surface's media (v = 0 at the top edge) and
+    feather as a fraction of the surface size.
+    """
+    polygons = [p for p in (mask.get("polygons") or []) if len(p) >= 3]
+    if not polygons:
+        return None
+    scale = (size - 1) * 16  # 4 fractional bits (cv2 shift) for sub-pixel edges
+    pts = [np.round(np.asarray(p, dtype=np.float64) * scale).astype(np.int32) for p in polygons]
+    img = np.zeros((size, size), dtype=np.uint8)
+    cv2.fillPoly(img, pts, 255, lineType=cv2.LINE_AA, shift=4)
+    feather = float(mask.get("feather") or 0.0)
+    if feather > 0.0:
+        img = cv2.GaussianBlur(img, (0, 0), feather * size)
+    if mask.get("invert"):
+        img = 255 - img
+    return img
+
+
+def blend_ramp(n, width, gamma=BLEND_GAMMA, curve=BLEND_CURVE):
+    """Edge-blend gain for n pixels, ramping up over the first `width`.
+
+    The ramp is shaped in linear light so two overlapping projectors sum to
+    1 (f(t) + f(1 - t) = 1), then gamma-encoded for the signal.
+    """
+    t = np.clip((np.arange(n, dtype=np.float64) + 0.5) / max(width, 1e-6), 0.0, 1.0)
+    lo = 0.5 * (2.0 * t) ** curve
+    hi = 1.0 - 0.5 * (2.0 * (1.0 - t)) ** curve
+    return np.where(t < 0.5, lo, hi) ** (1.0 / gamma)
+
+
+def rasterize_blend(blend, width, height):
+    """Per-output edge blend -> (height, width) uint16 gain image, row 0 at the bottom (gl_FragCoord).
+
+    `blend` is {"left", "right", "top", "bottom": zone width in output
+    pixels, "gamma", "curve"}; None if every zone is 0.
+    """
+    zones = [float(blend.get(side) or 0.0) for side in ("left", "right", "top", "bottom")]
+    if not any(zones):
+        return None
+    left, right, top, bottom = zones
+    gamma = float(blend.get("gamma") or BLEND_GAMMA)
+    curve = float(blend.get("curve") or BLEND_CURVE)
+    gx = np.ones(width)
+    gy = np.ones(height)
+    if left:
+        gx *= blend_ramp(width, left, gamma, curve)
+    if right:
+        gx *= blend_ramp(width, right, gamma, curve)[::-1]
+    if bottom:
+        gy *= blend_ramp(height, bottom, gamma, curve)
+    if top:
+        gy *= blend_ramp(height, top, gamma, curve)[::-1]
+    # 16-bit so the ramps don't band
+    return np.round(np.outer(gy, gx) * 65535.0).astype(np.uint16)
+
+
+def parse_polygon(text):
+    """'u,v u,v u,v ...' (or ';'-separated) -> [[u, v], ...]; an empty string gives []."""
+    points = []
+    for pair in text.replace(";", " ").split():
+        try:
+            u, v = (float(x) for x in pair.split(","))
+        except ValueError:
+            raise ValueError(f"Bad mask point {pair!r} (expected u,v)")
+        points.append([u, v])
+    if points and len(points) < 3:
+        raise ValueError("A mask polygon needs at least 3 points")
+    return points
+
+
+def parse_blend(text, gamma=BLEND_GAMMA):
+    """'left,right,top,bottom' zone widths in output pixels -> blend dict, or None if empty/all 0."""
+    text = text.strip()
+    if not text:
+        return None
+    try:
+        zones = [float(v) for v in text.replace(" ", "").split(",")]
+    except ValueError:
+        raise ValueError("Edge blend must be left,right,top,bottom (pixels)")
+    if len(zones) != 4 or any(z < 0 for z in zones):
+        raise ValueError("Edge blend must be 4 non-negative widths: left,right,top,bottom")
+    if not any(zones):
+        return None
+    return dict(zip(("left", "right", "top", "bottom"), zones), gamma=float(gamma))
+
+
+class MaskCache:
+    """Rasterized masks, keyed by the settings dict that produced them.
+
+    Editing a mask or blend replaces its dict, so a lookup is an identity
+    check and rasterization only runs after an edit. The returned arrays are
+    stable objects, so TextureManager skips re-uploading them every frame.
+    """
+
+    def __init__(self, size=MASK_CACHE_ENTRIES):
+        self.size = size
+        self.entries = OrderedDict()  # (id(settings), shape) -> (settings, array or None)
+        self.lock = threading.Lock()
+
+    def _get(self, settings, shape, build):
+        key = (id(settings), shape)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] is settings:
+                self.entries.move_to_end(key)
+                return entry[1]
+        image = build()
+        with self.lock:
+            self.entries[key] = (settings, image)  # Holding `settings` keeps its id unique
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return image
+
+    def surface_mask(self, mask):
+        if not mask:
+            return None
+        return self._get(mask, None, lambda: rasterize_mask(mask))
+
+    def output_blend(self, blend, width, height):
+        if not blend:
+            return None
+        return self._get(blend, (width, height), lambda: rasterize_blend(blend, width, height))
+
+
+# Shared by the preview and every output (rasterized once, uploaded per context)
+MASKS = MaskCache()
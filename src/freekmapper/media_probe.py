@@ -0,0 +1,286 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from .cache import cache_dir, media_key
+from .image_sequence import list_frames, load_frame, sequence_settings
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+SHADER_EXTENSIONS = ('.frag', '.glsl')  # Generative fragment shaders (see shader_source)
+NETWORK_SCHEMES = ('rtsp://', 'rtsps://', 'rtmp://', 'srt://', 'udp://', 'rtp://', 'tcp://', 'http://', 'https://')
+# Live inputs (see live_sources and network_source), e.g. "camera:0", "shm:generator", "rtsp://host/stream"
+LIVE_SCHEMES = ('camera:', 'shm:') + NETWORK_SCHEMES
+
+
+def is_live_path(path):
+    return bool(path) and path.startswith(LIVE_SCHEMES)
+
+
+def is_network_path(path):
+    return bool(path) and path.startswith(NETWORK_SCHEMES)
+
+
+def is_shader_path(path):
+    return bool(path) and not is_live_path(path) and path.partition("#")[0].lower().endswith(SHADER_EXTENSIONS)
+
+
+def parse_media_options(path):
+    """'path#jitter=250&speed=2' -> ('path', {'jitter': 250.0, 'speed': 2.0}) for streams and shaders."""
+    base, _, fragment = path.partition("#")
+    options = {}
+    for item in fragment.split("&") if fragment else ():
+        key, _, value = item.partition("=")
+        try:
+            options[key] = float(value)
+        except ValueError:
+            print(f"Ignoring media option {item!r} in {path}")
+    return base, options
+
+
+def media_available(path):
+    """True if the media a path refers to can be opened (live inputs are tried when opened)."""
+    if is_live_path(path):
+        return True
+    if is_shader_path(path):
+        return os.path.isfile(parse_media_options(path)[0])
+    return os.path.exists(path)
+
+
+def endless_meta(path):
+    """Metadata of a live input or shader: no length or thumbnail, plays until the step ends."""
+    live = is_live_path(path)
+    return {
+        "type": "video", "live": live, "endless": True, "width": 0, "height": 0, "fps": None, "frame_count": None,
+        "duration": None, "codec": path.split(":", 1)[0] if live else "glsl", "size": 0, "mtime_ns": 0, "thumbnail": None,
+    }
+
+
+def media_type_for_path(path):
+    if is_live_path(path) or is_shader_path(path):
+        return "video"
+    if os.path.isdir(path):
+        return "video" if list_frames(path) else None  # Image sequence folder
+    if path.lower().endswith(VIDEO_EXTENSIONS):
+        return "video"
+    if path.lower().endswith(IMAGE_EXTENSIONS):
+        return "image"
+    return None
+
+
+def _fourcc(value):
+    code = int(value)
+    text = "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4))
+    return text.strip("\x00 ") or None
+
+
+def probe_media(path):
+    """Basic metadata of a media file without decoding it (images are read once for their size).
+
+    Returns a dict with type, width, height, fps, frame_count, duration,
+    codec, size and mtime_ns; raises IOError if the file can't be opened.
+    """
+    if is_live_path(path) or is_shader_path(path):
+        return endless_meta(path)
+    st = os.stat(path)
+    media_type = media_type_for_path(path)
+    meta = {
+        "type": media_type,
+        "width": 0,
+        "height": 0,
+        "fps": None,
+        "frame_count": None,
+        "duration": None,
+        "codec": None,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+    }
+    if media_type == "video" and os.path.isdir(path):
+        frames = list_frames(path)
+        settings = sequence_settings(path)
+        first = load_frame(frames[0], max_size=1 << 30)
+        meta.update(
+            width=first.shape[1],
+            height=first.shape[0],
+            fps=settings["fps"],
+            frame_count=len(frames),
+            duration=len(frames) / settings["fps"],
+            codec="sequence/" + os.path.splitext(frames[0])[1].lstrip(".").lower(),
+        )
+    elif media_type == "video":
+        cap = cv2.VideoCapture(path)
+        try:
+            if not cap.isOpened():
+                raise IOError(f"Could not open {path}")
+            fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+            meta.update(
+                width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                fps=fps or None,
+                frame_count=frame_count or None,
+                duration=frame_count / fps if fps and frame_count else None,
+                codec=_fourcc(cap.get(cv2.CAP_PROP_FOURCC)),
+            )
+        finally:
+            cap.release()
+    elif media_type == "image":
+        img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if img is None:
+            raise IOError(f"Could not read {path}")
+        meta["height"], meta["width"] = img.shape[:2]
+        meta["codec"] = os.path.splitext(path)[1].lstrip(".").lower()
+    return meta
+
+
+PROBE_VERSION = 1
+THUMBNAIL_SIZE = 96
+
+
+def make_thumbnail(path, meta, size=THUMBNAIL_SIZE):
+    """Small BGR preview frame (about one second in for videos, to skip fade-ins), or None."""
+    if meta["type"] == "video" and os.path.isdir(path):
+        frames = list_frames(path)
+        if not frames:
+            return None
+        img = cv2.cvtColor(np.asarray(load_frame(frames[min(len(frames) - 1, int(meta.get("fps") or 0))])), cv2.COLOR_RGB2BGR)
+    elif meta["type"] == "video":
+        cap = cv2.VideoCapture(path)
+        try:
+            frame_count = meta.get("frame_count") or 0
+            if meta.get("fps") and frame_count > 1:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, min(int(meta["fps"]), frame_count // 2))
+            ret, img = cap.read()
+        finally:
+            cap.release()
+        if not ret:
+            return None
+    elif meta["type"] == "image":
+        img = cv2.imread(path)
+        if img is None:
+            return None
+    else:
+        return None
+    h, w = img.shape[:2]
+    scale = size / max(w, h)
+    return cv2.resize(img, (max(int(w * scale), 1), max(int(h * scale), 1)), interpolation=cv2.INTER_AREA)
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(seconds, 60)
+    return f"{int(minutes)}:{seconds:04.1f}"
+
+
+def describe_media(meta):
+    """Short one-line summary for lists, e.g. '0:12.0 1920x1080 h264'."""
+    if meta is None:
+        return "probing..."
+    if "error" in meta:
+        return "unreadable"
+    if meta.get("endless"):
+        return f"live {meta['codec']}" if meta.get("live") else "generative shader"
+    parts = []
+    if meta["type"] == "video":
+        parts.append(format_duration(meta.get("duration")))
+    if meta.get("width"):
+        parts.append(f"{meta['width']}x{meta['height']}")
+    if meta.get("codec"):
+        parts.append(meta["codec"])
+    return " ".join(parts)
+
+
+class MediaProbe:
+    """Background metadata + thumbnail extraction with an on-disk cache keyed by path + mtime + size.
+
+    get() never blocks: it returns the cached metadata (with a "thumbnail"
+    PNG path) or None and queues a probe. Results are kept in memory too,
+    so UI code can poll it every few hundred ms.
+    """
+
+    def __init__(self, workers=2):
+        self.workers = workers
+        self.pool = None
+        self.directory = None
+        self.results = {}  # key -> meta
+        self.in_flight = set()
+        self.lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self.pool is None:
+            self.directory = cache_dir("probe")
+            self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="media-probe")
+
+    def get(self, path):
+        """Metadata for `path` if probed (requesting it otherwise)."""
+        if not path:
+            return None
+        if is_live_path(path) or is_shader_path(path):
+            return endless_meta(path)
+        try:
+            key = media_key(path)
+        except OSError:
+            return None
+        with self.lock:
+            meta = self.results.get(key)
+        if meta is None:
+            self._submit(path, key)
+        return meta
+
+    def request(self, path):
+        """Queue a probe (no-op if cached or already running)."""
+        self.get(path)
+
+    def _submit(self, path, key):
+        with self.lock:
+            if key in self.results or key in self.in_flight:
+                return
+            self.in_flight.add(key)
+            self._ensure_started()
+        self.pool.submit(self._load_or_probe, path, key)
+
+    def _load_or_probe(self, path, key):
+        meta = None
+        try:
+            meta_file = os.path.join(self.directory, key + ".json")
+            if os.path.exists(meta_file):
+                try:
+                    with open(meta_file) as f:
+                        data = json.load(f)
+                    if data.get("version") == PROBE_VERSION:
+                        meta = data["meta"]
+                except (ValueError, KeyError):
+                    meta = None
+            if meta is None:
+                meta = probe_media(path)
+                thumb = make_thumbnail(path, meta)
+                meta["thumbnail"] = None
+                if thumb is not None:
+                    thumb_file = os.path.join(self.directory, key + ".png")
+                    if cv2.imwrite(thumb_file, thumb):
+                        meta["thumbnail"] = thumb_file
+                tmp = meta_file + ".tmp"
+                with open(tmp, "w") as f:
+                    json.dump({"version": PROBE_VERSION, "meta": meta}, f)
+                os.replace(tmp, meta_file)
+        except Exception as e:
+            print(f"Media probe failed for {path}: {e}")
+            meta = {"type": media_type_for_path(path), "error": str(e)}
+        finally:
+            with self.lock:
+                self.in_flight.discard(key)
+                if meta is not None:
+                    self.results[key] = meta
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+
+
+# Shared by the UI, show files and decoders
+MEDIA_PROBE = MediaProbe()
@@ -0,0 +1,275 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .image_cache import IMAGE_CACHE
+
+MB = 1024 * 1024
+MEMORY_BUDGETS = {
+    "decoders": 8,  # Open video decoders / sequence prefetch rings
+    "frame_bytes": 512 * MB,  # Frames held by sources (current frame, resize buffers, rings)
+    "image_bytes": 512 * MB,  # Still frames attached to surfaces
+}
+WARM_AHEAD = 2  # Upcoming sequence steps kept resident (and re-warmed if evicted)
+
+
+class MemoryManager:
+    """Keeps sequential shows within RAM budgets for decoders, source frames and stills.
+
+    Each pass classifies every surface's media as playing (current step,
+    transition, continuous surfaces), upcoming (the next WARM_AHEAD steps)
+    or idle. While a budget is exceeded, the idle media used longest ago is
+    evicted: video sources are suspended (decoder closed, frames dropped,
+    reopened on play) and stills are detached from their surface (the
+    shared IMAGE_CACHE may still hold them). Evicted upcoming media is
+    re-warmed in the background so the step starts without a stall.
+
+    Media pre-warmed for the Live Control Panel slots (slot_cache.SlotBank)
+    counts against the same budgets and is evicted after idle surface media:
+    its videos are suspended (reopened when the slot goes on stage) and its
+    stills dropped (reloaded from the image cache).
+
+    Concurrent mode plays everything, so only slot media is evicted there.
+    """
+
+    def __init__(self, budgets=None, warm_ahead=WARM_AHEAD):
+        self.budgets = dict(MEMORY_BUDGETS, **(budgets or {}))
+        self.warm_ahead = warm_ahead
+        self.last_active = {}  # id(surface) -> time its media was last playing/upcoming
+        self.warming = set()  # video ids being re-warmed
+        self.image_loads = {}  # id(surface) -> (surface, path, Future)
+        self.pool = None
+        self.lock = threading.Lock()
+        self.evictions = 0
+        self.rewarms = 0
+        self.report = []  # Per-source usage of the last pass
+        self.totals = {}
+
+    # --------- CLASSIFICATION --------- #
+    def classify(self, sequencer, surfaces):
+        """(playing, upcoming) sets of surface indices."""
+        if sequencer.mode != "sequential":
+            return set(range(len(surfaces))), set()
+        playing = set(sequencer.continuous_surfaces)
+        playing.add(sequencer.active_surface_index())
+        tr = sequencer.transition
+        if tr is not None:
+            playing.update((tr.from_surface, tr.to_surface))
+
+        upcoming = set()
+        steps = sequencer.steps
+        index = sequencer.current_index
+        for _ in range(min(self.warm_ahead, len(steps))):
+            index = (index + 1) % len(steps)
+            i = steps[index]["surface_index"]
+            if 0 <= i < len(surfaces) and i not in playing:
+                upcoming.add(i)
+        return playing, upcoming
+
+    # --------- USAGE --------- #
+    def _usage(self, surfaces, video_sources, playing, upcoming):
+        report = []
+        seen_images = set()
+        for i, surface in enumerate(surfaces):
+            state = "playing" if i in playing else "upcoming" if i in upcoming else "idle"
+            row = {
+                "surface": i,
+                "name": surface.get("name"),
+                "path": surface.get("media_path"),
+                "state": state,
+                "kind": None,
+                "resident": False,
+                "decoder_bytes": 0,
+                "frame_bytes": 0,
+                "image_bytes": 0,
+            }
+            vid = surface.get("video_id")
+            if vid and vid in video_sources:
+                usage = video_sources[vid].memory_usage()
+                row.update(kind="video", resident=usage["open"], decoder_bytes=usage["decoder"], frame_bytes=usage["frames"])
+            elif surface.get("media_type") == "image":
+                row["kind"] = "image"
+                frame = surface.get("static_frame")
+                if frame is not None:
+                    row["resident"] = True
+                    if id(frame) not in seen_images:  # Shared stills count once
+                        seen_images.add(id(frame))
+                        row["image_bytes"] = frame.nbytes
+            else:
+                continue
+            report.append(row)
+        return report, seen_images
+
+    @staticmethod
+    def _slot_usage(slot_bank, seen_images):
+        report = []
+        for prepared in slot_bank.configs() if slot_bank is not None else []:
+            for path, media_type, media in prepared.media_items():
+                row = {
+                    "surface": None,
+                    "slot": prepared,
+                    "media": media,
+                    "name": f"Slot {os.path.basename(prepared.path)}",
+                    "path": path,
+                    "state": "slot",
+                    "kind": media_type,
+                    "resident": True,
+                    "decoder_bytes": 0,
+                    "frame_bytes": 0,
+                    "image_bytes": 0,
+                }
+                if media_type == "video":
+                    usage = media.memory_usage()
+                    row.update(resident=usage["open"], decoder_bytes=usage["decoder"], frame_bytes=usage["frames"])
+                elif id(media) not in seen_images:
+                    seen_images.add(id(media))
+                    row["image_bytes"] = media.nbytes
+                report.append(row)
+        return report
+
+    @staticmethod
+    def _totals(report):
+        return {
+            "decoders": sum(1 for r in report if r["kind"] == "video" and r["resident"]),
+            "decoder_bytes": sum(r["decoder_bytes"] for r in report),
+            "frame_bytes": sum(r["frame_bytes"] for r in report),
+            "image_bytes": sum(r["image_bytes"] for r in report),
+        }
+
+    def _over_budget(self, totals):
+        """Budget keys currently exceeded."""
+        over = set()
+        if totals["decoders"] > self.budgets["decoders"]:
+            over.add("decoders")
+        if totals["frame_bytes"] > self.budgets["frame_bytes"]:
+            over.add("frame_bytes")
+        if totals["image_bytes"] > self.budgets["image_bytes"]:
+            over.add("image_bytes")
+        return over
+
+    # --------- PASS --------- #
+    def update(self, sequencer, surfaces, video_sources, now=None, slot_bank=None):
+        """Evict idle media over budget, re-warm upcoming media and refresh the usage report."""
+        now = time.perf_counter() if now is None else now
+        self._attach_loaded_images()
+        playing, upcoming = self.classify(sequencer, surfaces)
+        for i in playing | upcoming:
+            self.last_active[id(surfaces[i])] = now
+        live = {id(s) for s in surfaces}
+        for key in [key for key in self.last_active if key not in live]:
+            del self.last_active[key]
+
+        report, seen_images = self._usage(surfaces, video_sources, playing, upcoming)
+        report += self._slot_usage(slot_bank, seen_images)
+        totals = self._totals(report)
+        over = self._over_budget(totals)
+        if over:
+            idle = [r for r in report if r["state"] == "idle" and r["resident"]]
+            idle.sort(key=lambda r: self.last_active.get(id(surfaces[r["surface"]]), 0.0))
+            idle += [r for r in report if r["state"] == "slot" and r["resident"]]  # After every idle surface
+            for row in idle:
+                if not over:
+                    break
+                frees = {"decoders", "frame_bytes"} if row["kind"] == "video" else {"image_bytes"}
+                if not frees & over:
+                    continue
+                if row["state"] == "slot":
+                    self._evict_slot(row)
+                else:
+                    self._evict(surfaces[row["surface"]], video_sources, row)
+                totals = self._totals(report)
+                over = self._over_budget(totals)
+
+        for i in upcoming:
+            self._rewarm(surfaces[i], video_sources)
+
+        self.report = report
+        self.totals = dict(totals, evictions=self.evictions, rewarms=self.rewarms)
+        return self.totals
+
+    def _evict(self, surface, video_sources, row):
+        vid = surface.get("video_id")
+        if vid and vid in video_sources:
+            if vid in self.warming:
+                return  # Never evict what is being re-warmed
+            video_sources[vid].suspend()
+        else:
+            surface["static_frame"] = None
+        row.update(resident=False, decoder_bytes=0, frame_bytes=0, image_bytes=0)
+        self.evictions += 1
+
+    def _evict_slot(self, row):
+        if row["kind"] == "video":
+            row["media"].suspend()
+        else:
+            row["slot"].drop_media(row["path"], row["media"])
+        row.update(resident=False, decoder_bytes=0, frame_bytes=0, image_bytes=0)
+        self.evictions += 1
+
+    # --------- RE-WARM --------- #
+    def _rewarm(self, surface, video_sources):
+        vid = surface.get("video_id")
+        if vid and vid in video_sources:
+            source = video_sources[vid]
+            if not source.suspended:
+                return
+            with self.lock:
+                if vid in self.warming:
+                    return
+                self.warming.add(vid)
+                if self.pool is None:
+                    self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="media-rewarm")
+            self.rewarms += 1
+            self.pool.submit(self._warm_source, vid, source)
+        elif surface.get("media_type") == "image" and surface.get("static_frame") is None:
+            path = surface.get("media_path")
+            if path and id(surface) not in self.image_loads:
+                self.rewarms += 1
+                self.image_loads[id(surface)] = (surface, path, IMAGE_CACHE.load_async(path))
+
+    def _warm_source(self, vid, source):
+        try:
+            source.prime()  # Reopens the decoder and decodes the first frame
+        except Exception as e:
+            print(f"Re-warming {source.filepath} failed: {e}")
+        finally:
+            with self.lock:
+                self.warming.discard(vid)
+
+    def _attach_loaded_images(self):
+        for key, (surface, path, future) in list(self.image_loads.items()):
+            if not future.done():
+                continue
+            del self.image_loads[key]
+            try:
+                frame = future.result()
+            except Exception as e:
+                print(f"Re-warming {path} failed: {e}")
+                continue
+            # The surface may have been given other media meanwhile
+            if frame is not None and surface.get("media_path") == path and surface.get("static_frame") is None:
+                surface["static_frame"] = frame
+
+    def format_report(self):
+        """Per-source usage table of the last pass (for the console)."""
+        lines = [f"{'Surface':<20} {'State':<9} {'Decoder':>9} {'Frames':>9} {'Image':>9}  Media"]
+        for r in self.report:
+            name = r["name"] or f"Surface {r['surface'] + 1}"
+            status = r["state"] if r["resident"] else f"{r['state']}*"
+            lines.append(
+                f"{name[:20]:<20} {status:<9} {r['decoder_bytes'] / MB:>7.1f}MB {r['frame_bytes'] / MB:>7.1f}MB "
+                f"{r['image_bytes'] / MB:>7.1f}MB  {r['path']}"
+            )
+        if self.totals:
+            t = self.totals
+            lines.append(
+                f"Total: {t['decoders']} decoders, {t['decoder_bytes'] / MB:.0f} MB decoder (est.), "
+                f"{t['frame_bytes'] / MB:.0f} MB frames, {t['image_bytes'] / MB:.0f} MB stills; "
+                f"{t['evictions']} evictions, {t['rewarms']} re-warms (* = evicted)"
+            )
+        return "\n".join(lines)
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
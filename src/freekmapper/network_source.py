@@ -0,0 +1,463 @@
+"""Network stream sources (RTSP, HTTP, UDP, ...) with a jitter buffer.
+
+Media paths are stream URLs, e.g. rtsp://camera.local/stream1 or
+http://host:8090/stream.mjpg. Options go in the URL fragment, which is never
+sent to the server: rtsp://host/stream#jitter=250 buffers 250 ms,
+#jitter=0 always shows the newest frame.
+
+All network I/O (connecting, reading, reconnecting) runs on the source's
+own thread, so a stalled stream never blocks the shared reader thread.
+Frames wait in the jitter buffer until the oldest has been there `jitter`
+seconds, then play out at the stream rate. A buffer that runs dry goes
+back to buffering (an underrun) while the last frame stays up; a buffer
+that overfills drops its oldest frames, so latency stays bounded. When the
+connection fails the thread reconnects with exponential backoff; a stream
+that is connected but silent is reported as stalled and, if FFmpeg's read
+timeout doesn't end it, abandoned for a fresh connection.
+
+    python -m freekmapper.network_source serve --port 8090 --jitter-ms 60 --stall-every 10
+    python -m freekmapper.network_source watch http://127.0.0.1:8090/stream.mjpg
+
+run a local MJPEG test server with injectable faults and print a source's
+stats once a second.
+
+Lost frames are counted from gaps in the frame numbers the test server
+stamps into the top of its pattern (a checksummed bar of black and white
+cells, see stamp_sequence). Other streams have no such stamp, so loss is
+inferred from gaps in their timestamps; MJPEG over HTTP carries none, and
+its losses go uncounted.
+"""
+import argparse
+import math
+import random
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from .instrumentation import FRAME_STATS
+from .live_sources import LiveSource
+from .media_probe import parse_media_options
+
+DEFAULT_JITTER_MS = 150
+NETWORK_PRIME_TIMEOUT = 5.0  # Connecting and filling the buffer can take a while
+OPEN_TIMEOUT_MS = 5000  # FFmpeg open/read timeouts: a dead server fails the read instead of hanging
+READ_TIMEOUT_MS = 3000
+STALL_SECONDS = 1.0  # Connected but no frame for this long: stalled (last frame held)
+STALL_RECONNECT_SECONDS = 5.0  # Still nothing: give up on the connection (its thread is left to time out)
+BACKOFF_MIN = 0.5  # Reconnect delays double from BACKOFF_MIN up to BACKOFF_MAX
+BACKOFF_MAX = 10.0
+MAX_STREAM_FPS = 240.0  # Streams often report nonsense rates (e.g. a 90 kHz clock)
+# Frame number stamp: sync byte, 16-bit sequence number, check byte; cells width // SEQ_CELL_DIVISOR wide
+SEQ_SYNC = 0b10110010
+SEQ_MODULO = 1 << 16
+SEQ_BITS = 32
+SEQ_CELL_DIVISOR = 40
+SEQ_MIN_CELL = 4  # Smaller cells don't survive JPEG: narrow frames aren't stamped
+
+
+def _seq_word(seq):
+    seq %= SEQ_MODULO
+    check = (seq ^ (seq >> 8) ^ 0x5A) & 0xFF
+    return SEQ_SYNC << 24 | seq << 8 | check
+
+
+def stamp_sequence(frame, seq):
+    """Draw frame number `seq` (mod 2**16) into the top row of cells of `frame`, in place."""
+    cell = frame.shape[1] // SEQ_CELL_DIVISOR
+    if cell < SEQ_MIN_CELL:
+        return frame
+    word = _seq_word(seq)
+    for bit in range(SEQ_BITS):
+        frame[:cell, bit * cell:(bit + 1) * cell] = 255 if word >> (SEQ_BITS - 1 - bit) & 1 else 0
+    return frame
+
+
+def read_sequence(frame):
+    """Frame number stamped by stamp_sequence, or None if `frame` carries no valid stamp."""
+    cell = frame.shape[1] // SEQ_CELL_DIVISOR
+    if cell < SEQ_MIN_CELL or frame.shape[0] < cell:
+        return None
+    # Sample each cell's centre: cheap, and clear of JPEG ringing at the edges
+    centres = frame[cell // 2, np.arange(SEQ_BITS) * cell + cell // 2]
+    word = 0
+    for bit in centres.mean(axis=1) > 127:
+        word = word << 1 | int(bit)
+    seq = word >> 8 & 0xFFFF
+    return seq if _seq_word(seq) == word else None
+
+
+def frames_lost(gap, fps):
+    """Frames missing in a gap of `gap` frame periods; larger jumps than 10 s are discontinuities, not loss."""
+    if gap >= fps * 10:
+        return 0
+    return max(int(round(gap)) - 1, 0)
+
+
+class NetworkSource(LiveSource):
+    """Stream URL read on its own thread through a jitter buffer (same interface as VideoSource)."""
+
+    prime_timeout = NETWORK_PRIME_TIMEOUT
+
+    def __init__(self, path, jitter_ms=None, **kwargs):
+        super().__init__(path, **kwargs)
+        self.url, options = parse_media_options(path)
+        if jitter_ms is None:
+            jitter_ms = options.get("jitter", DEFAULT_JITTER_MS)
+        self.jitter = max(jitter_ms, 0.0) / 1000.0
+        self.buffer = deque()  # (frame, arrival time), oldest first; guarded by slot_lock
+        self.buffering = True
+        self.next_play = None  # time.monotonic() at which the next buffered frame is due
+        self.io_state = "connecting"  # Set by the I/O thread: connecting, connected, retrying
+        self.last_arrival = None
+        self.stalled = False
+        self.cancel = None  # Event that ends the current I/O thread
+        self.thread = None
+        self.counts = dict.fromkeys(("received", "lost", "overflow", "late", "underruns", "stalls", "reconnects"), 0)
+        name = self.stat_names[2].split(":", 1)[1]
+        self.counter_names = {key: f"{key}:{name}" for key in ("lost", "underruns", "stalls", "reconnects")}
+        self._open()
+
+    # --- I/O thread --- #
+    def _open(self):
+        self.cancel = threading.Event()
+        self.io_state = "connecting"
+        self.last_arrival = time.monotonic()  # Stall timing starts at the connection
+        self.thread = threading.Thread(target=self._io_loop, args=(self.cancel,), daemon=True, name="network-source")
+        self.thread.start()
+
+    def _close(self):
+        if self.cancel is not None:
+            # Not joined: a read blocked on the network returns by itself (READ_TIMEOUT_MS) and exits
+            self.cancel.set()
+            self.cancel = None
+            self.thread = None
+        with self.slot_lock:
+            self.buffer.clear()
+            self.buffering = True
+
+    def _is_open(self):
+        return self.cancel is not None
+
+    def _count(self, key, n=1):
+        self.counts[key] += n
+        if key in self.counter_names:
+            FRAME_STATS.count(self.counter_names[key], n)
+
+    def _connect(self):
+        cap = cv2.VideoCapture(self.url, cv2.CAP_FFMPEG, [
+            cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, OPEN_TIMEOUT_MS,
+            cv2.CAP_PROP_READ_TIMEOUT_MSEC, READ_TIMEOUT_MS,
+        ])
+        if not cap.isOpened():
+            cap.release()
+            return None
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if 0 < fps <= MAX_STREAM_FPS:
+            self.fps = fps
+        return cap
+
+    def _io_loop(self, cancel):
+        backoff = BACKOFF_MIN
+        while not cancel.is_set():
+            self.io_state = "connecting"
+            cap = self._connect()
+            if cap is not None and not cancel.is_set():
+                self.io_state = "connected"
+                self.last_arrival = time.monotonic()
+                if self._read_stream(cap, cancel):
+                    backoff = BACKOFF_MIN  # Frames came through: the next failure retries quickly
+            if cap is not None:
+                cap.release()
+            if cancel.is_set():
+                break
+            self.io_state = "retrying"
+            self._count("reconnects")
+            cancel.wait(backoff)
+            backoff = min(backoff * 2, BACKOFF_MAX)
+
+    def _read_stream(self, cap, cancel):
+        """Read until the stream ends, fails or is cancelled; returns True if any frame arrived."""
+        convert_stage = self.stat_names[1]
+        last_pos = None
+        last_seq = None
+        received = False
+        while not cancel.is_set():
+            ret, frame = cap.read()
+            arrived = time.monotonic()
+            if not ret or cancel.is_set():
+                break
+            received = True
+            lost = 0
+            seq = read_sequence(frame)
+            if seq is not None:
+                # Stamped frames (the test server's) are numbered: missing ones are gaps in the numbers
+                if last_seq is not None:
+                    lost = frames_lost((seq - last_seq) % SEQ_MODULO, self.fps)
+                last_seq = seq
+            else:
+                # Otherwise frames missing from the stream show up as gaps in its timestamps
+                pos = cap.get(cv2.CAP_PROP_POS_MSEC)
+                if last_pos is not None and pos > last_pos:
+                    lost = frames_lost((pos - last_pos) / 1000.0 * self.fps, self.fps)
+                last_pos = pos
+            t0 = time.perf_counter()
+            frame = cv2.cvtColor(self._resize_frame(frame), cv2.COLOR_BGR2RGB)
+            FRAME_STATS.record(convert_stage, time.perf_counter() - t0)
+            self._push(frame, arrived, lost)
+        return received
+
+    def depth_limit(self):
+        """Frames the buffer may hold: the jitter delay plus one."""
+        return max(math.ceil(self.jitter * self.fps), 1) + 1
+
+    def _push(self, frame, arrived, lost):
+        with self.slot_lock:
+            self.buffer.append((frame, arrived))
+            self.last_arrival = arrived
+            self.counts["received"] += 1
+            if lost:
+                self._count("lost", lost)
+            overflow = len(self.buffer) - self.depth_limit()
+            for _ in range(max(overflow, 0)):
+                self.buffer.popleft()
+            if overflow > 0:
+                self.counts["overflow"] += overflow
+                self.dropped_frames += overflow
+                FRAME_STATS.count(self.stat_names[2], overflow)
+
+    # --- Playout (reader thread) --- #
+    def _check_stall(self, now):
+        if self.io_state != "connected":
+            self.stalled = False
+            return
+        silent = now - self.last_arrival
+        if silent > STALL_SECONDS and not self.stalled:
+            self.stalled = True
+            self._count("stalls")
+        elif silent <= STALL_SECONDS:
+            self.stalled = False
+        if silent > STALL_RECONNECT_SECONDS:
+            # FFmpeg's read timeout didn't fire: leave that thread blocked and connect afresh
+            print(f"Stream {self.url} stalled for {silent:.0f} s, reconnecting")
+            self._count("reconnects")
+            self.cancel.set()
+            self._open()
+
+    def _take(self):
+        now = time.monotonic()
+        period = 1.0 / self.fps
+        with self.slot_lock:
+            if self.cancel is not None:
+                self._check_stall(now)
+            if self.jitter <= 0:
+                taken = self.buffer.pop() if self.buffer else None
+                if self.buffer:
+                    self.counts["late"] += len(self.buffer)
+                    self.dropped_frames += len(self.buffer)
+                    FRAME_STATS.count(self.stat_names[2], len(self.buffer))
+                    self.buffer.clear()
+            else:
+                taken = None
+                if self.buffering:
+                    if not self.buffer or now - self.buffer[0][1] < self.jitter:
+                        return  # Still filling: the last frame stays up
+                    self.buffering = False
+                    self.next_play = now
+                if now >= self.next_play:
+                    if self.buffer:
+                        taken = self.buffer.popleft()
+                        # Keep the stream's pace; after a hiccup catch up by one frame, not a burst
+                        self.next_play = max(self.next_play + period, now - period)
+                    else:
+                        self.buffering = True
+                        self._count("underruns")
+        if taken is not None:
+            self.current_frame, self.capture_time = taken
+            self.frame_index += 1
+
+    def state(self):
+        if self.cancel is None:
+            return "closed"
+        if self.io_state != "connected":
+            return self.io_state
+        if self.stalled:
+            return "stalled"
+        return "buffering" if self.buffering else "playing"
+
+    def stats(self):
+        """Connection state, buffer depth and loss counters."""
+        with self.slot_lock:
+            depth = len(self.buffer)
+            counts = dict(self.counts)
+        return dict(
+            counts, state=self.state(), depth=depth, depth_limit=self.depth_limit(), jitter_ms=self.jitter * 1000.0,
+            dropped=self.dropped_frames,
+        )
+
+    def memory_usage(self):
+        with self.slot_lock:
+            frames = sum(frame.nbytes for frame, _ in self.buffer)
+        current = self.current_frame
+        if current is not None:
+            frames += current.nbytes
+        return {"decoder": 0, "frames": frames, "open": self._is_open()}
+
+
+# --------- TEST SERVER --------- #
+class TestStreamServer:
+    """MJPEG over HTTP (multipart/x-mixed-replace) test pattern with injectable network faults.
+
+    Every client gets its own stream at http://127.0.0.1:PORT/stream.mjpg.
+    jitter_ms delays each frame by a random amount, drop skips frames with
+    that probability, and every stall_every seconds the stream goes silent
+    for stall_seconds; every disconnect_every seconds the connection is cut.
+    Frames carry their number (stamp_sequence), so a NetworkSource counts
+    the dropped ones as lost.
+    """
+
+    def __init__(self, port=0, size=(640, 360), fps=25.0, jitter_ms=0.0, drop=0.0,
+                 stall_every=0.0, stall_seconds=3.0, disconnect_every=0.0, seed=0):
+        self.size = size
+        self.fps = fps
+        self.jitter = jitter_ms / 1000.0
+        self.drop = drop
+        self.stall_every = stall_every
+        self.stall_seconds = stall_seconds
+        self.disconnect_every = disconnect_every
+        self.random = random.Random(seed)
+        self.running = True
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/stream.mjpg":
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+                self.end_headers()
+                try:
+                    server.stream(self.wfile)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True, name="test-stream-server")
+        self.thread.start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/stream.mjpg"
+
+    def stream(self, out):
+        from .bench import _pattern
+
+        w, h = self.size
+        start = time.monotonic()
+        next_stall = start + self.stall_every if self.stall_every else None
+        disconnect_at = start + self.disconnect_every if self.disconnect_every else None
+        i = 0
+        while self.running:
+            due = start + i / self.fps
+            if self.jitter:
+                due += self.random.uniform(0.0, self.jitter)
+            time.sleep(max(due - time.monotonic(), 0.0))
+            now = time.monotonic()
+            if disconnect_at is not None and now >= disconnect_at:
+                return
+            if next_stall is not None and now >= next_stall:
+                time.sleep(self.stall_seconds)
+                next_stall = time.monotonic() + self.stall_every
+                start += self.stall_seconds  # Resume in real time, as a stalled sender would
+            i += 1
+            if self.drop and self.random.random() < self.drop:
+                continue
+            frame = stamp_sequence(_pattern(w, h, i), i)
+            ok, jpeg = cv2.imencode(".jpg", cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+            data = jpeg.tobytes()
+            out.write(
+                b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: "
+                + str(len(data)).encode() + b"\r\n\r\n" + data + b"\r\n"
+            )
+            out.flush()
+
+    def stop(self):
+        self.running = False
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def watch(path, seconds=None, jitter_ms=None):
+    """Play a stream without rendering and print its stats once a second."""
+    source = NetworkSource(path, jitter_ms=jitter_ms)
+    start = time.monotonic()
+    next_report = start + 1.0
+    try:
+        while seconds is None or time.monotonic() - start < seconds:
+            source.read_frame()
+            source.presented(time.monotonic())
+            if time.monotonic() >= next_report:
+                next_report += 1.0
+                s = source.stats()
+                print(
+                    f"{s['state']:<10} buffer {s['depth']}/{s['depth_limit']}  shown {source.frame_index}  "
+                    f"received {s['received']}  lost {s['lost']}  dropped {s['dropped']}  "
+                    f"underruns {s['underruns']}  stalls {s['stalls']}  reconnects {s['reconnects']}",
+                    flush=True,
+                )
+            time.sleep(0.004)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        source.release()
+    return source.stats()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m freekmapper.network_source", description="Network stream test tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="MJPEG test pattern server with injectable faults")
+    serve.add_argument("--port", type=int, default=8090)
+    serve.add_argument("--width", type=int, default=640)
+    serve.add_argument("--height", type=int, default=360)
+    serve.add_argument("--fps", type=float, default=25.0)
+    serve.add_argument("--jitter-ms", type=float, default=0.0, help="random extra delay per frame")
+    serve.add_argument("--drop", type=float, default=0.0, help="probability of skipping a frame")
+    serve.add_argument("--stall-every", type=float, default=0.0, help="seconds between stalls (0 = never)")
+    serve.add_argument("--stall-seconds", type=float, default=3.0)
+    serve.add_argument("--disconnect-every", type=float, default=0.0, help="seconds between dropped connections")
+    watch_cmd = commands.add_parser("watch", help="read a stream and print buffer and loss stats")
+    watch_cmd.add_argument("url")
+    watch_cmd.add_argument("--jitter-ms", type=float, default=None)
+    watch_cmd.add_argument("--seconds", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "watch":
+        watch(args.url, args.seconds, args.jitter_ms)
+        return 0
+    server = TestStreamServer(
+        args.port, (args.width, args.height), args.fps, args.jitter_ms, args.drop,
+        args.stall_every, args.stall_seconds, args.disconnect_every,
+    )
+    print(f"Serving {server.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""Offline render of a show to a video file (headless, as fast as decode allows).
+
+    freekmapper render show.fmshow out.mp4 --duration 60
+
+The show runs against a ManualClock advanced one output frame at a time:
+sources are decoded synchronously up to each frame's show time, the
+sequencer's cues fire from the same scheduler as live, and cues wait for
+pre-buffered media instead of holding the outgoing frame. The result is the
+same file on every run, independent of machine speed.
+
+Frames are drawn by the fullscreen renderer into an offscreen framebuffer
+(works with Mesa llvmpipe under xvfb-run), read back through a ring of pixel
+buffer objects so the GPU copy of frame N overlaps drawing frame N + 1, and
+encoded by cv2.VideoWriter on a separate thread.
+"""
+import argparse
+import sys
+import time
+
+from OpenGL.GL import *
+
+from .image_sequence import ImageSequenceSource
+from .instrumentation import FRAME_STATS
+from .recording import FrameEncoder, PixelReadback
+from .sequencer import Sequencer
+from .show_clock import EventScheduler, ManualClock
+from .slot_cache import diff_surfaces
+from .sync_groups import SyncGroups
+from .trace import TRACE
+
+RENDER_FPS = 30
+RENDER_SIZE = (1920, 1080)
+CANVAS_SIZE = (1920, 1080)
+PBO_COUNT = 3  # Frames in flight between glReadPixels and the CPU copy
+
+
+def parse_size(text):
+    """'WxH' -> (w, h)."""
+    try:
+        w, h = (int(v) for v in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("size must be WIDTHxHEIGHT")
+    if w <= 0 or h <= 0:
+        raise argparse.ArgumentTypeError("size must be positive")
+    return w, h
+
+
+class FramebufferTarget:
+    """Offscreen RGBA framebuffer read back through a ring of PBOs (see recording.PixelReadback).
+
+    Must run with the owning context current.
+    """
+
+    def __init__(self, width, height, pbo_count=PBO_COUNT):
+        self.width = width
+        self.height = height
+        self.readback = None
+        self.fbo = glGenFramebuffers(1)
+        self.rbo = glGenRenderbuffers(1)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.rbo)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, width, height)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.rbo)
+        status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            self.release()
+            raise RuntimeError(f"Offscreen framebuffer incomplete (status 0x{status:x})")
+        self.readback = PixelReadback(width, height, pbo_count, stage="readback:offline")
+
+    def bind(self):
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+
+    def read(self):
+        """Start reading the frame just drawn; returns the oldest frame in flight (or None)."""
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        return self.readback.read()
+
+    def flush(self):
+        return self.readback.flush()
+
+    def release(self):
+        if self.readback is not None:
+            self.readback.release()
+        glDeleteRenderbuffers(1, [self.rbo])
+        glDeleteFramebuffers(1, [self.fbo])
+
+
+class OfflineShow:
+    """A loaded show (surfaces, sources, sequencer) driven by a manual clock."""
+
+    def __init__(self, config, canvas_size=CANVAS_SIZE):
+        self.clock = ManualClock()
+        self.scheduler = EventScheduler()
+        self.surfaces, self.video_sources = diff_surfaces([], config["surfaces"], clock=self.clock)
+        self.sync_groups = SyncGroups(self.clock)
+        self.sequencer = Sequencer(self.surfaces, self.video_sources, self.clock, self.scheduler)
+        self.sequencer.wait_for_media = True
+        self.sequencer.mode = config.get("playback_mode", "concurrent")
+        self.sequencer.steps = config.get("sequence_steps", [])
+        self.sequencer.continuous_surfaces = set(config.get("continuous_surfaces", []))
+        self.canvas_width, self.canvas_height = canvas_size
+        self.sequencer.reset()  # Starts the sources (or the first step) at show time 0
+
+    def advance(self, now):
+        """Bring the show to time `now`: cues, sync groups, then decode every source up to it."""
+        self.clock.time = now
+        self.sequencer.update(now)
+        self.scheduler.run_due(now)
+        self.sync_groups.update(self.surfaces, self.video_sources, now)
+        for vs in list(self.video_sources.values()):
+            if isinstance(vs, ImageSequenceSource):
+                vs.blocking = True  # Also sources the sequencer opened since the last frame
+            vs.read_frame(now)
+
+    def layers(self, surface, idx):
+        frame = None
+        if surface["media_type"] == "video":
+            vs = self.video_sources.get(surface.get("video_id"))
+            frame = vs.get_current_frame() if vs is not None else None
+        elif surface["media_type"] == "image":
+            frame = surface.get("static_frame")
+        return self.sequencer.layers(surface, idx, frame)
+
+    def make_renderer(self):
+        from .renderers import GLFullscreenRenderer
+        renderer = GLFullscreenRenderer(
+            self.surfaces,
+            lambda s, i: self.layers(s, i)[0],
+            canvas_width=self.canvas_width,
+            canvas_height=self.canvas_height,
+            get_layers_callback=self.layers,
+        )
+        renderer.edit_mode = False
+        renderer.show_controls = False
+        return renderer
+
+    def release(self):
+        self.sequencer.cancel_pending()
+        self.sequencer.cancel_cues()
+        for vs in list(self.video_sources.values()):
+            vs.release()
+        self.video_sources.clear()
+
+
+def render_show(show_path, out_path, duration, fps=RENDER_FPS, size=RENDER_SIZE, fourcc=None, progress=True):
+    """Render `duration` seconds of a show to `out_path`; returns a summary dict."""
+    from .bench import open_gl_window
+    from .show_file import load_config
+    import glfw
+
+    config = load_config(show_path)
+    width, height = size
+    window = open_gl_window(width, height)
+    show = target = encoder = renderer = None
+    try:
+        show = OfflineShow(config)
+        renderer = show.make_renderer()
+        target = FramebufferTarget(width, height)
+        encoder = FrameEncoder(out_path, fps, (width, height), fourcc, stage="encode:offline")
+
+        frames = int(round(duration * fps))
+        start = time.perf_counter()
+        next_report = start + 1.0
+        for i in range(frames):
+            t0 = time.perf_counter()
+            with TRACE.span("offline frame", "render", {"frame": i}):
+                show.advance(i / fps)
+                target.bind()
+                renderer.draw(width, height)
+                frame = target.read()
+            if frame is not None:
+                encoder.put(frame)
+            FRAME_STATS.record("frame:offline", time.perf_counter() - t0)
+            if progress and time.perf_counter() >= next_report:
+                next_report += 1.0
+                elapsed = time.perf_counter() - start
+                print(f"  {i + 1}/{frames} frames, {(i + 1) / fps / elapsed:.1f}x real time", flush=True)
+        for frame in target.flush():
+            encoder.put(frame)
+        encoder.close()
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        elapsed = time.perf_counter() - start
+        return {
+            "frames": encoder.frames,
+            "seconds": frames / fps,
+            "wall_seconds": elapsed,
+            "speed": (frames / fps) / elapsed if elapsed > 0 else None,
+            "size": [width, height],
+            "fps": fps,
+        }
+    finally:
+        if encoder is not None:
+            encoder.stop()
+        if target is not None:
+            target.release()
+        if renderer is not None:
+            renderer.meshes.clear()
+            renderer.generators.clear()
+            renderer.effects.clear()
+            renderer.textures.clear()
+        if show is not None:
+            show.release()
+        glfw.destroy_window(window)
+        glfw.terminate()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="freekmapper render", description="Render a show to a video file offline")
+    parser.add_argument("show", help="show file (.fmshow, or a legacy .npy config)")
+    parser.add_argument("out", help="output video (.mp4, .avi, ...)")
+    parser.add_argument("--duration", type=float, required=True, help="seconds of show to render")
+    parser.add_argument("--fps", type=float, default=RENDER_FPS, help=f"output frame rate (default {RENDER_FPS})")
+    parser.add_argument("--size", type=parse_size, default=RENDER_SIZE, help="output WIDTHxHEIGHT (default 1920x1080)")
+    parser.add_argument("--fourcc", default=None, help="codec FourCC (default from the extension, e.g. mp4v)")
+    args = parser.parse_args(argv)
+
+    if args.duration <= 0 or args.fps <= 0:
+        parser.error("--duration and --fps must be positive")
+    try:
+        summary = render_show(args.show, args.out, args.duration, args.fps, args.size, args.fourcc)
+    except Exception as e:
+        print(f"Render failed: {e}")
+        return 1
+    print(
+        f"Rendered {summary['frames']} frames ({summary['seconds']:.1f} s) to {args.out} "
+        f"in {summary['wall_seconds']:.1f} s ({summary['speed']:.1f}x real time)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
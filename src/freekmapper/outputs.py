@@ -0,0 +1,197 @@
+import time
+
+import glfw
+
+from .instrumentation import FRAME_STATS
+from .recording import OutputRecorder
+from .renderers import EffectChain, MeshBuffers, ShaderTextures, TileTextures
+from .texture_manager import TextureManager
+from .trace import TRACE
+
+
+def split_canvas(canvas_width, canvas_height, displays):
+    """Canvas regions (x, y, w, h) side by side, one per display (x, y, w, h), widths proportional."""
+    total = sum(d[2] for d in displays) or 1
+    regions = []
+    x = 0.0
+    for display in displays:
+        w = canvas_width * display[2] / total
+        regions.append((x, 0.0, w, float(canvas_height)))
+        x += w
+    return regions
+
+
+def parse_region(text, canvas_width, canvas_height):
+    """'x,y,w,h' in canvas pixels -> tuple; an empty string means the whole canvas."""
+    text = text.strip()
+    if not text:
+        return (0.0, 0.0, float(canvas_width), float(canvas_height))
+    try:
+        x, y, w, h = (float(v) for v in text.replace(" ", "").split(","))
+    except ValueError:
+        raise ValueError("Region must be x,y,w,h")
+    if w <= 0 or h <= 0:
+        raise ValueError("Region width and height must be positive")
+    return (x, y, w, h)
+
+
+class OutputWindow:
+    __slots__ = ("window", "renderer", "display", "region", "vsync", "recorder")
+
+    def __init__(self, window, renderer, display, region, vsync):
+        self.window = window
+        self.renderer = renderer
+        self.display = display  # (x, y, w, h) of the Tk display it was opened for
+        self.region = region  # Canvas crop shown by this window
+        self.vsync = vsync
+        self.recorder = None  # OutputRecorder while this window is being recorded
+
+    def canvas_point(self, x, y):
+        """Canvas coordinates of a cursor position in this window."""
+        w_win, h_win = glfw.get_window_size(self.window)
+        if w_win == 0 or h_win == 0:
+            return None
+        rx, ry, rw, rh = self.region
+        return rx + x * rw / w_win, ry + y * rh / h_win
+
+
+class OutputSet:
+    """Fullscreen GLFW outputs sharing one GL context group, TextureManager, mesh buffers, shader programs and effects.
+
+    Every window after the first is created with the first as its share
+    context, so a frame is uploaded once and drawn by each window that shows
+    it. Only the first window waits for vsync; all windows are drawn first
+    and then swapped back to back so projectors show the same frame.
+    """
+
+    def __init__(self):
+        self.windows = []
+        self.textures = None
+        self.tiles = None
+        self.meshes = None
+        self.generators = None
+        self.effects = None
+        self.blackout = False
+
+    def __len__(self):
+        return len(self.windows)
+
+    def __iter__(self):
+        return iter(list(self.windows))
+
+    def for_display(self, display):
+        return next((o for o in self.windows if o.display == display), None)
+
+    def open(self, monitor, width, height, display, region, make_renderer):
+        """Create a window on `monitor`; make_renderer(textures, tiles, meshes, generators, effects, region) builds its renderer."""
+        share = self.windows[0].window if self.windows else None
+        glfw.window_hint(glfw.AUTO_ICONIFY, glfw.FALSE)
+        window = glfw.create_window(width, height, f"Projection Mapper Output {len(self.windows) + 1}", monitor, share)
+        if not window:
+            return None
+        glfw.make_context_current(window)
+        vsync = not self.windows
+        glfw.swap_interval(1 if vsync else 0)
+        if self.textures is None:
+            self.textures = TextureManager(name="output")
+            self.tiles = TileTextures(self.textures)
+            self.meshes = MeshBuffers()
+            self.generators = ShaderTextures(self.textures, "output")
+            self.effects = EffectChain(self.textures, "output")
+        renderer = make_renderer(self.textures, self.tiles, self.meshes, self.generators, self.effects, region)
+        renderer.blackout = self.blackout
+        output = OutputWindow(window, renderer, display, region, vsync)
+        self.windows.append(output)
+        return output
+
+    def close(self, output):
+        if output not in self.windows:
+            return
+        self.stop_recording(output)
+        self.windows.remove(output)
+        glfw.destroy_window(output.window)
+        if not self.windows:
+            # Textures and buffers went away with the last context of the share group
+            self.textures = None
+            self.tiles = None
+            self.meshes = None
+            self.generators = None
+            self.effects = None
+        elif output.vsync:
+            first = self.windows[0]
+            glfw.make_context_current(first.window)
+            glfw.swap_interval(1)
+            first.vsync = True
+
+    def close_all(self):
+        for output in list(self.windows):
+            self.close(output)
+
+    def set_blackout(self, enabled):
+        self.blackout = enabled
+        for output in self.windows:
+            output.renderer.blackout = enabled
+
+    def start_recording(self, path, fps, output=None):
+        """Record `output` (default: the first window) to `path`; raises IOError if the file can't be written."""
+        output = output or (self.windows[0] if self.windows else None)
+        if output is None or output.recorder is not None:
+            return None
+        glfw.make_context_current(output.window)
+        w_fb, h_fb = glfw.get_framebuffer_size(output.window)
+        output.recorder = OutputRecorder(path, w_fb, h_fb, fps)
+        return output.recorder
+
+    def stop_recording(self, output=None):
+        """Finish the recording of `output` (default: every recorded window); returns the stats of the last one."""
+        stats = None
+        for o in [output] if output is not None else self.windows:
+            if o.recorder is None:
+                continue
+            glfw.make_context_current(o.window)
+            stats = o.recorder.stop()
+            o.recorder = None
+            print(f"Recording saved to {stats['path']}: {stats['frames']} frames, {stats['dropped']} dropped")
+        return stats
+
+    def recording(self):
+        return next((o.recorder for o in self.windows if o.recorder is not None), None)
+
+    def release(self, keys):
+        if self.textures is not None:
+            self.textures.release(keys)
+            self.effects.release(keys)
+
+    def stats(self):
+        return self.textures.stats() if self.textures is not None else None
+
+    def render(self):
+        """Draw every output, then present them together (one paced frame for all projectors)."""
+        for output in list(self.windows):
+            if glfw.window_should_close(output.window):
+                self.close(output)
+        if not self.windows:
+            return
+
+        glfw.make_context_current(self.windows[0].window)
+        self.textures.begin_frame()
+        self.tiles.begin_frame()
+        self.meshes.begin_frame()
+        for output in self.windows:
+            glfw.make_context_current(output.window)
+            w_fb, h_fb = glfw.get_framebuffer_size(output.window)
+            with TRACE.span("output draw", "render"):
+                output.renderer.draw(w_fb, h_fb)
+            if output.recorder is not None:
+                with TRACE.span("record capture", "render"):
+                    output.recorder.capture(w_fb, h_fb)
+        self.textures.end_frame()
+        self.meshes.end_frame()
+
+        t_swap = time.perf_counter()
+        for output in self.windows:
+            glfw.swap_buffers(output.window)
+        t_swapped = time.perf_counter()
+        FRAME_STATS.record("swap:output", t_swapped - t_swap)
+        TRACE.complete("glfw swap", t_swap, t_swapped, "render", {"windows": len(self.windows)})
+        glfw.poll_events()
@@ -0,0 +1,219 @@
+import ctypes
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+from OpenGL.GL import *
+
+from .instrumentation import FRAME_STATS
+
+RECORD_PBOS = 2  # Double-buffered: frame N is copied out while frame N + 1 is read back
+RECORD_QUEUE = 8  # Frames waiting for the encoder before live capture starts dropping
+RECORD_FPS = 60
+FOURCCS = {".mp4": "mp4v", ".m4v": "mp4v", ".mov": "mp4v", ".avi": "MJPG", ".mkv": "XVID"}
+
+
+def fourcc_for(path, fourcc=None):
+    if fourcc:
+        return fourcc
+    return FOURCCS.get(os.path.splitext(path)[1].lower(), "mp4v")
+
+
+class PixelReadback:
+    """Asynchronous glReadPixels of the bound read framebuffer through a ring of pixel pack buffers.
+
+    read() starts copying the current frame into the next PBO and returns
+    the oldest frame in flight (bottom-up BGR), or None until the ring has
+    filled; flush() returns the rest. Must run with the owning context current.
+    """
+
+    def __init__(self, width, height, count=RECORD_PBOS, stage="readback"):
+        self.width = width
+        self.height = height
+        self.nbytes = width * height * 3
+        self.stage = stage
+        pbos = glGenBuffers(count)
+        self.pbos = [int(pbos)] if count == 1 else [int(b) for b in pbos]
+        self.next = 0  # Ring position of the next readback
+        self.in_flight = []  # PBOs with a pending readback, oldest first
+        for pbo in self.pbos:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.nbytes, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+
+    def read(self):
+        # The ring is full: the oldest readback is in the PBO about to be reused
+        frame = self._map_oldest() if len(self.in_flight) == len(self.pbos) else None
+        pbo = self.pbos[self.next]
+        self.next = (self.next + 1) % len(self.pbos)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        # BGR straight from the GL so the encoder needs no colour conversion
+        glReadPixels(0, 0, self.width, self.height, GL_BGR, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.in_flight.append(pbo)
+        return frame
+
+    def flush(self):
+        frames = []
+        while self.in_flight:
+            frames.append(self._map_oldest())
+        return frames
+
+    def _map_oldest(self):
+        pbo = self.in_flight.pop(0)
+        t0 = time.perf_counter()
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+        address = glMapBuffer(GL_PIXEL_PACK_BUFFER, GL_READ_ONLY)
+        if not address:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+            raise RuntimeError("glMapBuffer failed on the readback buffer")
+        mapped = (ctypes.c_ubyte * self.nbytes).from_address(address)
+        # Copy out: the mapping is gone after glUnmapBuffer
+        frame = np.frombuffer(mapped, dtype=np.uint8).reshape(self.height, self.width, 3).copy()
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        FRAME_STATS.record(self.stage, time.perf_counter() - t0, nbytes=self.nbytes)
+        return frame
+
+    def release(self):
+        if self.pbos:
+            glDeleteBuffers(len(self.pbos), self.pbos)
+            self.pbos = []
+        self.in_flight = []
+
+
+class FrameEncoder:
+    """cv2.VideoWriter on its own thread, fed bottom-up BGR frames through a bounded queue.
+
+    With drop=False a full queue blocks the caller (offline renders keep
+    every frame); with drop=True the frame is discarded and counted, so a
+    slow encoder never stalls the caller.
+    """
+
+    def __init__(self, path, fps, size, fourcc=None, drop=False, queue_size=RECORD_QUEUE, stage="encode"):
+        fourcc = fourcc_for(path, fourcc)
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+        if not self.writer.isOpened():
+            raise IOError(f"cv2.VideoWriter can't write {fourcc} to {path}")
+        self.path = path
+        self.drop = drop
+        self.stage = stage
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.frames = 0
+        self.dropped = 0
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def full(self):
+        return self.queue.full()
+
+    def put(self, frame):
+        """Queue a frame; returns False if it was dropped."""
+        while True:
+            if self.error is not None:
+                raise self.error
+            try:
+                if self.drop:
+                    self.queue.put_nowait(frame)
+                else:
+                    self.queue.put(frame, timeout=0.5)
+                return True
+            except queue.Full:
+                if self.drop:
+                    self.count_drop()
+                    return False
+                # Encoder still busy (or failed: checked above)
+
+    def count_drop(self):
+        self.dropped += 1
+        FRAME_STATS.count(f"dropped:{self.stage}")
+
+    def run(self):
+        while True:
+            frame = self.queue.get()
+            if frame is None:
+                break
+            t0 = time.perf_counter()
+            try:
+                # GL rows start at the bottom
+                self.writer.write(cv2.flip(frame, 0))
+            except cv2.error as e:
+                self.error = e
+                break
+            self.frames += 1
+            FRAME_STATS.record(self.stage, time.perf_counter() - t0)
+
+    def stop(self):
+        if self.thread.is_alive() and self.error is None:
+            self.queue.put(None)
+        self.thread.join()
+        self.writer.release()
+
+    def close(self):
+        """Encode the queued frames and finish the file."""
+        self.stop()
+        if self.error is not None:
+            raise self.error
+
+
+class OutputRecorder:
+    """Records what an output window presents (slot switches, blackouts and all).
+
+    capture() runs right after the output is drawn, with its context
+    current, and reads the back buffer asynchronously. When the encoder
+    falls behind, frames are dropped before any readback is issued, so
+    presentation never waits on recording.
+    """
+
+    def __init__(self, path, width, height, fps=RECORD_FPS):
+        self.size = (width, height)
+        self.fps = fps
+        self.readback = PixelReadback(width, height, RECORD_PBOS, stage="readback:record")
+        try:
+            self.encoder = FrameEncoder(path, fps, self.size, drop=True, stage="encode:record")
+        except IOError:
+            self.readback.release()
+            raise
+        self.started = time.perf_counter()
+
+    @property
+    def path(self):
+        return self.encoder.path
+
+    def capture(self, width, height):
+        """Read back the frame just drawn into the back buffer (before the swap)."""
+        if self.encoder.error is not None:
+            return  # Reported by stats(); the show goes on
+        if (width, height) != self.size or self.encoder.full():
+            # Resized window, or the encoder is behind: skip before paying for the readback
+            self.encoder.count_drop()
+            return
+        glReadBuffer(GL_BACK)
+        frame = self.readback.read()
+        if frame is not None:
+            self.encoder.put(frame)
+
+    def stop(self):
+        """Finish the file (context must be current); returns stats()."""
+        try:
+            for frame in self.readback.flush():
+                if self.encoder.error is None:
+                    self.encoder.put(frame)
+        finally:
+            self.readback.release()
+            self.encoder.stop()
+        return self.stats()
+
+    def stats(self):
+        return {
+            "path": self.encoder.path,
+            "seconds": time.perf_counter() - self.started,
+            "frames": self.encoder.frames,
+            "dropped": self.encoder.dropped,
+            "error": str(self.encoder.error) if self.encoder.error else None,
+        }
@@ -0,0 +1,428 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import deque
+
+from .latency import LatencyStats
+
+OSC_PORT = 9000
+WS_PORT = 9001
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# address -> argument types. Slots and surfaces are numbered from 1 like in the UI.
+COMMANDS = {
+    "/slot/go": (int,),
+    "/sequence/next": (),
+    "/sequence/prev": (),
+    "/blackout": (int,),
+    "/surface/opacity": (int, float),
+    "/surface/corner": (int, int, float, float),
+    "/surface/points": (int,) + (float,) * 8,
+    "/surface/param": (int, str, float),
+    "/surface/effect": (int, str, float),
+    "/status": (),
+}
+
+
+def parse_command(address, args):
+    """Validate a command; returns (address, converted args) or raises ValueError."""
+    types = COMMANDS.get(address) if isinstance(address, str) else None
+    if types is None:
+        raise ValueError(f"unknown command {address}")
+    if len(args) != len(types):
+        raise ValueError(f"{address} takes {len(types)} argument(s), got {len(args)}")
+    converted = []
+    for value, kind in zip(args, types):
+        try:
+            value = kind(int(value) if kind is int and isinstance(value, (bool, float)) else value)
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError(f"{address}: bad argument {value!r}")
+        if kind is float and not math.isfinite(value):
+            raise ValueError(f"{address}: bad argument {value!r}")
+        converted.append(value)
+    return address, tuple(converted)
+
+
+def parse_text_command(text):
+    """'/surface/opacity 1 0.5' or '{"cmd": "/surface/opacity", "args": [1, 0.5]}' -> (address, args)."""
+    text = text.strip()
+    if text.startswith("{"):
+        data = json.loads(text)
+        args = data.get("args", [])
+        if not isinstance(args, list):
+            raise ValueError("args must be a list")
+        return parse_command(data.get("cmd"), args)
+    parts = text.split()
+    if not parts:
+        raise ValueError("empty command")
+    return parse_command(parts[0], parts[1:])
+
+
+# --------- OSC 1.0 --------- #
+def _osc_string(data, i):
+    end = data.index(b"\0", i)
+    return data[i:end].decode("utf-8"), (end + 4) & ~3
+
+
+def _osc_pad(raw):
+    return raw + b"\0" * (4 - len(raw) % 4)
+
+
+def parse_osc(data):
+    """List of (address, args) in an OSC packet (a message or a bundle)."""
+    if data.startswith(b"#bundle\0"):
+        messages = []
+        i = 16  # "#bundle\0" + 8-byte timetag (ignored: commands run on the next frame)
+        while i + 4 <= len(data):
+            size = struct.unpack(">i", data[i:i + 4])[0]
+            messages.extend(parse_osc(data[i + 4:i + 4 + size]))
+            i += 4 + size
+        return messages
+    address, i = _osc_string(data, 0)
+    args = []
+    if i < len(data):
+        tags, i = _osc_string(data, i)
+        for tag in tags.lstrip(","):
+            if tag == "i":
+                args.append(struct.unpack(">i", data[i:i + 4])[0])
+                i += 4
+            elif tag == "f":
+                args.append(struct.unpack(">f", data[i:i + 4])[0])
+                i += 4
+            elif tag == "s":
+                value, i = _osc_string(data, i)
+                args.append(value)
+            elif tag == "b":
+                size = struct.unpack(">i", data[i:i + 4])[0]
+                args.append(data[i + 4:i + 4 + size])
+                i += 4 + ((size + 3) & ~3)
+            elif tag in "TF":
+                args.append(tag == "T")
+            elif tag == "N":
+                args.append(None)
+            else:
+                raise ValueError(f"unsupported OSC type tag {tag!r}")
+    return [(address, args)]
+
+
+def build_osc(address, *args):
+    tags = ","
+    payload = b""
+    for arg in args:
+        if isinstance(arg, bool):
+            tags += "T" if arg else "F"
+        elif isinstance(arg, int):
+            tags += "i"
+            payload += struct.pack(">i", arg)
+        elif isinstance(arg, float):
+            tags += "f"
+            payload += struct.pack(">f", arg)
+        else:
+            tags += "s"
+            payload += _osc_pad(str(arg).encode("utf-8"))
+    return _osc_pad(address.encode("utf-8")) + _osc_pad(tags.encode("utf-8")) + payload
+
+
+# --------- WEBSOCKET (RFC 6455, text frames only) --------- #
+def ws_accept_key(key):
+    return base64.b64encode(hashlib.sha1((key + WS_GUID).encode("ascii")).digest()).decode("ascii")
+
+
+def ws_frame(payload, opcode=0x1, mask=False):
+    header = bytes([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    n = len(payload)
+    if n < 126:
+        header += bytes([mask_bit | n])
+    elif n < 65536:
+        header += bytes([mask_bit | 126]) + struct.pack(">H", n)
+    else:
+        header += bytes([mask_bit | 127]) + struct.pack(">Q", n)
+    if mask:
+        key = os.urandom(4)
+        payload = bytes(b ^ key[i % 4] for i, b in enumerate(payload))
+        header += key
+    return header + payload
+
+
+async def ws_read_frame(reader):
+    """(opcode, payload) of the next frame (continuation frames are not used by clients here)."""
+    b0, b1 = await reader.readexactly(2)
+    n = b1 & 0x7F
+    if n == 126:
+        n = struct.unpack(">H", await reader.readexactly(2))[0]
+    elif n == 127:
+        n = struct.unpack(">Q", await reader.readexactly(8))[0]
+    key = await reader.readexactly(4) if b1 & 0x80 else None
+    payload = await reader.readexactly(n)
+    if key:
+        payload = bytes(b ^ key[i % 4] for i, b in enumerate(payload))
+    return b0 & 0x0F, payload
+
+
+class RemoteCommand:
+    __slots__ = ("address", "args", "received", "source")
+
+    def __init__(self, address, args, source):
+        self.address = address
+        self.args = args
+        self.received = time.perf_counter()
+        self.source = source  # "osc" or "ws"
+
+
+class _OscProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            messages = parse_osc(data)
+        except (ValueError, IndexError, struct.error, UnicodeDecodeError) as e:
+            print(f"Remote: bad OSC packet from {addr[0]}: {e}")
+            return
+        for address, args in messages:
+            try:
+                address, args = parse_command(address, args)
+            except ValueError as e:
+                print(f"Remote: {e}")
+                continue
+            if address == "/status":
+                self.transport.sendto(build_osc("/status", json.dumps(self.server.status())), addr)
+            else:
+                self.server.submit(address, args, "osc")
+
+
+class RemoteServer:
+    """OSC (UDP) and WebSocket control server on its own asyncio thread.
+
+    Parsed commands are appended to a deque (atomic append/popleft, no lock)
+    and applied by the render loop on its next frame via drain(). The loop
+    calls presented() after the frame is swapped, so each command's
+    trigger-to-present latency is recorded. /status and WebSocket
+    broadcasts publish those stats plus whatever the app passes to publish().
+    """
+
+    def __init__(self, host="127.0.0.1", osc_port=OSC_PORT, ws_port=WS_PORT):
+        self.host = host
+        self.osc_port = osc_port
+        self.ws_port = ws_port
+        self.queue = deque()
+        self.latency = LatencyStats()
+        self.app_status = {}
+        self.clients = set()  # WebSocket writers
+        self.loop = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.listening = []  # "osc udp://host:port", "ws://host:port"
+
+    # --------- APP SIDE --------- #
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="remote-control", daemon=True)
+        self.thread.start()
+        self.ready.wait(timeout=2.0)
+        return self.listening
+
+    def drain(self):
+        """Commands received since the last frame, oldest first."""
+        commands = []
+        while True:
+            try:
+                commands.append(self.queue.popleft())
+            except IndexError:
+                return commands
+
+    def presented(self, commands):
+        """Record trigger-to-present latency once the frame applying `commands` is on screen."""
+        now = time.perf_counter()
+        for command in commands:
+            self.latency.record((now - command.received) * 1000.0)
+
+    def publish(self, status):
+        """Update the app status served by /status and push it to WebSocket clients."""
+        self.app_status = status
+        if self.loop is not None and self.clients:
+            message = json.dumps(dict(self.status(), type="status"))
+            self.loop.call_soon_threadsafe(self._broadcast, message)
+
+    def status(self):
+        return dict(self.app_status, remote_latency=self.latency.summary(), queued=len(self.queue))
+
+    def stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+
+    def submit(self, address, args, source):
+        self.queue.append(RemoteCommand(address, args, source))
+
+    # --------- SERVER THREAD --------- #
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._listen())
+        finally:
+            self.ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            for writer in list(self.clients):
+                writer.close()
+            self.loop.close()
+
+    async def _listen(self):
+        if self.osc_port:
+            try:
+                await self.loop.create_datagram_endpoint(lambda: _OscProtocol(self), local_addr=(self.host, self.osc_port))
+                self.listening.append(f"osc udp://{self.host}:{self.osc_port}")
+            except OSError as e:
+                print(f"Remote: OSC port {self.osc_port} unavailable: {e}")
+        if self.ws_port:
+            try:
+                await asyncio.start_server(self._ws_client, self.host, self.ws_port)
+                self.listening.append(f"ws://{self.host}:{self.ws_port}")
+            except OSError as e:
+                print(f"Remote: WebSocket port {self.ws_port} unavailable: {e}")
+
+    def _broadcast(self, message):
+        frame = ws_frame(message.encode("utf-8"))
+        for writer in list(self.clients):
+            try:
+                writer.write(frame)
+            except Exception:
+                self.clients.discard(writer)
+
+    async def _ws_client(self, reader, writer):
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+            headers = {}
+            for line in request.decode("latin-1").split("\r\n")[1:]:
+                if ":" in line:
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+            key = headers.get("sec-websocket-key")
+            if not key:
+                writer.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+                return
+            writer.write(
+                "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {ws_accept_key(key)}\r\n\r\n".encode("ascii")
+            )
+            self.clients.add(writer)
+            while True:
+                opcode, payload = await ws_read_frame(reader)
+                if opcode == 0x8:  # Close
+                    writer.write(ws_frame(b"", opcode=0x8))
+                    return
+                if opcode == 0x9:  # Ping
+                    writer.write(ws_frame(payload, opcode=0xA))
+                    continue
+                if opcode != 0x1:
+                    continue
+                try:
+                    address, args = parse_text_command(payload.decode("utf-8"))
+                except (ValueError, UnicodeDecodeError) as e:
+                    reply = {"ok": False, "error": str(e)}
+                else:
+                    if address == "/status":
+                        reply = dict(self.status(), type="status", ok=True)
+                    else:
+                        self.submit(address, args, "ws")
+                        reply = {"ok": True, "queued": address}
+                writer.write(ws_frame(json.dumps(reply).encode("utf-8")))
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+
+# --------- TEST CLIENT --------- #
+def send_osc(address, *args, host="127.0.0.1", port=OSC_PORT, wait_reply=False, timeout=1.0):
+    """Send one OSC message; returns the decoded reply (for /status) if wait_reply."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+        sock.sendto(build_osc(address, *args), (host, port))
+        if wait_reply:
+            data, _ = sock.recvfrom(65536)
+            return parse_osc(data)[0]
+    return None
+
+
+def ws_request(message, host="127.0.0.1", port=WS_PORT, timeout=2.0):
+    """Send one text command over a fresh WebSocket connection and return the JSON reply."""
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        key = base64.b64encode(os.urandom(16)).decode("ascii")
+        sock.sendall(
+            f"GET / HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n".encode("ascii")
+        )
+        response = b""
+        while b"\r\n\r\n" not in response:
+            chunk = sock.recv(1024)
+            if not chunk:
+                raise ConnectionError("handshake failed")
+            response += chunk
+        if ws_accept_key(key).encode("ascii") not in response:
+            raise ConnectionError("bad handshake reply")
+        rest = response.split(b"\r\n\r\n", 1)[1]
+        sock.sendall(ws_frame(message.encode("utf-8"), mask=True))
+        while True:
+            while len(rest) < 2:
+                rest += sock.recv(4096)
+            n = rest[1] & 0x7F
+            head = 2 + (2 if n == 126 else 8 if n == 127 else 0)
+            while len(rest) < head:
+                rest += sock.recv(4096)
+            if n == 126:
+                n = struct.unpack(">H", rest[2:4])[0]
+            elif n == 127:
+                n = struct.unpack(">Q", rest[2:10])[0]
+            while len(rest) < head + n:
+                rest += sock.recv(65536)
+            payload, rest = rest[head:head + n], rest[head + n:]
+            reply = json.loads(payload.decode("utf-8"))
+            if reply.get("type") == "status" and not message.strip().startswith("/status"):
+                continue  # A broadcast, not our reply
+            sock.sendall(ws_frame(b"", opcode=0x8, mask=True))
+            return reply
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m freekmapper.remote", description="Send a remote-control command")
+    parser.add_argument("command", help="e.g. /slot/go, /sequence/next, /surface/opacity")
+    parser.add_argument("args", nargs="*")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--ws", action="store_true", help="use the WebSocket port instead of OSC")
+    parser.add_argument("--port", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    try:
+        address, values = parse_command(args.command, args.args)
+    except ValueError as e:
+        print(e)
+        return 2
+    if args.ws:
+        print(json.dumps(ws_request(" ".join([address] + args.args), args.host, args.port or WS_PORT), indent=2))
+    else:
+        reply = send_osc(address, *values, host=args.host, port=args.port or OSC_PORT, wait_reply=address == "/status")
+        print(reply[1][0] if reply else f"sent {address}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,432 @@
 from pyopengltk import OpenGLFrame
 from OpenGL.GL import *
+import ctypes
 import time
 import glfw
 import numpy as np
 
+from .effects import effect_passes
+from .gl_programs import MASK_UNIT, EffectPrograms, GeneratorPrograms, create_surface_program
+from .instrumentation import FRAME_STATS
+from .masks import MASKS
+from .shader_source import ShaderFrame
+from .texture_manager import EFFECT_FORMAT, TextureManager
+from .warp import WARPS, corner_points, grid_shape, project
+
+
+QUAD_UVS = ((0, 0), (1, 0), (1, 1), (0, 1))
+TARGET_QUAD = ((-1, 1), (1, 1), (1, -1), (-1, -1))  # Whole render target in clip space (see draw_quad's flip)
+TILE_UPLOADS_PER_FRAME = 4
+MESH_IDLE_SECONDS = 2.0
+
+
+def draw_quad(pts, canvas_height, textured=True, uvs=QUAD_UVS, mask_uvs=None):
+    glBegin(GL_QUADS)
+    # Points are stored in Top-Left Canvas Coords, so GL Y = CanvasHeight - PointY.
+    for k, (p, uv) in enumerate(zip(pts, uvs)):
+        if textured:
+            glTexCoord2f(*uv)
+            glMultiTexCoord2f(GL_TEXTURE1, *(mask_uvs or uvs)[k])
+        glVertex2f(p[0], canvas_height - p[1])
+    glEnd()
+
+
+def texture_key(surface):
+    """Texture slot for a surface: per video source, per image file (shared by surfaces), else per surface."""
+    if surface.get("video_id"):
+        return surface["video_id"]
+    if surface.get("media_type") == "image" and surface.get("media_path"):
+        return ("image", surface["media_path"])
+    return id(surface)
+
+
+def draw_layers(program, pts, canvas_height, tex_a, tex_b, mix_amount, mode, opacity, uvs=QUAD_UVS, mask_tex=None, mask_uvs=None,
+                homography=None, tex_rect=(0.0, 0.0, 1.0, 1.0), mesh=None):
+    """Draw a surface from up to two textures blended by mix_amount (transitions).
+
+    `mask_tex` is the surface's mask, sampled at `mask_uvs` (surface UVs; defaults to `uvs`).
+    `homography` (see WarpCache.quad) makes the shader warp the quad per pixel;
+    `mesh` is a callable drawing the geometry instead of the quad `pts`.
+    """
+    def draw_geometry():
+        if mesh is not None:
+            mesh()
+        else:
+            draw_quad(pts, canvas_height, uvs=uvs, mask_uvs=mask_uvs)
+
+    glEnable(GL_TEXTURE_2D)
+    if program is not None:
+        if mask_tex is not None:
+            glActiveTexture(GL_TEXTURE0 + MASK_UNIT)
+            glBindTexture(GL_TEXTURE_2D, mask_tex)
+        glActiveTexture(GL_TEXTURE1)
+        glBindTexture(GL_TEXTURE_2D, tex_b or 0)
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, tex_a or 0)
+        program.use(tex_a is not None, tex_b is not None, mix_amount, opacity, mode, has_mask=mask_tex is not None,
+                    homography=homography, tex_rect=tex_rect)
+        draw_geometry()
+        program.release()
+        return
+
+    # Fixed-function fallback (no masks): fade the layers individually
+    for tex, alpha in ((tex_a, 1.0 - mix_amount), (tex_b, mix_amount)):
+        if tex is None or alpha <= 0.0:
+            continue
+        glColor4f(1.0, 1.0, 1.0, opacity * alpha)
+        glBindTexture(GL_TEXTURE_2D, tex)
+        draw_geometry()
+
+
+def surface_mask_texture(textures, surface):
+    """Texture of the surface's rasterized mask in this context, or None if it has none."""
+    image = MASKS.surface_mask(surface.get("mask"))
+    if image is None:
+        return None
+    return textures.acquire(("mask", id(image)), image)
+
+
+def surface_point(pts, u, v):
+    """Canvas position of texture coordinate (u, v) on a quad surface (bilinear)."""
+    top = (1 - u) * pts[0] + u * pts[1]
+    bottom = (1 - u) * pts[3] + u * pts[2]
+    return (1 - v) * top + v * bottom
+
+
+def region_visible(pts, region):
+    """Whether a surface's bounding box overlaps a canvas region (x, y, w, h)."""
+    x, y, w, h = region
+    pts = np.asarray(pts)
+    return pts[:, 0].max() >= x and pts[:, 0].min() <= x + w and pts[:, 1].max() >= y and pts[:, 1].min() <= y + h
+
+
+def surface_footprint(pts, scale):
+    """Approximate on-screen size (pixels) of a quad surface."""
+    pts = np.asarray(pts, dtype=np.float32)
+    w = max(np.linalg.norm(pts[1] - pts[0]), np.linalg.norm(pts[2] - pts[3]))
+    h = max(np.linalg.norm(pts[3] - pts[0]), np.linalg.norm(pts[2] - pts[1]))
+    return w * scale, h * scale
+
+
+class TileTextures:
+    """Loads tiles of large stills into a context's TextureManager.
+
+    At most uploads_per_frame tiles are uploaded per frame; tiles that aren't
+    resident yet are drawn from the low-res preview meanwhile.
+    """
+
+    def __init__(self, textures, uploads_per_frame=TILE_UPLOADS_PER_FRAME):
+        self.textures = textures
+        self.uploads_per_frame = uploads_per_frame
+        self.uploads_left = uploads_per_frame
+
+    def begin_frame(self):
+        self.uploads_left = self.uploads_per_frame
+
+    def get(self, pyramid, level, tx, ty):
+        key = ("tile", pyramid.key, level, tx, ty)
+        tex = self.textures.touch(key)
+        if tex is not None:
+            return tex
+        if self.uploads_left <= 0:
+            return None
+        self.uploads_left -= 1
+        try:
+            tile = np.ascontiguousarray(pyramid.tile(level, tx, ty))
+        except (OSError, ValueError) as e:
+            print(f"Tile {key} unavailable: {e}")
+            return None
+        return self.textures.acquire(key, tile)
+
+
+class MeshBuffers:
+    """Vertex/index buffers of grid-mesh surfaces in one GL context (or share group).
+
+    A mesh is uploaded when its tessellation changes (a new vertices array)
+    and drawn with one glDrawElements call; buffers of meshes not drawn for
+    MESH_IDLE_SECONDS are deleted.
+    """
+
+    def __init__(self, idle_seconds=MESH_IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self.entries = {}  # key -> [vertices, vbo, ibo, count, last_used]
+        self.now = time.perf_counter()
+
+    def begin_frame(self):
+        self.now = time.perf_counter()
+
+    def end_frame(self):
+        idle = [key for key, e in self.entries.items() if self.now - e[4] > self.idle_seconds]
+        for key in idle:
+            self._delete(self.entries.pop(key))
+
+    def draw(self, key, vertices, indices):
+        entry = self.entries.get(key)
+        if entry is None:
+            vbo, ibo = glGenBuffers(2)
+            entry = self.entries[key] = [None, vbo, ibo, 0, self.now]
+        entry[4] = self.now
+        if entry[0] is not vertices:
+            glBindBuffer(GL_ARRAY_BUFFER, entry[1])
+            if entry[0] is not None and entry[0].nbytes == vertices.nbytes and entry[3] == len(indices):
+                glBufferSubData(GL_ARRAY_BUFFER, 0, vertices.nbytes, vertices)  # Control point drag
+            else:
+                glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+                glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, entry[2])
+                glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+                entry[3] = len(indices)
+            entry[0] = vertices
+
+        stride = 16  # x, y, u, v float32
+        glBindBuffer(GL_ARRAY_BUFFER, entry[1])
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, entry[2])
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(2, GL_FLOAT, stride, ctypes.c_void_p(0))
+        for unit in (GL_TEXTURE0, GL_TEXTURE1):  # Media UV and mask UV
+            glClientActiveTexture(unit)
+            glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+            glTexCoordPointer(2, GL_FLOAT, stride, ctypes.c_void_p(8))
+        glDrawElements(GL_TRIANGLES, entry[3], GL_UNSIGNED_INT, None)
+        for unit in (GL_TEXTURE1, GL_TEXTURE0):
+            glClientActiveTexture(unit)
+            glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+    def _delete(self, entry):
+        glDeleteBuffers(2, [entry[1], entry[2]])
+
+    def clear(self):
+        for entry in self.entries.values():
+            self._delete(entry)
+        self.entries.clear()
+
+
+class ShaderTextures:
+    """Generator shader frames (shader_source.ShaderFrame) drawn into textures of a TextureManager.
+
+    Programs are compiled once per shader source hash. A key's texture is
+    only redrawn when its frame changes, so outputs sharing the manager draw
+    each generator frame once. Must run with the owning context current;
+    `framebuffer` is that context's (FBOs aren't shared).
+    """
+
+    def __init__(self, textures, name="gl"):
+        self.textures = textures
+        self.programs = GeneratorPrograms()
+        self.stage = f"generate:{name}"
+
+    def render(self, key, frame, width, height, framebuffer):
+        tex, stale = self.textures.render_target(key, width, height, frame)
+        if not stale:
+            return tex
+        entry = self.programs.get(key, frame)
+        if entry is None:
+            return None  # Never compiled: nothing to show yet
+        t0 = time.perf_counter()
+        previous = glGetIntegerv(GL_FRAMEBUFFER_BINDING)
+        viewport = glGetIntegerv(GL_VIEWPORT)
+        glBindFramebuffer(GL_FRAMEBUFFER, framebuffer)
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, tex, 0)
+        glViewport(0, 0, width, height)
+        glDisable(GL_BLEND)
+        self.programs.use(entry, frame.time, width, height, frame.params)
+        # Row 0 of the texture is the top of the surface: uv (0, 0) goes there
+        draw_quad(TARGET_QUAD, 0)
+        glUseProgram(0)
+        glEnable(GL_BLEND)
+        glBindFramebuffer(GL_FRAMEBUFFER, int(previous))
+        glViewport(*viewport)
+        FRAME_STATS.record(self.stage, time.perf_counter() - t0)
+        return tex
+
+    def clear(self):
+        self.programs.clear()
+
+
+class EffectChain:
+    """Surface effects (effects.py) run as shader passes on textures of a TextureManager.
+
+    Passes ping-pong between two scratch textures of the source's size (pooled
+    by the manager, shared by all surfaces of that size); the last one writes
+    the surface's effect texture, keyed by source and surface (surfaces sharing
+    a still keep their own). Passes at identity are skipped, and with none
+    left the source texture is drawn as is. The effect texture is only
+    redrawn when the frame or the effects object changes, so outputs sharing
+    the manager run a chain once per frame. Must run with the owning context
+    current; `framebuffer` is that context's (FBOs aren't shared).
+    """
+
+    def __init__(self, textures, name="gl"):
+        self.textures = textures
+        self.programs = EffectPrograms()
+        self.applied = {}  # effect texture key -> effects object last drawn into it
+        self.stage = f"effects:{name}"
+
+    def apply(self, key, tex, frame, effects, framebuffer, surface):
+        """Texture to draw for `tex` (the texture of `key`, holding `frame`) with `surface`'s `effects` applied."""
+        if not effects or tex is None:
+            return tex
+        passes = [(name, self.programs.get(name)) for name in effect_passes(effects)]
+        passes = [(name, entry) for name, entry in passes if entry is not None]
+        size = self.textures.size(key)
+        if not passes or size is None:
+            return tex
+        width, height = size
+        out_key = ("effects", key, id(surface))
+        out, stale = self.textures.render_target(out_key, width, height, frame, EFFECT_FORMAT)
+        if not stale and self.applied.get(out_key) is effects:
+            return out
+        if out_key not in self.applied and len(self.applied) >= len(self.textures.entries):
+            # Forget effect textures recycled since (idle or evicted)
+            self.applied = {k: v for k, v in self.applied.items() if k in self.textures.entries}
+        self.applied[out_key] = effects
+
+        t0 = time.perf_counter()
+        previous = glGetIntegerv(GL_FRAMEBUFFER_BINDING)
+        viewport = glGetIntegerv(GL_VIEWPORT)
+        glBindFramebuffer(GL_FRAMEBUFFER, framebuffer)
+        glViewport(0, 0, width, height)
+        glDisable(GL_BLEND)
+        glActiveTexture(GL_TEXTURE0)
+        source = tex
+        for i, (name, entry) in enumerate(passes):
+            if i == len(passes) - 1:
+                target = out
+            else:
+                target, _ = self.textures.render_target(("effects", width, height, i % 2), width, height, None, EFFECT_FORMAT)
+            glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, target, 0)
+            glBindTexture(GL_TEXTURE_2D, source)
+            self.programs.use(entry, name, effects, width, height)
+            draw_quad(TARGET_QUAD, 0)
+            source = target
+        glUseProgram(0)
+        glEnable(GL_BLEND)
+        glBindFramebuffer(GL_FRAMEBUFFER, int(previous))
+        glViewport(*viewport)
+        FRAME_STATS.record(self.stage, time.perf_counter() - t0)
+        return out
+
+    def release(self, keys):
+        """Release the effect textures of the sources whose texture keys are `keys`."""
+        keys = set(keys)
+        released = [k for k in self.applied if k[1] in keys]
+        for k in released:
+            del self.applied[k]
+        self.textures.release(released)
+
+    def clear(self):
+        self.programs.clear()
+        self.applied.clear()
+
+
+def surface_pyramid(get_pyramid, surface, frame, frame_b):
+    """Tile pyramid to draw instead of `frame` (a still shown on its own, not mid-transition).
+
+    Surfaces with effects draw the preview frame: passes run on whole textures, not tiles.
+    """
+    if get_pyramid is None or frame is None or frame_b is not None:
+        return None
+    if effect_passes(surface.get("effects")):
+        return None
+    if frame is not surface.get("static_frame"):
+        return None
+    return get_pyramid(surface)
+
+
+def draw_pyramid(program, pts, canvas_height, pyramid, tiles, preview_tex, opacity, scale, mask_tex=None, warp=None, region=None):
+    """Draw a large still from the pyramid level matching its on-screen footprint.
+
+    With a `warp` (WarpCache.quad) tile corners are placed on the homography
+    and the shader samples each tile through it. The footprint is capped at
+    the viewport `region` (x, y, w, h in canvas pixels) and tiles outside it
+    are neither drawn nor uploaded, so a surface dragged far past the edge
+    doesn't pull in every tile of level 0.
+    """
+    w, h = surface_footprint(pts, scale)
+    if region is not None:
+        w, h = min(w, region[2] * scale), min(h, region[3] * scale)
+    level = pyramid.level_for(w, h)
+    homography = warp[1] if warp is not None else None
+    for tx, ty, (u0, v0, u1, v1) in pyramid.tiles(level):
+        uvs = ((u0, v0), (u1, v0), (u1, v1), (u0, v1))
+        if warp is not None:
+            corners = [project(warp[0], u, v) for u, v in uvs]
+        else:
+            corners = [surface_point(pts, u, v) for u, v in uvs]
+        if region is not None and not region_visible(corners, region):
+            continue
+        tex = tiles.get(pyramid, level, tx, ty)
+        if tex is not None:
+            draw_layers(program, corners, canvas_height, tex, None, 0.0, "crossfade", opacity, mask_tex=mask_tex, mask_uvs=uvs,
+                        homography=homography, tex_rect=(u0, v0, u1, v1))
+        elif preview_tex is not None:
+            draw_layers(program, corners, canvas_height, preview_tex, None, 0.0, "crossfade", opacity, uvs=uvs, mask_tex=mask_tex,
+                        homography=homography)
+
+
+def draw_surface_media(program, surface, canvas_height, textures, tiles, meshes, tex, tex_b, mix_amount, mode, pyramid, scale, region=None):
+    """Draw a surface's media: a quad warped by its homography, or its tessellated grid mesh.
+
+    Grid meshes draw stills from the preview frame (pyramid tiles are per quad).
+    `region` is the canvas area shown (x, y, w, h), used to cull pyramid tiles.
+    """
+    mask_tex = surface_mask_texture(textures, surface) if (tex or tex_b) else None
+    pts = surface["points"]
+    opacity = surface["opacity"]
+    grid = grid_shape(surface)
+    if grid is not None:
+        if not (tex or tex_b):
+            return
+        vertices, indices = WARPS.mesh(pts, grid, canvas_height)
+        mesh = lambda: meshes.draw(id(surface), vertices, indices)
+        draw_layers(program, pts, canvas_height, tex, tex_b, mix_amount, mode, opacity, mask_tex=mask_tex, mesh=mesh)
+        return
+    warp = WARPS.quad(pts, canvas_height) if program is not None else None
+    if pyramid is not None:
+        draw_pyramid(program, pts, canvas_height, pyramid, tiles, tex, opacity, scale, mask_tex, warp, region)
+    elif tex or tex_b:
+        draw_layers(program, pts, canvas_height, tex, tex_b, mix_amount, mode, opacity, mask_tex=mask_tex,
+                    homography=warp[1] if warp is not None else None)
+
+
+def draw_outline(surface, canvas_height):
+    """Outline of a surface: the quad, or the net of a grid's control points."""
+    pts = surface["points"]
+    grid = grid_shape(surface)
+    if grid is None:
+        glBegin(GL_LINE_LOOP)
+        for p in pts:
+            glVertex2f(p[0], canvas_height - p[1])
+        glEnd()
+        return
+    cols, rows = grid
+    net = np.asarray(pts).reshape(rows + 1, cols + 1, 2)
+    for line in list(net) + list(net.transpose(1, 0, 2)):
+        glBegin(GL_LINE_STRIP)
+        for p in line:
+            glVertex2f(p[0], canvas_height - p[1])
+        glEnd()
+
+
 # ==========================
 # Embedded OpenGL Preview (Tkinter + pyopengltk)
 # ==========================
 class GLTkRenderer(OpenGLFrame):
-    def __init__(self, master, surfaces, get_frame_callback, fps_callback=None, canvas_width=1920, canvas_height=1080, **kwargs):
+    def __init__(self, master, surfaces, get_frame_callback, fps_callback=None, canvas_width=1920, canvas_height=1080, get_layers_callback=None, get_pyramid_callback=None, **kwargs):
         self.surfaces = surfaces
         self.get_frame = get_frame_callback
+        self.get_layers = get_layers_callback
+        self.get_pyramid = get_pyramid_callback
+        self.textures = TextureManager(name="preview")
+        self.tiles = TileTextures(self.textures)
+        self.meshes = MeshBuffers()
+        self.generators = ShaderTextures(self.textures, "preview")
+        self.effects = EffectChain(self.textures, "preview")
+        self.framebuffer = None  # Effect passes draw through this (created with the context)
         self.fps_callback = fps_callback
-        self.textures = {}  # id -> texture
+        self.program = None
         self.selected_surface_index = None
         self.last_time = time.time()
         # default size if not provided
@@ -34,6 +448,8 @@ class GLTkRenderer(OpenGLFrame):
         glEnable(GL_BLEND)
         glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
         glClearColor(0.0, 0.0, 0.0, 1.0)
+        self.program = create_surface_program()
+        self.framebuffer = glGenFramebuffers(1)
         self.context_ready = True
 
     def set_size(self, event):
@@ -41,83 +457,39 @@ class GLTkRenderer(OpenGLFrame):
         self.width = max(event.width, 1)
         self.height = max(event.height, 1)
 
-    def upload_texture(self, surface, frame):
-        """Upload RGB frame to GPU."""
-        video_id = surface.get("video_id") or id(surface)
-        h, w = frame.shape[:2]
-
-        if video_id not in self.textures:
-            self.textures[video_id] = glGenTextures(1)
-
-        tex = self.textures[video_id]
-        glBindTexture(GL_TEXTURE_2D, tex)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-
-        # Use pixel store to handle alignment if needed, but usually default is 4. 
-        # If we have issues we can set GL_UNPACK_ALIGNMENT to 1.
-        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
-
-        glTexImage2D(
-            GL_TEXTURE_2D,
-            0,
-            GL_RGB,
-            w,
-            h,
-            0,
-            GL_RGB,
-            GL_UNSIGNED_BYTE,
-            frame,
-        )
-        return tex
-
-    def draw_surface(self, surface, tex, width, height, is_selected=False):
+    def get_surface_layers(self, surface, i):
+        """(frame_a, frame_b, mix, mode) for a surface; plain frame if no layer callback."""
+        if self.get_layers:
+            return self.get_layers(surface, i)
+        return self.get_frame(surface, i), None, 0.0, "cut"
+    def upload_texture(self, video_id, frame):
+        """Upload RGB frame to GPU (generator frames are drawn into their texture instead)."""
+        if isinstance(frame, ShaderFrame):
+            return self.generators.render(video_id, frame, self.canvas_width, self.canvas_height, self.framebuffer)
+        return self.textures.acquire(video_id, frame)
+
+    def draw_surface(self, surface, tex, width, height, is_selected=False, tex_b=None, mix_amount=0.0, mode="cut", pyramid=None):
         pts = surface["points"]
-        opacity = surface["opacity"]
 
-        # If texture is present, draw textured quad
-        if tex:
-            glColor4f(1.0, 1.0, 1.0, opacity)
-            glBindTexture(GL_TEXTURE_2D, tex)
-            glEnable(GL_TEXTURE_2D)
-            
-            glBegin(GL_QUADS)
-            # OpenGL origin bottom-left, Tk origin top-left → flip Y via (height - y)
-            # Note: We are now using Canvas Coordinates for points.
-            # glOrtho is set to Canvas Size.
-            # So we don't need to flip Y relative to widget height, but relative to Canvas Height if points are top-left.
-            # Let's assume points are stored in Top-Left Canvas Coords (0,0 is top-left of 1920x1080).
-            # So GL Y = CanvasHeight - PointY.
-            
-            glTexCoord2f(0, 0)
-            glVertex2f(pts[0][0], self.canvas_height - pts[0][1])
-            glTexCoord2f(1, 0)
-            glVertex2f(pts[1][0], self.canvas_height - pts[1][1])
-            glTexCoord2f(1, 1)
-            glVertex2f(pts[2][0], self.canvas_height - pts[2][1])
-            glTexCoord2f(0, 1)
-            glVertex2f(pts[3][0], self.canvas_height - pts[3][1])
-            glEnd()
+        # If texture is present, draw textured quad (or mesh)
+        if tex or tex_b:
+            scale = min(width / self.canvas_width, height / self.canvas_height)
+            draw_surface_media(
+                self.program, surface, self.canvas_height, self.textures, self.tiles, self.meshes,
+                tex, tex_b, mix_amount, mode, pyramid, scale, (0, 0, self.canvas_width, self.canvas_height),
+            )
         else:
             # Draw placeholder wireframe
             glDisable(GL_TEXTURE_2D)
             glColor4f(0.5, 0.5, 0.5, 0.5)
-            glBegin(GL_QUADS)
-            glVertex2f(pts[0][0], self.canvas_height - pts[0][1])
-            glVertex2f(pts[1][0], self.canvas_height - pts[1][1])
-            glVertex2f(pts[2][0], self.canvas_height - pts[2][1])
-            glVertex2f(pts[3][0], self.canvas_height - pts[3][1])
-            glEnd()
+            draw_quad(corner_points(surface), self.canvas_height, textured=False)
 
         # Draw Selection / Controls
         if is_selected:
             glDisable(GL_TEXTURE_2D)
             glLineWidth(2.0)
             glColor3f(0.0, 1.0, 0.0)
-            glBegin(GL_LINE_LOOP)
-            for p in pts:
-                glVertex2f(p[0], self.canvas_height - p[1])
-            glEnd()
+            draw_outline(surface, self.canvas_height)
 
             glPointSize(8.0)
             glBegin(GL_POINTS)
@@ -133,6 +505,7 @@ class GLTkRenderer(OpenGLFrame):
 
         # Ensure Tkinter GL context is current
         self.tkMakeCurrent()
+        t0 = time.perf_counter()
         
         w, h = self.width, self.height
         glViewport(0, 0, w, h)
@@ -149,13 +522,29 @@ class GLTkRenderer(OpenGLFrame):
         glMatrixMode(GL_MODELVIEW)
         glLoadIdentity()
 
+        self.textures.begin_frame()
+        self.tiles.begin_frame()
+        self.meshes.begin_frame()
         for i, surface in enumerate(self.surfaces):
-            frame = self.get_frame(surface, i)
-            tex = None
+            frame, frame_b, mix_amount, mode = self.get_surface_layers(surface, i)
+            key = texture_key(surface)
+            effects = surface.get("effects")
+            tex = tex_b = None
             if frame is not None:
-                tex = self.upload_texture(surface, frame)
-            
-            self.draw_surface(surface, tex, w, h, i == self.selected_surface_index)
+                tex = self.effects.apply(key, self.upload_texture(key, frame), frame, effects, self.framebuffer, surface)
+            if frame_b is not None:
+                tex_b = self.effects.apply((key, "incoming"), self.upload_texture((key, "incoming"), frame_b), frame_b, effects,
+                                           self.framebuffer, surface)
+
+            self.draw_surface(
+                surface, tex, w, h, i == self.selected_surface_index,
+                tex_b=tex_b, mix_amount=mix_amount, mode=mode,
+                pyramid=surface_pyramid(self.get_pyramid, surface, frame, frame_b),
+            )
+
+        self.textures.end_frame()
+        self.meshes.end_frame()
+        FRAME_STATS.record("draw:preview", time.perf_counter() - t0)
 
         # FPS callback
         now = time.time()
@@ -167,54 +556,58 @@ class GLTkRenderer(OpenGLFrame):
         self.last_time = now
         
         # Swap buffers!
+        t0 = time.perf_counter()
         self.tkSwapBuffers()
+        FRAME_STATS.record("swap:preview", time.perf_counter() - t0)
 
 
 # ==========================
 # Fullscreen OpenGL Renderer (GLFW)
 # ==========================
 class GLFullscreenRenderer:
-    def __init__(self, surfaces, get_frame_callback, selected_index=None, canvas_width=1920, canvas_height=1080):
+    """Draws the canvas, or the `region` (x, y, w, h) of it, into the current GLFW window.
+
+    Outputs sharing a GL context pass a shared `textures`/`tiles`/`meshes`/
+    `generators`/`effects`; the owner then runs their begin_frame()/end_frame() once
+    per frame around all outputs.
+    """
+
+    def __init__(self, surfaces, get_frame_callback, selected_index=None, canvas_width=1920, canvas_height=1080, get_layers_callback=None, get_pyramid_callback=None, textures=None, tiles=None, meshes=None, generators=None, effects=None, region=None):
         self.surfaces = surfaces
         self.get_frame = get_frame_callback
-        self.textures = {}
+        self.get_layers = get_layers_callback
+        self.get_pyramid = get_pyramid_callback
+        self.shared_textures = textures is not None
+        self.textures = textures if textures is not None else TextureManager(name="output")
+        self.tiles = tiles if tiles is not None else TileTextures(self.textures)
+        self.meshes = meshes if meshes is not None else MeshBuffers()
+        self.generators = generators if generators is not None else ShaderTextures(self.textures, "output")
+        self.effects = effects if effects is not None else EffectChain(self.textures, "output")
+        self.framebuffer = None  # Effect passes draw through this (created with the program)
+        self.program = None
+        self.program_ready = False
         self.selected_surface_index = selected_index
         self.edit_mode = True
         self.show_controls = True
         self.blackout = False
+        self.blend = None  # Edge blend zones of this output (see masks.rasterize_blend); replaced on edit
         
         # Virtual Canvas Size
         self.canvas_width = canvas_width
         self.canvas_height = canvas_height
+        self.region = region or (0, 0, canvas_width, canvas_height)
 
-    def upload_texture(self, surface, frame):
-        vid = surface.get("video_id") or id(surface)
-        h, w = frame.shape[:2]
-
-        if vid not in self.textures:
-            self.textures[vid] = glGenTextures(1)
-
-        tex = self.textures[vid]
-        glBindTexture(GL_TEXTURE_2D, tex)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-        
-        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
-
-        glTexImage2D(
-            GL_TEXTURE_2D,
-            0,
-            GL_RGB,
-            w,
-            h,
-            0,
-            GL_RGB,
-            GL_UNSIGNED_BYTE,
-            frame,
-        )
-        return tex
+    def get_surface_layers(self, surface, i):
+        if self.get_layers:
+            return self.get_layers(surface, i)
+        return self.get_frame(surface, i), None, 0.0, "cut"
+    def upload_texture(self, vid, frame):
+        if isinstance(frame, ShaderFrame):
+            return self.generators.render(vid, frame, self.canvas_width, self.canvas_height, self.framebuffer)
+        return self.textures.acquire(vid, frame)
 
     def draw(self, width, height):
+        t0 = time.perf_counter()
         glViewport(0, 0, width, height)
         glClearColor(0, 0, 0, 1)
         glClear(GL_COLOR_BUFFER_BIT)
@@ -222,10 +615,17 @@ class GLFullscreenRenderer:
         if self.blackout:
             return
 
+        # Compile lazily: the GLFW context is only current once draw() runs
+        if not self.program_ready:
+            self.program = create_surface_program()
+            self.framebuffer = glGenFramebuffers(1)
+            self.program_ready = True
+
         glMatrixMode(GL_PROJECTION)
         glLoadIdentity()
-        # Scale Canvas to Window
-        glOrtho(0, self.canvas_width, 0, self.canvas_height, -1, 1)
+        # Scale the canvas region to the window (GL Y = CanvasHeight - PointY)
+        rx, ry, rw, rh = self.region
+        glOrtho(rx, rx + rw, self.canvas_height - (ry + rh), self.canvas_height - ry, -1, 1)
 
         glMatrixMode(GL_MODELVIEW)
         glLoadIdentity()
@@ -234,31 +634,36 @@ class GLFullscreenRenderer:
         glEnable(GL_BLEND)
         glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
+        if not self.shared_textures:
+            self.textures.begin_frame()
+            self.tiles.begin_frame()
+            self.meshes.begin_frame()
+        if self.program is not None:
+            blend = MASKS.output_blend(self.blend, width, height)
+            blend_tex = self.textures.acquire(("blend", id(self)), blend) if blend is not None else None
+            self.program.set_blend(blend_tex, width, height)
         for i, surface in enumerate(self.surfaces):
-            frame = self.get_frame(surface, i)
-            tex = None
+            pts = surface["points"]
+            if not region_visible(pts, self.region):
+                continue  # Shown by another output: no upload here
+            frame, frame_b, mix_amount, mode = self.get_surface_layers(surface, i)
+            key = texture_key(surface)
+            effects = surface.get("effects")
+            tex = tex_b = None
             if frame is not None:
-                tex = self.upload_texture(surface, frame)
+                tex = self.effects.apply(key, self.upload_texture(key, frame), frame, effects, self.framebuffer, surface)
+            if frame_b is not None:
+                tex_b = self.effects.apply((key, "incoming"), self.upload_texture((key, "incoming"), frame_b), frame_b, effects,
+                                           self.framebuffer, surface)
 
-            pts = surface["points"]
-            opacity = surface["opacity"]
             is_selected = (i == self.selected_surface_index)
+            pyramid = surface_pyramid(self.get_pyramid, surface, frame, frame_b)
 
-            if tex:
-                glColor4f(1, 1, 1, opacity)
-                glBindTexture(GL_TEXTURE_2D, tex)
-                glEnable(GL_TEXTURE_2D)
-
-                glBegin(GL_QUADS)
-                glTexCoord2f(0, 0)
-                glVertex2f(pts[0][0], self.canvas_height - pts[0][1])
-                glTexCoord2f(1, 0)
-                glVertex2f(pts[1][0], self.canvas_height - pts[1][1])
-                glTexCoord2f(1, 1)
-                glVertex2f(pts[2][0], self.canvas_height - pts[2][1])
-                glTexCoord2f(0, 1)
-                glVertex2f(pts[3][0], self.canvas_height - pts[3][1])
-                glEnd()
+            if tex or tex_b:
+                draw_surface_media(
+                    self.program, surface, self.canvas_height, self.textures, self.tiles, self.meshes,
+                    tex, tex_b, mix_amount, mode, pyramid, min(width / rw, height / rh), self.region,
+                )
             # else:
             #     # In Fullscreen, we don't show the placeholder grey quad
             #     # to ensure "hidden" surfaces are truly invisible (transparent).
@@ -273,11 +678,7 @@ class GLFullscreenRenderer:
                     glColor3f(0.0, 1.0, 0.0)
                 else:
                     glColor3f(0.0, 1.0, 1.0)
-
-                glBegin(GL_LINE_LOOP)
-                for p in pts:
-                    glVertex2f(p[0], self.canvas_height - p[1])
-                glEnd()
+                draw_outline(surface, self.canvas_height)
 
                 # Handles
                 glPointSize(10.0 if is_selected else 7.0)
@@ -288,3 +689,8 @@ class GLFullscreenRenderer:
                 glEnd()
 
                 glEnable(GL_TEXTURE_2D)
+
+        if not self.shared_textures:
+            self.textures.end_frame()
+            self.meshes.end_frame()
+        FRAME_STATS.record("draw:output", time.perf_counter() - t0)
@@ -1,9 +1,26 @@
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
+from tkinter import ttk, filedialog, messagebox, simpledialog
 import os
 
+from .image_sequence import is_image_sequence
+from .media_probe import LIVE_SCHEMES, MEDIA_PROBE, describe_media, format_duration
+from .sequencer import TRANSITION_TYPES, step_in_out, step_transition
+
+def ask_live_path(parent):
+    """Ask for a camera index/device, shared-memory ring or stream URL; returns a live media path or None."""
+    text = simpledialog.askstring(
+        "Live Input",
+        "Camera index or device (0, /dev/video2), shm:NAME for a shared-memory producer,\n"
+        "or a stream URL (rtsp://..., http://...; add #jitter=MS to set the buffer):",
+        parent=parent,
+    )
+    text = (text or "").strip()
+    if not text:
+        return None
+    return text if text.startswith(LIVE_SCHEMES) else f"camera:{text}"
+
 class SequenceEditorDialog(tk.Toplevel):
-    def __init__(self, parent, surfaces, sequence_steps, continuous_surfaces, on_apply):
+    def __init__(self, parent, surfaces, sequence_steps, continuous_surfaces, on_apply, image_duration=None):
         super().__init__(parent)
         self.title("Sequence Editor (Playlist)")
         self.geometry("600x600")
@@ -11,10 +28,16 @@ class SequenceEditorDialog(tk.Toplevel):
         self.grab_set()
         
         self.surfaces = surfaces
-        # sequence_steps: list of {"surface_index": int, "media_path": str, "media_type": str}
+        # sequence_steps: list of {"surface_index": int, "media_path": str, "media_type": str,
+        #                          "transition": {"type": str, "duration": float},
+        #                          "in_point": float, "out_point": float | None}
         self.sequence_steps = list(sequence_steps) 
         self.continuous_surfaces = set(continuous_surfaces)
         self.on_apply = on_apply
+        self.image_duration = image_duration
+        # Durations/thumbnails come from the background probe; poll until all are known
+        self.probe_poll = None
+        self.thumbnails = {}  # thumbnail path -> PhotoImage (Tk needs the reference kept)
         
         self.setup_ui()
         
@@ -25,6 +48,7 @@ class SequenceEditorDialog(tk.Toplevel):
         
         # --- LEFT: SEQUENCE LIST ---
         seq_frame = ttk.LabelFrame(main_frame, text="Playback Sequence (Playlist)", padding=5)
+        self.seq_frame = seq_frame
         seq_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 5))
         
         # Listbox with Scrollbar
@@ -34,6 +58,7 @@ class SequenceEditorDialog(tk.Toplevel):
         
         self.seq_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.seq_listbox.bind("<<ListboxSelect>>", self.on_step_select)
         
         self.refresh_sequence_list()
         
@@ -53,10 +78,33 @@ class SequenceEditorDialog(tk.Toplevel):
         self.surface_cb.pack(fill=tk.X, pady=2)
         
         ttk.Button(add_frame, text="Select Media...", command=self.browse_media).pack(fill=tk.X, pady=2)
+        ttk.Button(add_frame, text="Select Sequence Folder...", command=self.browse_sequence).pack(fill=tk.X, pady=2)
+        ttk.Button(add_frame, text="Select Live Input...", command=self.browse_live).pack(fill=tk.X, pady=2)
         self.selected_media_path = None
-        self.media_lbl = ttk.Label(add_frame, text="No media selected", foreground="gray", wraplength=150)
+        self.preview_path = None
+        self.media_lbl = ttk.Label(add_frame, text="No media selected", foreground="gray", wraplength=150, compound=tk.TOP)
         self.media_lbl.pack(pady=2)
         
+        # Transition into this step
+        ttk.Label(add_frame, text="Transition:").pack(anchor=tk.W)
+        self.transition_var = tk.StringVar(value="cut")
+        ttk.Combobox(add_frame, textvariable=self.transition_var, values=TRANSITION_TYPES, state="readonly").pack(fill=tk.X, pady=2)
+        ttk.Label(add_frame, text="Duration (sec):").pack(anchor=tk.W)
+        self.transition_duration_entry = ttk.Entry(add_frame, width=6)
+        self.transition_duration_entry.insert(0, "1.0")
+        self.transition_duration_entry.pack(anchor=tk.W, pady=2)
+        
+        # In / Out points (videos, seconds; empty Out = play to the end)
+        io_frame = ttk.Frame(add_frame)
+        io_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(io_frame, text="In:").pack(side=tk.LEFT)
+        self.in_entry = ttk.Entry(io_frame, width=6)
+        self.in_entry.insert(0, "0")
+        self.in_entry.pack(side=tk.LEFT, padx=2)
+        ttk.Label(io_frame, text="Out:").pack(side=tk.LEFT)
+        self.out_entry = ttk.Entry(io_frame, width=6)
+        self.out_entry.pack(side=tk.LEFT, padx=2)
+        
         ttk.Button(add_frame, text="Add to Playlist", command=self.add_step).pack(fill=tk.X, pady=5)
         
         # Edit Sequence Section
@@ -66,6 +114,7 @@ class SequenceEditorDialog(tk.Toplevel):
         ttk.Button(edit_frame, text="Move Up", command=self.move_up).pack(fill=tk.X, pady=2)
         ttk.Button(edit_frame, text="Move Down", command=self.move_down).pack(fill=tk.X, pady=2)
         ttk.Button(edit_frame, text="Remove Step", command=self.remove_step).pack(fill=tk.X, pady=2)
+        ttk.Button(edit_frame, text="Set Transition", command=self.set_transition).pack(fill=tk.X, pady=2)
         
         # Continuous Section
         cont_frame = ttk.LabelFrame(right_frame, text="Continuous Surfaces", padding=5)
@@ -87,12 +136,68 @@ class SequenceEditorDialog(tk.Toplevel):
     def browse_media(self):
         filename = filedialog.askopenfilename(
             title="Select Media",
-            filetypes=[("Media files", "*.mp4 *.avi *.mov *.mkv *.jpg *.png"), ("All files", "*.*")],
+            filetypes=[("Media files", "*.mp4 *.avi *.mov *.mkv *.jpg *.png *.frag *.glsl"), ("All files", "*.*")],
             parent=self
         )
         if filename:
             self.selected_media_path = filename
-            self.media_lbl.config(text=os.path.basename(filename), foreground="black")
+            self.show_media_preview(filename)
+
+    def browse_sequence(self):
+        folder = filedialog.askdirectory(title="Select Image Sequence Folder", parent=self)
+        if not folder:
+            return
+        if not is_image_sequence(folder):
+            messagebox.showwarning("Error", "No PNG/JPEG/TIFF or .npy frames in that folder", parent=self)
+            return
+        self.selected_media_path = folder
+        self.show_media_preview(folder)
+
+    def browse_live(self):
+        path = ask_live_path(self)
+        if path:
+            self.selected_media_path = path
+            self.show_media_preview(path)
+
+    def on_step_select(self, event=None):
+        sel = self.seq_listbox.curselection()
+        if sel:
+            self.show_media_preview(self.sequence_steps[sel[0]]["media_path"])
+
+    def show_media_preview(self, path):
+        meta = MEDIA_PROBE.get(path)
+        self.media_lbl.config(
+            text=f"{os.path.basename(path)}\n{describe_media(meta)}",
+            image=self.thumbnail(meta) or "",
+            foreground="black",
+        )
+        self.preview_path = path
+        if meta is None:
+            self.schedule_probe_poll()
+
+    def thumbnail(self, meta):
+        path = meta.get("thumbnail") if meta else None
+        if not path:
+            return None
+        if path not in self.thumbnails:
+            try:
+                self.thumbnails[path] = tk.PhotoImage(file=path)
+            except tk.TclError:
+                self.thumbnails[path] = None
+        return self.thumbnails[path]
+
+    def schedule_probe_poll(self):
+        if self.probe_poll is None:
+            self.probe_poll = self.after(200, self.poll_probes)
+
+    def poll_probes(self):
+        self.probe_poll = None
+        sel = self.seq_listbox.curselection()
+        self.refresh_sequence_list()
+        if sel:
+            self.seq_listbox.selection_set(sel[0])
+        if self.preview_path:
+            self.show_media_preview(self.preview_path)
             
     def add_step(self):
         idx = self.surface_cb.current()
@@ -111,18 +216,64 @@ class SequenceEditorDialog(tk.Toplevel):
         step = {
             "surface_index": idx,
             "media_path": self.selected_media_path,
-            "media_type": media_type
+            "media_type": media_type,
+            "transition": self.get_transition(),
         }
+        if media_type == "video":
+            step["in_point"], step["out_point"] = step_in_out(
+                {"in_point": self.in_entry.get().strip(), "out_point": self.out_entry.get().strip()}
+            )
         self.sequence_steps.append(step)
         self.refresh_sequence_list()
+
+    def get_transition(self):
+        try:
+            duration = max(float(self.transition_duration_entry.get()), 0.0)
+        except ValueError:
+            duration = 1.0
+        return {"type": self.transition_var.get(), "duration": duration}
+
+    def set_transition(self):
+        sel = self.seq_listbox.curselection()
+        if not sel: return
+        idx = sel[0]
+        self.sequence_steps[idx] = dict(self.sequence_steps[idx], transition=self.get_transition())
+        self.refresh_sequence_list()
+        self.seq_listbox.selection_set(idx)
         
     def refresh_sequence_list(self):
         self.seq_listbox.delete(0, tk.END)
+        total = 0.0
         for i, step in enumerate(self.sequence_steps):
             s_idx = step["surface_index"]
             s_name = self.surfaces[s_idx]["name"] if 0 <= s_idx < len(self.surfaces) else "Unknown"
             m_name = os.path.basename(step["media_path"])
-            self.seq_listbox.insert(tk.END, f"{i+1}. {s_name} - {m_name}")
+            kind, duration = step_transition(step)
+            t_name = f" [{kind} {duration:.1f}s]" if kind != "cut" else ""
+            in_point, out_point = step_in_out(step)
+            if in_point > 0 or out_point is not None:
+                out_txt = f"{out_point:.1f}" if out_point is not None else "end"
+                t_name += f" [{in_point:.1f}-{out_txt}s]"
+            meta = MEDIA_PROBE.get(step["media_path"])
+            if meta is None:
+                self.schedule_probe_poll()
+            length = self.step_length(step, meta)
+            if length is not None and total is not None:
+                total += length
+            else:
+                total = None
+            self.seq_listbox.insert(tk.END, f"{i+1}. {s_name} - {m_name} ({format_duration(length)}){t_name}")
+        self.seq_frame.config(text=f"Playback Sequence (Playlist) - {format_duration(total)}")
+
+    def step_length(self, step, meta):
+        """Playing time of a step in seconds (None if not known yet); stills, live inputs and shaders use the sequencer default."""
+        if step["media_type"] == "image" or (meta and meta.get("endless")):
+            return self.image_duration
+        if not meta or meta.get("duration") is None:
+            return None
+        in_point, out_point = step_in_out(step)
+        end = meta["duration"] if out_point is None else min(out_point, meta["duration"])
+        return max(end - in_point, 0.0)
             
     def move_up(self):
         sel = self.seq_listbox.curselection()
@@ -0,0 +1,530 @@
+import threading
+import time
+
+from .image_cache import IMAGE_CACHE
+from .show_clock import SHOW_CLOCK, EventScheduler
+from .trace import TRACE
+from .video_source import open_source
+
+TRANSITION_TYPES = ("cut", "crossfade", "dissolve")
+PREROLL_SECONDS = 1.0  # Open and decode the next step this long before its transition starts
+
+
+def step_in_out(step):
+    """Return (in_point, out_point) in seconds; out_point is None for 'play to the end'."""
+    try:
+        in_point = max(float(step.get("in_point") or 0.0), 0.0)
+        out_point = step.get("out_point")
+        out_point = float(out_point) if out_point not in (None, "") else None
+    except (TypeError, ValueError):
+        return 0.0, None
+    if out_point is not None and out_point <= in_point:
+        out_point = None
+    return in_point, out_point
+
+
+def media_loaded(surface, step):
+    """True if the surface already holds the step's media (stills evicted by the memory manager don't count)."""
+    if surface.get("media_path") != step["media_path"]:
+        return False
+    return surface.get("media_type") != "image" or surface.get("static_frame") is not None
+
+
+def step_transition(step):
+    """Return (type, duration) of the transition *into* a sequence step."""
+    transition = step.get("transition") or {}
+    kind = transition.get("type", "cut")
+    if kind not in TRANSITION_TYPES:
+        kind = "cut"
+    try:
+        duration = max(float(transition.get("duration", 0.0)), 0.0)
+    except (TypeError, ValueError):
+        duration = 0.0
+    if kind == "cut":
+        duration = 0.0
+    return kind, duration
+
+
+class PendingMedia:
+    """Media for an upcoming step, opened and decoded ahead of time on a worker thread."""
+
+    def __init__(self, step_index, step, indexer=None, clock=None):
+        self.step_index = step_index
+        self.step = step
+        self.indexer = indexer
+        self.clock = clock
+        self.video_id = f"video_pending_{step_index}_{time.time()}"
+        self.source = None
+        self.static_frame = None
+        self.error = None
+        self.ready = threading.Event()
+        self.attached = False  # True once the source is owned by a surface
+
+    def start(self):
+        threading.Thread(target=self.load, daemon=True).start()
+
+    def load(self):
+        try:
+            path = self.step["media_path"]
+            if self.step["media_type"] == "video":
+                vs = open_source(path, loop=False, playing=False, clock=self.clock)
+                in_point, _ = step_in_out(self.step)
+                if in_point > 0:
+                    # Cue the in point now so starting the step needs no seek
+                    index = self.indexer.get(path) if self.indexer else None
+                    frame = vs.seek(in_point, index)
+                else:
+                    frame = vs.prime()
+                if frame is None:
+                    vs.release()
+                    raise IOError(f"Could not decode {path}")
+                self.source = vs
+            elif self.step["media_type"] == "image":
+                self.static_frame = IMAGE_CACHE.get(path)
+                if self.static_frame is None:
+                    raise IOError(f"Could not read {path}")
+        except Exception as e:
+            self.error = e
+        finally:
+            self.ready.set()
+
+    def frame(self):
+        if self.source is not None:
+            return self.source.get_current_frame()
+        return self.static_frame
+
+    def discard(self):
+        """Drop the pre-buffered media if nobody took ownership of it."""
+        if not self.attached and self.source is not None:
+            self.source.release()
+            self.source = None
+
+
+class Transition:
+    """An overlap between the outgoing and incoming step, plus decode load stats."""
+
+    def __init__(self, kind, duration, from_surface, pending, started, start_delay=0.0):
+        self.kind = kind
+        self.duration = duration
+        self.from_surface = from_surface
+        self.to_surface = pending.step["surface_index"]
+        self.pending = pending
+        self.started = started
+        self.start_delay = start_delay  # Seconds the incoming media was late
+
+        self.iterations = 0
+        self.late_iterations = 0
+        self.max_decoders = 0
+        self.decode_total = 0.0
+        self.decode_max = 0.0
+
+    def progress(self, now):
+        if self.duration <= 0:
+            return 1.0
+        return min(max((now - self.started) / self.duration, 0.0), 1.0)
+
+    def record_decode(self, active_decoders, busy, period):
+        self.iterations += 1
+        self.max_decoders = max(self.max_decoders, active_decoders)
+        self.decode_total += busy
+        self.decode_max = max(self.decode_max, busy)
+        if busy > period:
+            self.late_iterations += 1
+
+    def report(self):
+        avg = self.decode_total / self.iterations if self.iterations else 0.0
+        return {
+            "type": self.kind,
+            "duration": self.duration,
+            "decoders": self.max_decoders,
+            "decode_ms_avg": avg * 1000.0,
+            "decode_ms_max": self.decode_max * 1000.0,
+            "late_iterations": self.late_iterations,
+            "iterations": self.iterations,
+            "start_delay_ms": self.start_delay * 1000.0,
+        }
+
+
+class Sequencer:
+    """Sequential playback: step order, continuous surfaces, pre-buffering and transitions.
+
+    Works directly on the app's surface list and video source dict so the
+    renderers and the decode thread see the same state. Step boundaries are
+    events on the show clock's scheduler rather than per-frame polling.
+    """
+
+    def __init__(self, surfaces, video_sources, clock=None, scheduler=None):
+        self.surfaces = surfaces
+        self.video_sources = video_sources
+        self.clock = clock or SHOW_CLOCK
+        self.scheduler = scheduler or EventScheduler()
+
+        self.mode = "concurrent"  # 'concurrent' or 'sequential'
+        self.steps = []  # List of {"surface_index", "media_path", "media_type", "transition"}
+        self.continuous_surfaces = set()
+        self.current_index = 0
+        self.active = False
+
+        # Image Duration State
+        self.clip_start_time = 0
+        self.image_duration = 5.0  # Seconds
+
+        # Transition State
+        self.pending = None
+        self.transition = None
+        self.last_transition_report = None
+
+        # Keyframe index service (set by the app) used to cue in points
+        self.indexer = None
+        # Offline rendering: a cue waits for the incoming media instead of holding the outgoing frame
+        self.wait_for_media = False
+
+        # Cue State
+        self.frame_time = self.clock.now()  # Show time of the frame being rendered
+        self.cues = []  # Scheduled events of the current step
+        self.cue_fired = False
+
+    # --------- STATE --------- #
+    def reset(self):
+        self.cancel_pending()
+        self.cancel_cues()
+        self.current_index = 0
+        self.active = True
+
+        for i, surface in enumerate(self.surfaces):
+            vid = surface.get("video_id")
+            if vid and vid in self.video_sources:
+                vs = self.video_sources[vid]
+                if self.mode == "concurrent" or i in self.continuous_surfaces:
+                    vs.loop = True
+                    vs.play()
+                else:
+                    vs.loop = False
+                    vs.stop()  # Stop all initially for sequential
+
+        if self.mode == "sequential" and self.surfaces:
+            self.play_next()
+
+    def cancel_pending(self):
+        """Abort a pre-buffer or transition in progress (the outgoing step stays current)."""
+        pending = self.pending
+        if pending is not None and not pending.attached:
+            self.video_sources.pop(pending.video_id, None)
+            pending.discard()
+        self.pending = None
+        self.transition = None
+
+    def cancel_cues(self):
+        for event in self.cues:
+            event.cancel()
+        self.cues = []
+
+    def active_surface_index(self):
+        if self.steps and self.current_index < len(self.steps):
+            return self.steps[self.current_index]["surface_index"]
+        return -1
+
+    def _valid_step(self, index):
+        step = self.steps[index]
+        return 0 <= step["surface_index"] < len(self.surfaces)
+
+    def next_step_index(self):
+        """Index of the next valid step after the current one (wrapping), or None."""
+        n = len(self.steps)
+        for offset in range(1, n + 1):
+            index = (self.current_index + offset) % n
+            if self._valid_step(index):
+                return index
+        return None
+
+    # --------- MEDIA --------- #
+    def _attach(self, pending):
+        """Move pre-buffered media onto its surface, releasing what was there."""
+        surface = self.surfaces[pending.step["surface_index"]]
+        old_vid = surface.get("video_id")
+
+        if pending.source is not None:
+            self.video_sources[pending.video_id] = pending.source
+            surface["video_id"] = pending.video_id
+            surface["media_type"] = "video"
+            surface["static_frame"] = None
+        else:
+            surface["video_id"] = None
+            surface["media_type"] = "image"
+            surface["static_frame"] = pending.static_frame
+        surface["media_path"] = pending.step["media_path"]
+        pending.attached = True
+
+        if old_vid and old_vid != surface["video_id"] and old_vid in self.video_sources:
+            self.video_sources[old_vid].release()
+            del self.video_sources[old_vid]
+
+    def _needs_preload(self, index):
+        step = self.steps[index]
+        kind, _ = step_transition(step)
+        surface = self.surfaces[step["surface_index"]]
+        return kind != "cut" or not media_loaded(surface, step)
+
+    def _ensure_pending(self, index):
+        if self.pending is not None and self.pending.step_index == index:
+            return
+        self.cancel_pending()
+        self.pending = PendingMedia(index, self.steps[index], self.indexer, self.clock)
+        self.pending.start()
+
+    def play_next(self, start_time=None):
+        """Start the step at current_index, or the next valid one after it (wrapping).
+
+        `start_time` is the show time the step is due (the cue time); defaults to now.
+        """
+        start_time = self.clock.now() if start_time is None else start_time
+        with TRACE.span("play_next", "sequence", {"from_step": self.current_index}):
+            n = len(self.steps)
+            for _ in range(n):
+                if self.current_index >= n:
+                    # Sequence finished -> Loop
+                    self.current_index = 0
+                if self._start_step(self.current_index, start_time):
+                    return
+                # If invalid, skip
+                self.current_index += 1
+            self.current_index = 0
+
+    def skip(self, offset, start_time=None):
+        """Jump `offset` steps from the current one (remote next/prev), cutting any transition."""
+        n = len(self.steps)
+        if self.mode != "sequential" or not n:
+            return
+        target = (self.current_index + offset) % n
+        pending = self.pending
+        if self.transition is not None or pending is None or pending.step_index != target:
+            self.cancel_pending()  # A pre-buffer of the target step itself is used below
+        self.cancel_cues()
+        self.current_index = target
+        self.play_next(start_time)
+
+    def _start_step(self, index, start_time):
+        step = self.steps[index]
+        idx = step["surface_index"]
+        if not (0 <= idx < len(self.surfaces)):
+            return False
+        surface = self.surfaces[idx]
+
+        cued = False  # Freshly opened media is already at the in point
+        pending = self.pending
+        if pending is not None and pending.step_index == index:
+            # Use the pre-buffered media (waits only if it is still opening)
+            pending.ready.wait()
+            self.pending = None
+            if pending.error is None:
+                self._attach(pending)
+                cued = True
+            else:
+                print(f"Sequence step {index + 1} failed to load: {pending.error}")
+        elif not media_loaded(surface, step):
+            pending = PendingMedia(index, step, self.indexer, self.clock)
+            pending.load()
+            if pending.error is None:
+                self._attach(pending)
+                cued = True
+
+        if surface.get("media_path") != step["media_path"]:
+            return False
+
+        # Play
+        vid = surface.get("video_id")
+        if vid and vid in self.video_sources:
+            vs = self.video_sources[vid]
+            vs.loop = False
+            in_point, _ = step_in_out(step)
+            if not cued and in_point > 0:
+                vs.seek(in_point, self.indexer.get(vs.filepath) if self.indexer else None)
+            elif not cued and vs.frame_index > 1:
+                vs.stop()  # Replaying a clip: rewind
+            vs.play(start_time=start_time)
+            self._arm_step(start_time)
+            return True  # Started
+
+        # If it's an image, we also "start" it by setting time
+        if surface["media_type"] == "image":
+            self._arm_step(start_time)
+            return True
+        return False
+
+    # --------- CUES --------- #
+    def _step_end_time(self):
+        """Show time at which the current step ends, or None if unknown."""
+        step = self.steps[self.current_index]
+        surface = self.surfaces[step["surface_index"]]
+        vid = surface.get("video_id")
+        if vid and vid in self.video_sources:
+            if getattr(self.video_sources[vid], "endless", False):
+                return self.clip_start_time + self.image_duration  # Live input or shader: held like a still
+            end = self.video_sources[vid].end_time()
+            in_point, out_point = step_in_out(step)
+            if out_point is not None:
+                out_end = self.clip_start_time + (out_point - in_point)
+                end = out_end if end is None else min(end, out_end)
+            return end
+        if surface["media_type"] == "image":
+            return self.clip_start_time + self.image_duration
+        return None
+
+    def _arm_step(self, start_time):
+        """Schedule the pre-roll and end-of-step cues for the step that just started."""
+        self.cancel_cues()
+        self.cue_fired = False
+        self.clip_start_time = start_time
+
+        next_index = self.next_step_index()
+        end = self._step_end_time()
+        if next_index is None or end is None:
+            return  # Unknown length: update() falls back to the finished flag
+        _, duration = step_transition(self.steps[next_index])
+        self.cues = [
+            self.scheduler.schedule(end - duration - PREROLL_SECONDS, self._on_preroll),
+            self.scheduler.schedule(end - duration, self._on_cue),
+        ]
+
+    def _on_preroll(self, due):
+        # Pre-buffer the next step so the overlap does not stall on file opening
+        next_index = self.next_step_index()
+        if self.mode == "sequential" and next_index is not None and self._needs_preload(next_index):
+            TRACE.instant("preroll", "sequence", {"step": next_index})
+            self._ensure_pending(next_index)
+
+    def _on_cue(self, due, start=None):
+        """End of the current step (minus the incoming transition): cut or start the overlap.
+
+        `start` is when the overlap actually begins if the incoming media was late.
+        """
+        if self.mode != "sequential" or self.transition is not None:
+            return
+        self.cue_fired = True
+        next_index = self.next_step_index()
+        if next_index is None:
+            return
+        kind, duration = step_transition(self.steps[next_index])
+        TRACE.instant("cue", "sequence", {"step": next_index, "transition": kind, "late_ms": (self.frame_time - due) * 1000.0})
+
+        if kind == "cut":
+            if not self.wait_for_media and self._needs_preload(next_index):
+                self._ensure_pending(next_index)
+                if not self.pending.ready.is_set():
+                    # Hold the outgoing frame rather than block the render thread on the open; retry next frame
+                    self.cues.append(self.scheduler.schedule(self.frame_time, self._retry_cue, due))
+                    return
+            self.current_index = next_index
+            self.play_next(start_time=due if start is None else start)
+            return
+
+        self._ensure_pending(next_index)
+        pending = self.pending
+        if self.wait_for_media:
+            pending.ready.wait()
+        if not pending.ready.is_set():
+            # Outgoing holds its last frame until the incoming media is decoded; retry next frame
+            self.cues.append(self.scheduler.schedule(self.frame_time, self._retry_cue, due))
+            return
+        if pending.error is not None:
+            print(f"Sequence step {next_index + 1} failed to load: {pending.error}")
+            self.pending = None
+            self.current_index = next_index
+            self.play_next(start_time=due)
+            return
+
+        start = due if start is None else start
+        self._start_transition(kind, duration, start, start_delay=start - due)
+
+    def _retry_cue(self, scheduled, due):
+        self._on_cue(due, start=self.frame_time)
+
+    def _start_transition(self, kind, duration, start, start_delay=0.0):
+        pending = self.pending
+        from_surface = self.active_surface_index()
+        if pending.source is not None:
+            # Register so the decode thread advances it during the overlap
+            pending.source.loop = False
+            pending.source.play(start_time=start)
+            self.video_sources[pending.video_id] = pending.source
+        if pending.step["surface_index"] != from_surface:
+            self._attach(pending)
+        self.transition = Transition(kind, duration, from_surface, pending, start, start_delay)
+        TRACE.instant("transition start", "sequence", {"type": kind, "duration": duration, "step": pending.step_index})
+        self.cancel_cues()
+        self.cues = [self.scheduler.schedule(start + duration, self._finish_transition)]
+
+    def _finish_transition(self, due):
+        tr = self.transition
+        if tr is None:
+            return
+        pending = tr.pending
+        if tr.from_surface == tr.to_surface:
+            self._attach(pending)
+        self.current_index = pending.step_index
+        self.pending = None
+        self.transition = None
+        self.last_transition_report = tr.report()
+        TRACE.instant("transition end", "sequence", self.last_transition_report)
+        # The incoming step has been playing since the transition started
+        self._arm_step(tr.started)
+
+    def seek_current(self, seconds, now=None):
+        """Jump the current step's video to `seconds` after its in point and re-arm its cues."""
+        if self.mode != "sequential" or self.transition is not None:
+            return False
+        if not (self.current_index < len(self.steps) and self._valid_step(self.current_index)):
+            return False
+        step = self.steps[self.current_index]
+        vid = self.surfaces[step["surface_index"]].get("video_id")
+        if not (vid and vid in self.video_sources):
+            return False
+        now = self.clock.now() if now is None else now
+        vs = self.video_sources[vid]
+        in_point, _ = step_in_out(step)
+        vs.seek(in_point + seconds, self.indexer.get(vs.filepath) if self.indexer else None, start_time=now)
+        vs.play(start_time=now)
+        self.cancel_pending()
+        self._arm_step(now - seconds)
+        return True
+
+    def update(self, now=None):
+        """Per-frame hook: record the frame time and catch clips that end before their cue."""
+        self.frame_time = self.clock.now() if now is None else now
+        if self.mode != "sequential" or not self.steps or self.transition is not None or self.cue_fired:
+            return
+        if not (self.current_index < len(self.steps) and self._valid_step(self.current_index)):
+            return
+        # Clips of unknown (or overstated) length: react to the finished flag
+        surface = self.surfaces[self.steps[self.current_index]["surface_index"]]
+        vid = surface.get("video_id")
+        if vid and vid in self.video_sources and self.video_sources[vid].is_finished():
+            self.cancel_cues()
+            self._on_cue(self.frame_time)
+
+    def record_decode_load(self, active_decoders, busy, period):
+        """Called by the decode thread after each pass over the sources."""
+        tr = self.transition
+        if tr is not None:
+            tr.record_decode(active_decoders, busy, period)
+
+    # --------- FRAME ACCESS --------- #
+    def layers(self, surface, idx, frame):
+        """(frame_a, frame_b, mix, mode) for a surface whose own media frame is `frame`."""
+        if self.mode != "sequential" or idx is None or idx in self.continuous_surfaces:
+            return frame, None, 0.0, "cut"
+
+        tr = self.transition
+        if tr is not None:
+            mix_amount = tr.progress(self.frame_time)
+            if idx == tr.from_surface and idx == tr.to_surface:
+                return frame, tr.pending.frame(), mix_amount, tr.kind
+            if idx == tr.from_surface:
+                return frame, None, mix_amount, tr.kind
+            if idx == tr.to_surface:
+                return None, frame, mix_amount, tr.kind
+
+        # Strict check: If this surface is not the active one, hide it.
+        if idx != self.active_surface_index():
+            return None, None, 0.0, "cut"
+        return frame, None, 0.0, "cut"
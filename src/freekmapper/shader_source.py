@@ -0,0 +1,227 @@
+"""Generative shader sources: a GLSL fragment shader drawn on the GPU instead of decoded video.
+
+    waves.frag                    media path of a shader file (.frag or .glsl)
+    waves.frag#speed=2&hue=0.3    with values for its float uniforms
+
+The file is a GLSL 1.20 fragment shader (like the surface shader) that gets
+
+    uniform float time;       seconds since the source started playing
+    uniform vec2 resolution;  size of the texture drawn into, in pixels
+    varying vec2 uv;          0..1 across the surface, (0, 0) at its first (top-left) point
+
+plus any `uniform float NAME;` set from the path or live (set_param, or the
+/surface/param remote command). Shadertoy-style code with mainImage() and
+iTime / iResolution works too (with y up, as there). The source produces
+no pixels: each frame is a ShaderFrame (code + uniforms) that the renderer
+draws into the surface's texture at canvas resolution. The file is re-read
+when it changes, so a shader can be edited while the show runs.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+
+from .media_probe import parse_media_options
+from .show_clock import SHOW_CLOCK
+
+SHADER_FPS = 60.0  # Rate at which new frames (new `time` values) are produced
+RELOAD_CHECK_SECONDS = 0.25  # How often the file's mtime is checked for hot reload
+
+SHADERTOY_PRELUDE = """#version 120
+uniform float time;
+uniform vec2 resolution;
+#define iTime time
+#define iResolution vec3(resolution, 1.0)
+"""
+SHADERTOY_MAIN = """
+void main() {
+    // Shadertoy's y runs up; texture row 0 is the top of the surface
+    mainImage(gl_FragColor, vec2(gl_FragCoord.x, resolution.y - gl_FragCoord.y));
+}
+"""
+
+
+def build_shader(text):
+    """Fragment shader to compile: the file as is, or its Shadertoy-style mainImage() wrapped."""
+    if "mainImage" in text and not re.search(r"\bvoid\s+main\s*\(", text):
+        return SHADERTOY_PRELUDE + text + SHADERTOY_MAIN
+    return text
+
+
+class ShaderFrame:
+    """One frame of a shader source: what the renderer runs to draw it."""
+
+    __slots__ = ("code", "digest", "time", "params")
+
+    def __init__(self, code, digest, time, params):
+        self.code = code
+        self.digest = digest  # Hash of the code: key of the compiled program
+        self.time = time
+        self.params = params  # Uniform name -> float
+
+
+class ShaderSource:
+    """Shader file played like a video (same interface as VideoSource; never ends)."""
+
+    live = False
+    endless = True  # No end: a sequence step holds it for the image duration
+
+    def __init__(self, path, max_size=1280, loop=True, playing=True, clock=None, meta=None, params=None):
+        self.filepath = path
+        self.shader_path, options = parse_media_options(path)
+        self.params = dict(options, **(params or {}))
+        self.current_frame = None
+        self.playing = playing
+        self.loop = loop
+        self.finished = False
+        self.lock = threading.Lock()
+        self.max_size = max_size
+
+        self.clock = clock or SHOW_CLOCK
+        self.fps = SHADER_FPS
+        self.frame_count = 0
+        self.width = self.height = 0  # Drawn at the renderer's canvas size
+        self.frame_index = 0
+        self.start_time = self.clock.now()
+        self.elapsed = 0.0  # Shader time of the current frame
+        self.dropped_frames = 0
+        self.timeline = None
+        self.suspended = False
+
+        self.code = None
+        self.digest = None
+        self.mtime = None
+        self.missing = False  # File unreadable (reported once)
+        self.next_check = 0.0
+        self.dirty = False  # Code or parameters changed: redraw even when paused
+        self._load()
+
+    def _load(self):
+        """Re-read the file if it changed since the last load."""
+        try:
+            mtime = os.stat(self.shader_path).st_mtime_ns
+            if mtime == self.mtime:
+                return
+            with open(self.shader_path) as f:
+                text = f.read()
+        except OSError as e:
+            if not self.missing:
+                print(f"Could not read shader {self.shader_path}: {e}")
+            self.missing = True
+            self.mtime = None
+            return
+        self.missing = False
+        self.mtime = mtime
+        code = build_shader(text)
+        digest = hashlib.sha1(code.encode("utf-8")).hexdigest()
+        if digest == self.digest:
+            return
+        if self.digest is not None:
+            print(f"Reloaded shader {self.shader_path}")
+        self.code, self.digest = code, digest
+        self.dirty = True
+
+    def _show(self, elapsed):
+        self.elapsed = elapsed
+        self.current_frame = ShaderFrame(self.code, self.digest, elapsed, dict(self.params))
+        self.dirty = False
+
+    def read_frame(self, now=None):
+        """New frame with the shader time at `now` (and the file reloaded if it changed)."""
+        with self.lock:
+            wall = time.monotonic()
+            if wall >= self.next_check:
+                self.next_check = wall + RELOAD_CHECK_SECONDS
+                self._load()
+            if self.code is None or self.suspended:
+                return self.current_frame
+            if not self.playing:
+                if self.dirty:
+                    self._show(self.elapsed)  # Edits show while paused
+                return self.current_frame
+            now = self.clock.now() if now is None else now
+            target = int((now - self.start_time) * self.fps) + 1
+            if target > self.frame_index or self.dirty:
+                self.frame_index = max(target, self.frame_index)
+                self._show(now - self.start_time)
+            return self.current_frame
+
+    def set_param(self, name, value):
+        """Set a float uniform; shown from the next frame on."""
+        with self.lock:
+            self.params[name] = float(value)
+            self.dirty = True
+
+    def seek(self, seconds, index=None, start_time=None):
+        with self.lock:
+            self._resume()
+            now = self.clock.now() if start_time is None else start_time
+            self.start_time = now - seconds
+            self.frame_index = int(seconds * self.fps) + 1
+            if self.code is not None:
+                self._show(seconds)
+            return self.current_frame
+
+    def next_due(self):
+        if not self.playing:
+            return None
+        return self.start_time + self.frame_index / self.fps
+
+    def prime(self):
+        """First frame without starting playback (there is nothing to decode)."""
+        with self.lock:
+            self._resume()
+            if self.current_frame is None and self.code is not None:
+                self._show(self.elapsed)
+            return self.current_frame
+
+    def end_time(self):
+        return None
+
+    def remaining_time(self, now=None):
+        return None
+
+    def get_current_frame(self):
+        with self.lock:
+            return self.current_frame
+
+    def play(self, start_time=None):
+        with self.lock:
+            self._resume()
+            now = self.clock.now() if start_time is None else start_time
+            if not self.playing or start_time is not None:
+                # Resume from the displayed time
+                self.start_time = now - self.elapsed
+                self.frame_index = int(self.elapsed * self.fps) + 1
+            self.playing = True
+
+    def pause(self):
+        with self.lock:
+            self.playing = False
+
+    def stop(self):
+        with self.lock:
+            self.playing = False
+            self.elapsed = 0.0
+            self.frame_index = 0
+
+    def is_finished(self):
+        return False
+
+    def suspend(self):
+        with self.lock:
+            self.current_frame = None
+            self.playing = False
+            self.suspended = True
+
+    def _resume(self):
+        self.suspended = False
+
+    def memory_usage(self):
+        # The texture lives on the GPU (renderer's TextureManager); no decoder, no frames
+        return {"decoder": 0, "frames": 0, "open": False}
+
+    def release(self):
+        with self.lock:
+            self.current_frame = None
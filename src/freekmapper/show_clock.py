@@ -0,0 +1,100 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class ShowClock:
+    """Single monotonic time base for the show, in seconds since start.
+
+    Sources, sequence cues and control-panel loops all read this clock so
+    they stay aligned regardless of Tk timer jitter.
+    """
+
+    def __init__(self):
+        self.origin = time.monotonic()
+
+    def now(self):
+        return time.monotonic() - self.origin
+
+
+class ManualClock(ShowClock):
+    """Clock that only moves when told to (benchmarks, offline rendering)."""
+
+    def __init__(self, start=0.0):
+        self.time = start
+
+    def now(self):
+        return self.time
+
+    def advance(self, seconds):
+        self.time += seconds
+        return self.time
+
+
+# Shared default clock (sources created without an explicit clock use this one)
+SHOW_CLOCK = ShowClock()
+
+
+class ScheduledEvent:
+    __slots__ = ("due", "seq", "callback", "args", "cancelled")
+
+    def __init__(self, due, seq, callback, args):
+        self.due = due
+        self.seq = seq
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def __lt__(self, other):
+        return (self.due, self.seq) < (other.due, other.seq)
+
+
+class EventScheduler:
+    """Heap of timed callbacks, drained once per rendered frame.
+
+    Callbacks are called as callback(due, *args) with the exact time they were
+    scheduled for, so follow-up events can be anchored to it without drift.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def schedule(self, due, callback, *args):
+        event = ScheduledEvent(due, next(self._seq), callback, args)
+        with self._lock:
+            heapq.heappush(self._heap, event)
+        return event
+
+    def next_due(self):
+        with self._lock:
+            while self._heap and self._heap[0].cancelled:
+                heapq.heappop(self._heap)
+            return self._heap[0].due if self._heap else None
+
+    def run_due(self, now):
+        """Fire every event due at or before `now`, in time order. Returns how many fired."""
+        # Take the due batch first; events scheduled by callbacks run on the next pass
+        with self._lock:
+            batch = []
+            while self._heap and self._heap[0].due <= now:
+                batch.append(heapq.heappop(self._heap))
+        fired = 0
+        for event in batch:
+            if event.cancelled:
+                continue
+            try:
+                event.callback(event.due, *event.args)
+            except Exception as e:
+                print(f"Scheduled event {getattr(event.callback, '__name__', event.callback)} failed: {e}")
+            fired += 1
+        return fired
+
+    def clear(self):
+        with self._lock:
+            self._heap.clear()
@@ -0,0 +1,407 @@
+"""Versioned show file (.fmshow): JSON structure plus an optional binary geometry sidecar.
+
+Replaces the pickled .npy configs. Layout:
+
+    {
+      "format": "freekmapper-show",
+      "version": 1,
+      "geometry": "show.fmgeom" | null,   # raw float32 x/y pairs
+      "surfaces": [{"name", "opacity", "media_path", "sync_group",
+                    "points": [[x, y], ...] (4 for a quad)  or  "geometry": [offset, count],
+                    "mask": {"polygons": [[[u, v], ...]], "feather", "invert"}  (optional),
+                    "grid": [cols, rows]  (optional; (cols + 1) * (rows + 1) points, row-major),
+                    "effects": {"brightness", "contrast", ..., "key_color": [r, g, b]}  (optional; see effects.py)}],
+      "playback_mode": "concurrent" | "sequential",
+      "sequence_steps": [...],
+      "continuous_surfaces": [int, ...],
+      "media": {path: probed metadata}
+    }
+
+Quads are stored inline; surfaces with more than INLINE_POINTS points (grid meshes)
+go to the sidecar, which is memory-mapped on load so geometry is only paged
+in when a surface is built.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from .effects import EFFECT_RANGES
+from .media_probe import MEDIA_PROBE, media_type_for_path, probe_media
+from .sequencer import TRANSITION_TYPES
+
+SHOW_FORMAT = "freekmapper-show"
+SHOW_VERSION = 1
+SHOW_EXTENSION = ".fmshow"
+GEOMETRY_EXTENSION = ".fmgeom"
+INLINE_POINTS = 16
+PLAYBACK_MODES = ("concurrent", "sequential")
+
+
+class ShowFormatError(ValueError):
+    """The file is not a valid show file (message names the offending field)."""
+
+
+# --------- VALIDATION --------- #
+def _expect(cond, where, message):
+    if not cond:
+        raise ShowFormatError(f"{where}: {message}")
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _optional_str(value, where):
+    _expect(value is None or isinstance(value, str), where, "expected a string or null")
+
+
+def _optional_number(value, where):
+    _expect(value is None or _is_number(value), where, "expected a number or null")
+
+
+def validate_show(data):
+    """Check the structure of a parsed show file; raises ShowFormatError on the first problem."""
+    _expect(isinstance(data, dict), "show", "expected an object")
+    _expect(data.get("format") == SHOW_FORMAT, "format", f"expected '{SHOW_FORMAT}'")
+    version = data.get("version")
+    _expect(isinstance(version, int), "version", "expected an integer")
+    _expect(version <= SHOW_VERSION, "version", f"file version {version} is newer than supported ({SHOW_VERSION})")
+    _optional_str(data.get("geometry"), "geometry")
+
+    surfaces = data.get("surfaces")
+    _expect(isinstance(surfaces, list), "surfaces", "expected a list")
+    for i, s in enumerate(surfaces):
+        where = f"surfaces[{i}]"
+        _expect(isinstance(s, dict), where, "expected an object")
+        _expect(isinstance(s.get("name"), str), f"{where}.name", "expected a string")
+        _expect(_is_number(s.get("opacity")), f"{where}.opacity", "expected a number")
+        _optional_str(s.get("media_path"), f"{where}.media_path")
+        _optional_str(s.get("sync_group"), f"{where}.sync_group")
+        mask = s.get("mask")
+        if mask is not None:
+            _expect(isinstance(mask, dict), f"{where}.mask", "expected an object")
+            polygons = mask.get("polygons", [])
+            _expect(
+                isinstance(polygons, list) and all(
+                    isinstance(poly, list) and len(poly) >= 3
+                    and all(isinstance(p, list) and len(p) == 2 and all(_is_number(v) for v in p) for p in poly)
+                    for poly in polygons
+                ),
+                f"{where}.mask.polygons", "expected a list of polygons of at least 3 [u, v] points",
+            )
+            _optional_number(mask.get("feather"), f"{where}.mask.feather")
+        effects = s.get("effects")
+        if effects is not None:
+            _expect(isinstance(effects, dict), f"{where}.effects", "expected an object")
+            for name, value in effects.items():
+                if name == "key_color":
+                    _expect(isinstance(value, list) and len(value) == 3 and all(_is_number(v) for v in value),
+                            f"{where}.effects.key_color", "expected [r, g, b]")
+                else:
+                    _expect(name in EFFECT_RANGES, f"{where}.effects.{name}", "unknown effect")
+                    _expect(_is_number(value), f"{where}.effects.{name}", "expected a number")
+        if "geometry" in s:
+            geom = s["geometry"]
+            _expect(
+                isinstance(geom, list) and len(geom) == 2 and all(isinstance(v, int) and v >= 0 for v in geom),
+                f"{where}.geometry", "expected [offset, count]",
+            )
+            _expect(data.get("geometry"), f"{where}.geometry", "no geometry sidecar declared")
+        else:
+            points = s.get("points")
+            _expect(isinstance(points, list) and len(points) >= 4, f"{where}.points", "expected at least 4 points")
+            for j, p in enumerate(points):
+                _expect(
+                    isinstance(p, list) and len(p) == 2 and all(_is_number(v) for v in p),
+                    f"{where}.points[{j}]", "expected [x, y]",
+                )
+        grid = s.get("grid")
+        if grid is not None:
+            _expect(
+                isinstance(grid, list) and len(grid) == 2 and all(isinstance(v, int) and v >= 1 for v in grid),
+                f"{where}.grid", "expected [cols, rows] of positive integers",
+            )
+        count = s["geometry"][1] if "geometry" in s else len(s["points"])
+        if grid is not None:
+            expected = (grid[0] + 1) * (grid[1] + 1)
+            _expect(count == expected, f"{where}.grid", f"expected {expected} points, got {count}")
+        else:
+            _expect(count == 4, f"{where}.points", f"expected 4 points for a quad, got {count}")
+
+    _expect(data.get("playback_mode", "concurrent") in PLAYBACK_MODES, "playback_mode",
+            f"expected one of {', '.join(PLAYBACK_MODES)}")
+
+    steps = data.get("sequence_steps", [])
+    _expect(isinstance(steps, list), "sequence_steps", "expected a list")
+    for i, step in enumerate(steps):
+        where = f"sequence_steps[{i}]"
+        _expect(isinstance(step, dict), where, "expected an object")
+        _expect(isinstance(step.get("surface_index"), int), f"{where}.surface_index", "expected an integer")
+        _expect(isinstance(step.get("media_path"), str), f"{where}.media_path", "expected a string")
+        _expect(step.get("media_type") in ("video", "image"), f"{where}.media_type", "expected 'video' or 'image'")
+        _optional_number(step.get("in_point"), f"{where}.in_point")
+        _optional_number(step.get("out_point"), f"{where}.out_point")
+        transition = step.get("transition")
+        if transition is not None:
+            _expect(isinstance(transition, dict), f"{where}.transition", "expected an object")
+            _expect(transition.get("type", "cut") in TRANSITION_TYPES, f"{where}.transition.type",
+                    f"expected one of {', '.join(TRANSITION_TYPES)}")
+            _expect(_is_number(transition.get("duration", 0.0)), f"{where}.transition.duration", "expected a number")
+
+    continuous = data.get("continuous_surfaces", [])
+    _expect(isinstance(continuous, list) and all(isinstance(v, int) for v in continuous),
+            "continuous_surfaces", "expected a list of integers")
+    _expect(isinstance(data.get("media", {}), dict), "media", "expected an object")
+
+
+# --------- SAVE --------- #
+def _plain(value):
+    """Convert numpy scalars/arrays (legacy configs) into JSON types."""
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [_plain(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _atomic_write(path, data, mode="w"):
+    tmp = path + ".tmp"
+    with open(tmp, mode) as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def probe_show_media(config):
+    """Probed metadata for every media file the config references (missing files are skipped)."""
+    paths = {s.get("media_path") for s in config["surfaces"]}
+    paths.update(step.get("media_path") for step in config.get("sequence_steps", []))
+    media = {}
+    for path in sorted(p for p in paths if p):
+        meta = MEDIA_PROBE.get(path)
+        if meta is None or "error" in meta:
+            try:
+                meta = probe_media(path)
+            except OSError as e:
+                print(f"Could not probe {path}: {e}")
+                continue
+        media[path] = {k: v for k, v in meta.items() if k != "thumbnail"}
+    return media
+
+
+def save_show(path, config, media=None):
+    """Write `config` (the in-memory config dict) as a show file at `path`.
+
+    `media` is the probed metadata to record; it is probed here when not given.
+    """
+    geometry_name = os.path.splitext(os.path.basename(path))[0] + GEOMETRY_EXTENSION
+    geometry_path = os.path.join(os.path.dirname(path), geometry_name)
+
+    surfaces = []
+    sidecar = []
+    offset = 0
+    for s in config["surfaces"]:
+        points = np.asarray(s["points"], dtype=np.float32).reshape(-1, 2)
+        entry = {
+            "name": s["name"],
+            "opacity": float(s["opacity"]),
+            "media_path": s.get("media_path"),
+            "sync_group": s.get("sync_group"),
+        }
+        if s.get("mask"):
+            entry["mask"] = _plain(s["mask"])
+        if s.get("grid"):
+            entry["grid"] = [int(v) for v in s["grid"]]
+        if s.get("effects"):
+            entry["effects"] = _plain(s["effects"])
+        if len(points) > INLINE_POINTS:
+            entry["geometry"] = [offset, len(points)]
+            sidecar.append(points)
+            offset += len(points)
+        else:
+            entry["points"] = points.tolist()
+        surfaces.append(entry)
+
+    data = {
+        "format": SHOW_FORMAT,
+        "version": SHOW_VERSION,
+        "geometry": geometry_name if sidecar else None,
+        "surfaces": surfaces,
+        "playback_mode": config.get("playback_mode", "concurrent"),
+        "sequence_steps": _plain(config.get("sequence_steps", [])),
+        "continuous_surfaces": sorted(_plain(config.get("continuous_surfaces", []))),
+        "media": _plain(media if media is not None else probe_show_media(config)),
+    }
+    validate_show(data)
+
+    if sidecar:
+        _atomic_write(geometry_path, np.concatenate(sidecar).astype("<f4").tobytes(), "wb")
+    elif os.path.exists(geometry_path):
+        os.remove(geometry_path)
+    _atomic_write(path, json.dumps(data, separators=(",", ":")))
+
+
+# --------- LOAD --------- #
+def load_show(path):
+    """Read and validate a show file; returns a config dict (points as float32 arrays).
+
+    Sidecar geometry is memory-mapped, so only surfaces that are actually
+    built read their points from disk.
+    """
+    with open(path, "rb") as f:
+        try:
+            data = json.loads(f.read())
+        except ValueError as e:
+            raise ShowFormatError(f"show: not valid JSON ({e})")
+    validate_show(data)
+
+    geometry = None
+    if data.get("geometry"):
+        geometry_path = os.path.join(os.path.dirname(path), data["geometry"])
+        if not os.path.exists(geometry_path):
+            raise ShowFormatError(f"geometry: sidecar {data['geometry']} not found")
+        geometry = np.memmap(geometry_path, dtype="<f4", mode="r").reshape(-1, 2)
+
+    for i, s in enumerate(data["surfaces"]):
+        if "geometry" in s:
+            offset, count = s.pop("geometry")
+            if geometry is None or offset + count > len(geometry):
+                raise ShowFormatError(f"surfaces[{i}].geometry: out of range of the sidecar")
+            s["points"] = geometry[offset:offset + count]
+        else:
+            s["points"] = np.array(s["points"], dtype=np.float32)
+
+    data.setdefault("playback_mode", "concurrent")
+    data.setdefault("sequence_steps", [])
+    data.setdefault("continuous_surfaces", [])
+    data.setdefault("media", {})
+    return data
+
+
+def migrate_config(config):
+    """Turn a legacy .npy config dict into the show layout (without media metadata)."""
+    if not isinstance(config, dict) or "surfaces" not in config:
+        raise ShowFormatError("surfaces: not a FreekMapper configuration")
+    surfaces = [
+        {
+            "points": np.asarray(s["points"], dtype=np.float32),
+            "opacity": float(s["opacity"]),
+            "name": str(s["name"]),
+            "media_path": s.get("media_path"),
+            "sync_group": s.get("sync_group"),
+            "mask": s.get("mask"),
+            "grid": s.get("grid"),
+            "effects": s.get("effects"),
+        }
+        for s in config["surfaces"]
+    ]
+
+    if "sequence_steps" in config:
+        steps = _plain(config["sequence_steps"])
+    else:
+        # Oldest format: an ordered list of surface indices playing their own media
+        steps = []
+        for idx in _plain(config.get("sequence_order", [])):
+            if 0 <= idx < len(surfaces):
+                path = surfaces[idx]["media_path"]
+                media_type = media_type_for_path(path) if path else None
+                if media_type:
+                    steps.append({"surface_index": idx, "media_path": path, "media_type": media_type})
+
+    return {
+        "surfaces": surfaces,
+        "playback_mode": config.get("playback_mode", "concurrent"),
+        "sequence_steps": steps,
+        "continuous_surfaces": sorted(_plain(config.get("continuous_surfaces", []))),
+        "media": {},
+    }
+
+
+def load_legacy_config(path):
+    # Pickled configs can run code on load: only used for the user's own files / migration
+    return migrate_config(np.load(path, allow_pickle=True).item())
+
+
+def load_config(path):
+    """Load a show file, or a legacy .npy config migrated in memory."""
+    if path.lower().endswith(".npy"):
+        return load_legacy_config(path)
+    return load_show(path)
+
+
+def migrate_file(src, dst=None):
+    """Convert a legacy .npy config to a show file next to it; returns the new path."""
+    dst = dst or os.path.splitext(src)[0] + SHOW_EXTENSION
+    save_show(dst, load_legacy_config(src))
+    return dst
+
+
+# --------- CLI --------- #
+def _time_loads(load, path, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        load(path)
+        times.append((time.perf_counter() - start) * 1000.0)
+    times.sort()
+    return times[len(times) // 2], times[-1]
+
+
+def benchmark(npy_path, runs=50):
+    """Median/max load time of a legacy config vs the same config as a show file."""
+    with tempfile.TemporaryDirectory() as tmp:
+        show_path = os.path.join(tmp, "bench" + SHOW_EXTENSION)
+        save_show(show_path, load_legacy_config(npy_path), media={})
+        return {
+            "npy_ms": _time_loads(lambda p: np.load(p, allow_pickle=True).item(), npy_path, runs),
+            "show_ms": _time_loads(load_show, show_path, runs),
+            "npy_bytes": os.path.getsize(npy_path),
+            "show_bytes": os.path.getsize(show_path),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m freekmapper.show_file", description="Show file tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="convert .npy configs to .fmshow")
+    migrate.add_argument("files", nargs="+")
+    bench = sub.add_parser("bench", help="compare load time of a .npy config and its .fmshow form")
+    bench.add_argument("file")
+    bench.add_argument("--runs", type=int, default=50)
+    check = sub.add_parser("check", help="validate show files")
+    check.add_argument("files", nargs="+")
+    args = parser.parse_args(argv)
+
+    status = 0
+    if args.command == "migrate":
+        for src in args.files:
+            try:
+                print(f"{src} -> {migrate_file(src)}")
+            except Exception as e:
+                print(f"{src}: {e}")
+                status = 1
+    elif args.command == "bench":
+        result = benchmark(args.file, args.runs)
+        print(f"npy:    median {result['npy_ms'][0]:.3f} ms, max {result['npy_ms'][1]:.3f} ms, {result['npy_bytes']} bytes")
+        print(f"fmshow: median {result['show_ms'][0]:.3f} ms, max {result['show_ms'][1]:.3f} ms, {result['show_bytes']} bytes")
+    elif args.command == "check":
+        for path in args.files:
+            try:
+                load_show(path)
+                print(f"{path}: ok")
+            except (OSError, ShowFormatError) as e:
+                print(f"{path}: {e}")
+                status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
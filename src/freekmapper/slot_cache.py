@@ -0,0 +1,241 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from .image_cache import IMAGE_CACHE
+from .latency import LatencyStats
+from .media_probe import media_available, media_type_for_path
+from .show_file import load_config
+from .video_source import open_source
+
+# Trigger -> first presented frame of the new config
+SWITCH_STATS = LatencyStats()
+
+
+def open_media(path, clock=None):
+    """Open media for a surface: ("video", primed VideoSource) / ("image", frame) / (None, None)."""
+    if not (path and media_available(path)):
+        return None, None
+    media_type = media_type_for_path(path)
+    if media_type == "video":
+        vs = open_source(path, loop=True, playing=False, clock=clock)
+        vs.prime()
+        return "video", vs
+    if media_type == "image":
+        frame = IMAGE_CACHE.get(path)
+        if frame is not None:
+            return "image", frame
+    return None, None
+
+
+class PreparedConfig:
+    """A config parsed ahead of time, with its media opened and first frames decoded."""
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        self.config = None
+        self.error = None
+        self.media = {}  # media_path -> list of (media_type, VideoSource | frame)
+        self.parsed = threading.Event()
+        self.warmed = threading.Event()
+        self.lock = threading.Lock()
+        self.cancelled = False
+
+    def start(self):
+        threading.Thread(target=self.prepare, daemon=True).start()
+
+    def prepare(self):
+        try:
+            self.config = load_config(self.path)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.parsed.set()
+        if self.error is None:
+            self.warm()
+        self.warmed.set()
+
+    def warm(self):
+        for s_data in self.config["surfaces"]:
+            if self.cancelled:
+                return
+            path = s_data.get("media_path")
+            media_type, media = open_media(path)
+            if media is None:
+                continue
+            with self.lock:
+                if self.cancelled:
+                    if media_type == "video":
+                        media.release()
+                    return
+                self.media.setdefault(path, []).append((media_type, media))
+
+    def is_current(self):
+        try:
+            return os.path.getmtime(self.path) == self.mtime
+        except OSError:
+            return False
+
+    def take_media(self, path):
+        """Hand over one pre-warmed media item for `path` (None if not warmed yet)."""
+        with self.lock:
+            items = self.media.get(path)
+            if items:
+                return items.pop(0)
+        return None, None
+
+    def media_items(self):
+        """Snapshot of the pre-warmed media: list of (path, media_type, VideoSource | frame)."""
+        with self.lock:
+            return [(path, media_type, media) for path, items in self.media.items() for media_type, media in items]
+
+    def drop_media(self, path, media):
+        """Forget one pre-warmed still (memory manager eviction); taking `path` then loads it again."""
+        with self.lock:
+            items = self.media.get(path, [])
+            self.media[path] = [item for item in items if item[1] is not media]
+
+    def discard(self):
+        """Release any pre-warmed sources nobody took."""
+        with self.lock:
+            self.cancelled = True
+            for items in self.media.values():
+                for media_type, media in items:
+                    if media_type == "video":
+                        media.release()
+            self.media.clear()
+
+
+class SlotBank:
+    """Prepared configs for the Live Control Panel slots, keyed by file path.
+
+    The config on stage is not kept warm (a repeat GO reuses its live
+    sources); it is warmed again once another config has taken over.
+    """
+
+    def __init__(self):
+        self.prepared = {}  # path -> PreparedConfig
+        self.assigned = set()  # Paths of the panel's slots
+        self.current = None  # Path of the config on stage
+        self.lock = threading.Lock()
+
+    def prepare(self, path):
+        """Parse and pre-warm a config in the background (no-op if already current or on stage)."""
+        with self.lock:
+            self.assigned.add(path)
+            existing = self.prepared.get(path)
+            if path == self.current or (existing is not None and existing.is_current()):
+                return
+            prepared = PreparedConfig(path)
+            self.prepared[path] = prepared
+        if existing is not None:
+            existing.discard()
+        prepared.start()
+
+    def take(self, path):
+        """Claim the prepared config for `path` (None if there is none) as the config going on stage.
+
+        The config it replaces is warmed again if a slot still holds it.
+        """
+        with self.lock:
+            prepared = self.prepared.pop(path, None)
+            previous, self.current = self.current, path
+            rewarm = previous is not None and previous != path and previous in self.assigned
+        if rewarm:
+            self.prepare(previous)
+        if prepared is None:
+            return None
+        if not prepared.is_current():
+            prepared.discard()
+            return None
+        prepared.parsed.wait()
+        return prepared
+
+    def configs(self):
+        """Prepared configs currently held (for memory accounting)."""
+        with self.lock:
+            return list(self.prepared.values())
+
+    def forget(self, path):
+        """Drop a path no slot holds any more, releasing its pre-warmed sources."""
+        with self.lock:
+            self.assigned.discard(path)
+            prepared = self.prepared.pop(path, None)
+        if prepared is not None:
+            prepared.discard()
+
+    def release_all(self):
+        with self.lock:
+            prepared = list(self.prepared.values())
+            self.prepared.clear()
+            self.assigned.clear()
+        for p in prepared:
+            p.discard()
+        # Don't leave a warm-up thread inside cv2 at interpreter exit
+        for p in prepared:
+            p.warmed.wait(timeout=2.0)
+
+
+def diff_surfaces(current, surface_data, prepared=None, clock=None):
+    """Build the surface list for a config, reusing live media where the path is unchanged.
+
+    Returns (new_surfaces, new_sources) where new_sources maps freshly
+    attached video ids to their VideoSource. Surfaces keep the media of a
+    current surface with the same media_path (same index preferred), so
+    their sources keep playing without a gap. Sources opened here follow
+    `clock` (default: the show clock).
+    """
+    live = {}
+    for s in current:
+        path = s.get("media_path")
+        if path and s.get("media_type") in ("video", "image"):
+            live.setdefault(path, []).append(s)
+
+    new_surfaces = []
+    new_sources = {}
+    for i, s_data in enumerate(surface_data):
+        surface = {
+            "points": np.array(s_data["points"], dtype=np.float32),
+            "opacity": s_data["opacity"],
+            "name": s_data["name"],
+            "video_id": None,
+            "media_type": None,
+            "media_path": s_data.get("media_path"),
+            "static_frame": None,
+            "sync_group": s_data.get("sync_group"),
+            "mask": s_data.get("mask"),
+            "grid": s_data.get("grid"),
+            "effects": s_data.get("effects"),
+        }
+        path = surface["media_path"]
+        if path:
+            candidates = live.get(path, [])
+            old = None
+            if i < len(current) and any(c is current[i] for c in candidates):
+                old = current[i]
+            elif candidates:
+                old = candidates[0]
+
+            if old is not None:
+                # Identity match: surface dicts hold numpy arrays, so `==`/remove() won't do
+                live[path] = [c for c in candidates if c is not old]
+                surface["video_id"] = old["video_id"]
+                surface["media_type"] = old["media_type"]
+                surface["static_frame"] = old["static_frame"]
+            else:
+                media_type, media = prepared.take_media(path) if prepared else (None, None)
+                if media is None:
+                    media_type, media = open_media(path, clock)
+                if media_type == "video":
+                    video_id = f"video_{i}_{time.time()}"
+                    new_sources[video_id] = media
+                    surface["video_id"] = video_id
+                    surface["media_type"] = "video"
+                elif media_type == "image":
+                    surface["static_frame"] = media
+                    surface["media_type"] = "image"
+        new_surfaces.append(surface)
+    return new_surfaces, new_sources
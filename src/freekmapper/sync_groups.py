@@ -0,0 +1,95 @@
+class SyncGroup:
+    """Shared timeline for surfaces whose clips were authored to line up.
+
+    Members read their target frame from position() instead of their own
+    start time, so they skip (grab) or hold frames to stay on the group clock.
+    The group loops at the length of its longest member.
+    """
+
+    def __init__(self, name, anchor):
+        self.name = name
+        self.anchor = anchor  # Show time of position 0
+        self.length = 0.0  # Seconds, longest member clip
+        self.members = {}  # video_id -> VideoSource
+        self.drift_frames = 0.0  # Spread between the most and least advanced member
+        self.max_lag_frames = 0.0
+
+    def position(self, now):
+        """Seconds into the group's loop at show time `now`."""
+        elapsed = now - self.anchor
+        if self.length <= 0:
+            return max(elapsed, 0.0)
+        return elapsed % self.length
+
+    def measure(self, now):
+        """Update drift stats from the frames members are currently showing."""
+        position = self.position(now)
+        offsets = []
+        for vs in self.members.values():
+            if vs.frame_index <= 0:
+                continue
+            shown = (vs.frame_index - 1) / vs.fps
+            clip_length = vs.frame_count / vs.fps if vs.frame_count > 0 else None
+            if clip_length is not None and position >= clip_length:
+                continue  # Shorter clip holding its last frame until the group wraps
+            offsets.append((shown - position) * vs.fps)
+        if offsets:
+            self.drift_frames = max(offsets) - min(offsets)
+            self.max_lag_frames = max(0.0, -min(offsets))
+        else:
+            self.drift_frames = self.max_lag_frames = 0.0
+
+
+class SyncGroups:
+    """Tracks sync group membership from surface["sync_group"] and assigns timelines."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.groups = {}  # name -> SyncGroup
+
+    def update(self, surfaces, video_sources, now=None):
+        """Re-derive groups from the surfaces (cheap; called once per frame)."""
+        now = self.clock.now() if now is None else now
+        members = {}
+        for surface in surfaces:
+            name = surface.get("sync_group")
+            vid = surface.get("video_id")
+            if name and vid and vid in video_sources:
+                members.setdefault(name, {})[vid] = video_sources[vid]
+
+        for name in list(self.groups):
+            if name not in members:
+                for vs in self.groups[name].members.values():
+                    vs.timeline = None
+                del self.groups[name]
+
+        for name, group_members in members.items():
+            group = self.groups.get(name)
+            if group is None:
+                group = self.groups[name] = SyncGroup(name, now)
+            for vid, vs in group.members.items():
+                if vid not in group_members:
+                    vs.timeline = None
+            group.members = group_members
+            lengths = [vs.frame_count / vs.fps for vs in group_members.values() if vs.frame_count > 0]
+            group.length = max(lengths) if lengths else 0.0
+            for vs in group_members.values():
+                # Clips of unknown length can't be placed on a looping timeline
+                vs.timeline = group if group.length > 0 else None
+            group.measure(now)
+
+    def restart(self, now=None):
+        """Put every group back at position 0 (e.g. when playback is reset)."""
+        now = self.clock.now() if now is None else now
+        for group in self.groups.values():
+            group.anchor = now
+
+    def stats(self):
+        return {
+            name: {
+                "members": len(group.members),
+                "drift_frames": group.drift_frames,
+                "max_lag_frames": group.max_lag_frames,
+            }
+            for name, group in self.groups.items()
+        }
@@ -0,0 +1,207 @@
+import time
+from collections import OrderedDict
+
+import numpy as np
+from OpenGL.GL import *
+
+from .instrumentation import FRAME_STATS
+
+VRAM_BUDGET = 512 * 1024 * 1024  # Bytes per GL context (live + pooled textures)
+IDLE_SECONDS = 2.0  # Textures not drawn for this long go back to the pool
+POOL_SIZE = 8  # Spare textures kept for reuse
+RENDER_FORMAT = (GL_RGB, GL_RGB, GL_UNSIGNED_BYTE, 3)  # Textures drawn on the GPU (generator shaders)
+EFFECT_FORMAT = (GL_RGBA, GL_RGBA, GL_UNSIGNED_BYTE, 4)  # Effect pass outputs (a chroma key adds alpha)
+
+
+def pixel_format(frame):
+    """(internal format, format, type, bytes per pixel) for an RGB uint8 frame or a uint8/uint16 mask."""
+    if frame.ndim == 2:
+        if frame.dtype == np.uint16:
+            return GL_LUMINANCE16, GL_LUMINANCE, GL_UNSIGNED_SHORT, 2
+        return GL_LUMINANCE, GL_LUMINANCE, GL_UNSIGNED_BYTE, 1
+    return GL_RGB, GL_RGB, GL_UNSIGNED_BYTE, 3
+
+
+class TextureEntry:
+    __slots__ = ("tex", "width", "height", "format", "nbytes", "defined", "frame", "last_used")
+
+    def __init__(self, tex, width, height, format):
+        self.tex = tex
+        self.width = width
+        self.height = height
+        self.format = format
+        self.nbytes = width * height * format[3]
+        self.defined = False  # Storage allocated by glTexImage2D (later uploads are sub-image updates)
+        self.frame = None  # Frame object last uploaded (unchanged frames are skipped)
+        self.last_used = 0.0
+
+
+class TextureManager:
+    """GL textures of one context, keyed by source (video id, image path, tile).
+
+    - Frames are uploaded into the key's texture; the same frame object is
+      never uploaded twice, and same-size frames use glTexSubImage2D.
+    - Keys of released sources (release()) or not drawn for IDLE_SECONDS
+      return their texture to a pool; pooled textures of matching size are
+      reused instead of allocating new storage.
+    - Live + pooled bytes are kept under `budget`: the pool is trimmed
+      first, then the least recently drawn textures are deleted.
+
+    All methods must run with the owning context current.
+    """
+
+    def __init__(self, budget=VRAM_BUDGET, idle_seconds=IDLE_SECONDS, pool_size=POOL_SIZE, name="gl"):
+        self.upload_stage = f"upload:{name}"
+        self.budget = budget
+        self.idle_seconds = idle_seconds
+        self.pool_size = pool_size
+        self.entries = OrderedDict()  # key -> TextureEntry, least recently drawn first
+        self.pool = OrderedDict()  # tex -> TextureEntry (storage allocated, no owner)
+        self.pending_release = set()
+        self.bytes = 0
+        self.allocations = 0
+        self.reuses = 0
+        self.evictions = 0
+        self.now = time.perf_counter()
+
+    # --- Frame lifecycle --- #
+    def begin_frame(self):
+        self.now = time.perf_counter()
+        if self.pending_release:
+            for key in self.pending_release:
+                self._to_pool(key)
+            self.pending_release.clear()
+
+    def end_frame(self):
+        idle = [key for key, e in self.entries.items() if self.now - e.last_used > self.idle_seconds]
+        for key in idle:
+            self._to_pool(key)
+        self._enforce_budget()
+
+    def release(self, keys):
+        """Mark keys of released sources; their textures are recycled on the next frame."""
+        self.pending_release.update(keys)
+
+    # --- Textures --- #
+    def touch(self, key):
+        """Texture of a resident key (marks it drawn), or None."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        entry.last_used = self.now
+        self.entries.move_to_end(key)
+        return entry.tex
+
+    def _entry(self, key, w, h, fmt):
+        entry = self.entries.get(key)
+        if entry is not None and (entry.width, entry.height, entry.format) != (w, h, fmt):
+            self._to_pool(key)
+            entry = None
+        if entry is None:
+            entry = self._allocate(w, h, fmt)
+            self.entries[key] = entry
+        entry.last_used = self.now
+        self.entries.move_to_end(key)
+        return entry
+
+    def acquire(self, key, frame):
+        """Texture for `key` holding `frame` (RGB uint8, or a 2D mask), uploading only if the frame changed."""
+        h, w = frame.shape[:2]
+        fmt = pixel_format(frame)
+        entry = self._entry(key, w, h, fmt)
+
+        glBindTexture(GL_TEXTURE_2D, entry.tex)
+        if entry.frame is frame:
+            return entry.tex
+        t0 = time.perf_counter()
+        internal, pixels, gl_type, _ = fmt
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        if not entry.defined:
+            glTexImage2D(GL_TEXTURE_2D, 0, internal, w, h, 0, pixels, gl_type, frame)
+            entry.defined = True
+        else:
+            glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, w, h, pixels, gl_type, frame)
+        entry.frame = frame
+        FRAME_STATS.record(self.upload_stage, time.perf_counter() - t0, nbytes=frame.nbytes)
+        return entry.tex
+
+    def size(self, key):
+        """(width, height) of a resident key's texture, or None."""
+        entry = self.entries.get(key)
+        return (entry.width, entry.height) if entry is not None else None
+
+    def render_target(self, key, width, height, frame, fmt=RENDER_FORMAT):
+        """Texture for `key` that `frame` is drawn into on the GPU; returns (tex, stale).
+
+        stale is False if `frame` was already drawn into it (by another output).
+        """
+        entry = self._entry(key, width, height, fmt)
+        if not entry.defined:
+            internal, pixels, gl_type, _ = fmt
+            glBindTexture(GL_TEXTURE_2D, entry.tex)
+            glTexImage2D(GL_TEXTURE_2D, 0, internal, width, height, 0, pixels, gl_type, None)
+            entry.defined = True
+        stale = entry.frame is not frame
+        entry.frame = frame
+        return entry.tex, stale
+
+    def _allocate(self, w, h, fmt):
+        for tex, pooled in self.pool.items():
+            if (pooled.width, pooled.height, pooled.format) == (w, h, fmt):
+                del self.pool[tex]
+                self.reuses += 1
+                return pooled
+        tex = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, tex)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        # Clamp so tiles don't bleed the opposite edge into their seams
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        entry = TextureEntry(tex, w, h, fmt)
+        self.bytes += entry.nbytes
+        self.allocations += 1
+        return entry
+
+    def _to_pool(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        entry.frame = None  # Don't keep the frame alive
+        self.pool[entry.tex] = entry
+        while len(self.pool) > self.pool_size:
+            _, old = self.pool.popitem(last=False)
+            self._delete(old)
+
+    def _delete(self, entry):
+        glDeleteTextures([entry.tex])
+        self.bytes -= entry.nbytes
+
+    def _enforce_budget(self):
+        while self.bytes > self.budget and self.pool:
+            _, old = self.pool.popitem(last=False)
+            self._delete(old)
+        while self.bytes > self.budget and self.entries:
+            key, entry = next(iter(self.entries.items()))
+            if entry.last_used >= self.now:
+                break  # Everything left was drawn this frame
+            del self.entries[key]
+            self._delete(entry)
+            self.evictions += 1
+
+    def clear(self):
+        for entry in list(self.entries.values()) + list(self.pool.values()):
+            self._delete(entry)
+        self.entries.clear()
+        self.pool.clear()
+
+    def stats(self):
+        return {
+            "textures": len(self.entries),
+            "pooled": len(self.pool),
+            "bytes": self.bytes,
+            "budget": self.budget,
+            "allocations": self.allocations,
+            "reuses": self.reuses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from .cache import cache_dir
+
+TRACE_EVENTS = 200_000  # Ring size (~ a minute of a busy show)
+HITCH_SECONDS = 0.1  # Render loop gaps longer than this dump the ring automatically
+HITCH_COOLDOWN = 10.0  # Seconds between automatic hitch dumps
+
+
+class _Span:
+    __slots__ = ("recorder", "name", "cat", "args", "start")
+
+    def __init__(self, recorder, name, cat, args):
+        self.recorder = recorder
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.complete(self.name, self.start, time.perf_counter(), self.cat, self.args)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class TraceRecorder:
+    """Timestamped spans in a ring buffer, exported as Chrome trace JSON (chrome://tracing, Perfetto).
+
+    Recording appends one tuple to a bounded deque (no locks, no I/O), so
+    it can stay enabled during shows. When disabled, span() returns a shared
+    no-op context manager.
+    """
+
+    def __init__(self, size=TRACE_EVENTS, hitch_seconds=HITCH_SECONDS):
+        self.events = deque(maxlen=size)  # (ph, name, cat, start_s, dur_s, tid, args)
+        self.enabled = bool(os.environ.get("FREEKMAPPER_TRACE"))  # Or toggled from the Performance panel
+        self.hitch_seconds = hitch_seconds
+        self.last_hitch_dump = 0.0
+        self.thread_names = {}  # tid -> thread name
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+
+    def _tid(self):
+        tid = threading.get_ident()
+        if tid not in self.thread_names:
+            self.thread_names[tid] = threading.current_thread().name
+        return tid
+
+    def span(self, name, cat="app", args=None):
+        """Context manager recording a complete ("X") event around its block."""
+        if not self.enabled:
+            return NO_SPAN
+        return _Span(self, name, cat, args)
+
+    def complete(self, name, start, end, cat="app", args=None):
+        """Record a span from perf_counter() timestamps."""
+        if self.enabled:
+            self.events.append(("X", name, cat, start, end - start, self._tid(), args))
+
+    def instant(self, name, cat="app", args=None):
+        if self.enabled:
+            self.events.append(("i", name, cat, time.perf_counter(), 0.0, self._tid(), args))
+
+    def clear(self):
+        self.events.clear()
+
+    def chrome_trace(self):
+        """The ring as a Chrome trace dict (timestamps in µs since the recorder started)."""
+        events = list(self.events)
+        trace = [
+            {"ph": "M", "name": "thread_name", "pid": self.pid, "tid": tid, "args": {"name": name}}
+            for tid, name in list(self.thread_names.items())
+        ]
+        for ph, name, cat, start, dur, tid, args in events:
+            event = {
+                "ph": ph,
+                "name": name,
+                "cat": cat,
+                "ts": (start - self.origin) * 1e6,
+                "pid": self.pid,
+                "tid": tid,
+            }
+            if ph == "X":
+                event["dur"] = dur * 1e6
+            else:
+                event["s"] = "t"
+            if args:
+                event["args"] = args
+            trace.append(event)
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def dump(self, path):
+        """Write the ring to `path` as Chrome trace JSON (tmp file, then replace)."""
+        data = self.chrome_trace()
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+        return len(data["traceEvents"])
+
+    def check_hitch(self, interval, now=None):
+        """Dump the ring in the background if a frame took longer than hitch_seconds.
+
+        Returns the path written to (or None). At most one dump per HITCH_COOLDOWN.
+        """
+        if not self.enabled or interval < self.hitch_seconds:
+            return None
+        now = time.perf_counter() if now is None else now
+        self.instant("hitch", "render", {"interval_ms": interval * 1000.0})
+        if now - self.last_hitch_dump < HITCH_COOLDOWN:
+            return None
+        self.last_hitch_dump = now
+        path = os.path.join(cache_dir("traces"), time.strftime("hitch-%Y%m%d-%H%M%S.json"))
+        threading.Thread(target=self._dump_hitch, args=(path, interval), daemon=True).start()
+        return path
+
+    def _dump_hitch(self, path, interval):
+        try:
+            count = self.dump(path)
+            print(f"Hitch of {interval * 1000.0:.0f} ms: {count} trace events saved to {path}")
+        except OSError as e:
+            print(f"Could not save hitch trace: {e}")
+
+
+# Shared by the render loop, decode thread, sequencer and config loading
+TRACE = TraceRecorder()
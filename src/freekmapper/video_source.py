@@ -1,65 +1,250 @@
 import cv2
+import numpy as np
+import os
 import threading
 import time
 
+from .image_sequence import ImageSequenceSource
+from .instrumentation import FRAME_STATS, source_name
+from .keyframe_index import SEEK_STATS
+from .live_sources import open_live_source
+from .media_probe import MEDIA_PROBE, is_live_path, is_network_path, is_shader_path
+from .network_source import NetworkSource
+from .shader_source import ShaderSource
+from .show_clock import SHOW_CLOCK
+
+DECODER_FRAMES = 8  # YUV 4:2:0 frames an FFmpeg decoder keeps (references + output), for estimates
+
 class VideoSource:
-    def __init__(self, filepath: str, max_size: int = 1280, loop: bool = True):
+    def __init__(self, filepath: str, max_size: int = 1280, loop: bool = True, playing: bool = True, clock=None, meta=None):
         self.filepath = filepath
         self.cap = cv2.VideoCapture(filepath)
         self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
         self.current_frame = None  # RGB frame
-        self.playing = True
+        self.playing = playing
         self.loop = loop
         self.finished = False
         self.lock = threading.Lock()
         self.max_size = max_size
 
+        # Timing info: the playback position is derived from the show clock
+        self.clock = clock or SHOW_CLOCK
+        # Probed metadata (if already cached) sizes the resize buffer up front
+        meta = meta if meta is not None else MEDIA_PROBE.get(filepath)
+        if meta and meta.get("fps"):
+            self.fps = meta["fps"]
+            self.frame_count = meta.get("frame_count") or 0
+        else:
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+            self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        if meta and meta.get("width"):
+            self.width, self.height = meta["width"], meta["height"]
+        else:
+            self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 0)
+            self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0)
+        self.resize_buffer = None  # Reused cv2.resize destination (never handed out)
+        if meta and meta.get("width") and max(meta["width"], meta["height"]) > max_size:
+            self.resize_buffer = np.empty(self._output_shape(meta["width"], meta["height"]), dtype=np.uint8)
+        self.frame_index = 0  # Frames decoded since the last rewind
+        self.start_time = self.clock.now()  # Show time at which frame 0 is due
+        self.dropped_frames = 0  # Frames skipped (grabbed, not converted) to catch up
+        self.timeline = None  # SyncGroup this (looping) source follows, if any
+        self.suspended = False  # Decoder and frames freed by the memory manager; reopened on use
+        name = source_name(filepath)
+        self.stat_names = (f"lock_wait:{name}", f"decode:{name}", f"convert:{name}", f"dropped:{name}")
+
+    def _output_shape(self, w, h):
+        scale = self.max_size / max(w, h)
+        return int(h * scale), int(w * scale), 3
+
     def _resize_frame(self, frame):
         h, w = frame.shape[:2]
         if w <= self.max_size and h <= self.max_size:
             return frame
-        scale = self.max_size / max(w, h)
-        new_w, new_h = int(w * scale), int(h * scale)
-        return cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        shape = self._output_shape(w, h)
+        if self.resize_buffer is None or self.resize_buffer.shape != shape:
+            self.resize_buffer = np.empty(shape, dtype=np.uint8)
+        # The RGB conversion after this allocates the shared frame, so the buffer can be reused
+        return cv2.resize(frame, (shape[1], shape[0]), dst=self.resize_buffer, interpolation=cv2.INTER_LINEAR)
+
+    def _synced(self):
+        return self.timeline is not None and self.loop
+
+    def _target_frames(self, now):
+        """Number of frames that should have been decoded at show time `now`."""
+        if self._synced():
+            return int(self.timeline.position(now) * self.fps) + 1
+        return int((now - self.start_time) * self.fps) + 1
 
-    def read_frame(self):
-        """Decode next frame; called from background thread."""
+    def _rewind(self):
+        # Loop video: the next pass starts where this one actually ended
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        self.start_time += self.frame_index / self.fps
+        self.frame_index = 0
+
+    def read_frame(self, now=None):
+        """Decode up to the frame due at `now`; called from background thread.
+
+        Late frames are skipped with grab() (no conversion), early calls hold
+        the current frame.
+        """
+        lock_stage, decode_stage, convert_stage, dropped_counter = self.stat_names
+        t0 = time.perf_counter()
         with self.lock:
+            FRAME_STATS.record(lock_stage, time.perf_counter() - t0)
             if not (self.cap and self.cap.isOpened()):
                 return self.current_frame
-            
+
             if not self.playing or self.finished:
                 return self.current_frame
 
+            now = self.clock.now() if now is None else now
+            target = self._target_frames(now)
+            synced = self._synced()
+            if synced and target < self.frame_index - 1:
+                # Group timeline wrapped: start the next pass together with the other members
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                self.frame_index = 0
+            elif synced and target - self.frame_index > self.fps * 2:
+                # Joining a group far from its position: seek once, frame skipping keeps it aligned after
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, target - 1)
+                self.frame_index = target - 1
+            elif target - self.frame_index > self.fps * 2:
+                # Way behind (e.g. system stall): re-anchor instead of grabbing seconds of video
+                self.start_time = now - self.frame_index / self.fps
+                target = self.frame_index + 1
+
+            rewound = False
+            while self.frame_index < target:
+                t0 = time.perf_counter()
+                if self.frame_index < target - 1:
+                    ret, frame = self.cap.grab(), None
+                else:
+                    ret, frame = self.cap.read()
+                FRAME_STATS.record(decode_stage, time.perf_counter() - t0, flagged=frame is None)
+
+                if not ret:
+                    if synced:
+                        break  # Hold the last frame until the group wraps
+                    if self.loop and not rewound:
+                        self._rewind()
+                        # Read the first frame immediately to avoid a black flash or stall
+                        rewound = True
+                        target = self._target_frames(now)
+                        continue
+                    if not self.loop:
+                        self.finished = True
+                        self.playing = False
+                    break
+
+                self.frame_index += 1
+                if frame is None:
+                    self.dropped_frames += 1
+                    FRAME_STATS.count(dropped_counter)
+                else:
+                    t0 = time.perf_counter()
+                    frame = self._resize_frame(frame)
+                    self.current_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                    FRAME_STATS.record(convert_stage, time.perf_counter() - t0)
+
+        return self.current_frame
+
+    def seek(self, seconds, index=None, start_time=None):
+        """Show the frame at `seconds` into the clip, anchored at show time `start_time`.
+
+        If the target is ahead of the current position within the same GOP
+        (known from the KeyframeIndex) it is reached by grabbing forward
+        without any seek. Otherwise CAP_PROP_POS_FRAMES is used, which
+        decodes from the keyframe before the target, so the cost is bounded
+        by the GOP length either way.
+        """
+        t0 = time.perf_counter()
+        with self.lock:
+            self._resume()
+            if not (self.cap and self.cap.isOpened()):
+                return self.current_frame
+            if index is not None:
+                target = index.frame_for_time(seconds)
+            else:
+                target = max(int(round(seconds * self.fps)), 0)
+                if self.frame_count > 0:
+                    target = min(target, self.frame_count - 1)
+
+            if index is not None and index.has_keyframes():
+                forward_from = index.keyframe_before(target)
+            else:
+                forward_from = target - self.fps  # No GOP info: grab up to a second forward
+            if not (forward_from <= self.frame_index <= target):
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                self.frame_index = target
+
+            while self.frame_index < target and self.cap.grab():
+                self.frame_index += 1
             ret, frame = self.cap.read()
             if ret:
                 frame = self._resize_frame(frame)
                 self.current_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            else:
-                if self.loop:
-                    # Loop video
-                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                    # Read the first frame immediately to avoid a black flash or stall
-                    ret, frame = self.cap.read()
-                    if ret:
-                        frame = self._resize_frame(frame)
-                        self.current_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                else:
-                    self.finished = True
-                    self.playing = False
-                    
-        return self.current_frame
+                self.frame_index += 1
+            self.finished = False
+            now = self.clock.now() if start_time is None else start_time
+            self.start_time = now - max(self.frame_index - 1, 0) / self.fps
+            frame = self.current_frame
+
+        SEEK_STATS.record((time.perf_counter() - t0) * 1000.0, index is not None and index.has_keyframes())
+        return frame
+
+    def next_due(self):
+        """Show time when the next frame is due, or None if not advancing."""
+        if not self.playing or self.finished:
+            return None
+        if self._synced():
+            return None  # Follows the group clock; the reader's frame period bounds the wait
+        return self.start_time + self.frame_index / self.fps
+
+    def prime(self):
+        """Decode the first frame without starting playback (pre-buffering)."""
+        with self.lock:
+            self._resume()
+            if not (self.cap and self.cap.isOpened()) or self.frame_index > 0:
+                return self.current_frame
+            ret, frame = self.cap.read()
+            if ret:
+                frame = self._resize_frame(frame)
+                self.current_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                self.frame_index = 1
+            return self.current_frame
+
+    def end_time(self):
+        """Show time at which the clip ends, or None if the length is unknown."""
+        if self.frame_count <= 0:
+            return None
+        return self.start_time + self.frame_count / self.fps
+
+    def remaining_time(self, now=None):
+        """Seconds left until the clip ends, or None if the length is unknown."""
+        end = self.end_time()
+        if end is None:
+            return None
+        now = self.clock.now() if now is None else now
+        return max(end - now, 0.0)
 
     def get_current_frame(self):
         with self.lock:
             return self.current_frame
 
-    def play(self):
+    def play(self, start_time=None):
+        """Start or resume playback; `start_time` anchors the current position to an exact show time."""
         with self.lock:
-            self.playing = True
+            self._resume()
+            now = self.clock.now() if start_time is None else start_time
             if self.finished:
                 self.finished = False
                 self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                self.frame_index = 0
+            if not self.playing or start_time is not None:
+                # Resume from the displayed frame (frame_index - 1)
+                self.start_time = now - max(self.frame_index - 1, 0) / self.fps
+            self.playing = True
 
     def pause(self):
         with self.lock:
@@ -69,15 +254,64 @@ class VideoSource:
         with self.lock:
             self.playing = False
             self.finished = False
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            if self.cap:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.frame_index = 0
             # Optionally clear current frame or keep last one? Keeping last one is usually better for UI.
 
     def is_finished(self):
         with self.lock:
             return self.finished
 
+    def suspend(self):
+        """Free the decoder and frames of an idle source; the next play/seek/prime reopens it at the start."""
+        with self.lock:
+            if self.cap is None:
+                return
+            self.cap.release()
+            self.cap = None
+            self.current_frame = None
+            self.resize_buffer = None
+            self.playing = False
+            self.finished = False
+            self.frame_index = 0
+            self.suspended = True
+
+    def _resume(self):
+        if self.suspended:
+            self.suspended = False
+            self.cap = cv2.VideoCapture(self.filepath)
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    def memory_usage(self):
+        """Bytes held by this source: estimated decoder state and frames."""
+        with self.lock:
+            decoder = 0
+            if self.cap is not None:
+                decoder = self.width * self.height * 3 // 2 * DECODER_FRAMES
+            frames = 0
+            for frame in (self.current_frame, self.resize_buffer):
+                if frame is not None:
+                    frames += frame.nbytes
+            return {"decoder": decoder, "frames": frames, "open": self.cap is not None}
+
     def release(self):
         with self.lock:
+            self.suspended = False
             if self.cap:
                 self.cap.release()
                 self.cap = None
+
+
+def open_source(path, **kwargs):
+    """VideoSource for a movie file, ImageSequenceSource for a folder of frames, ShaderSource for a
+    .frag/.glsl file, a live source for URLs, camera: and shm:."""
+    if is_shader_path(path):
+        return ShaderSource(path, **kwargs)
+    if is_network_path(path):
+        return NetworkSource(path, **kwargs)
+    if is_live_path(path):
+        return open_live_source(path, **kwargs)
+    if os.path.isdir(path):
+        return ImageSequenceSource(path, **kwargs)
+    return VideoSource(path, **kwargs)
@@ -0,0 +1,165 @@
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+UNIT_SQUARE = np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype=np.float32)
+MESH_SUBDIVISIONS = 8  # Rendered mesh cells per control grid cell (per axis)
+WARP_CACHE_ENTRIES = 1024
+
+
+# --------- GEOMETRY --------- #
+def grid_shape(surface):
+    """(cols, rows) of a grid-mesh surface, or None for a plain quad."""
+    grid = surface.get("grid")
+    return (int(grid[0]), int(grid[1])) if grid else None
+
+
+def corner_indices(surface):
+    """Indices into surface["points"] of the top-left, top-right, bottom-right, bottom-left corners."""
+    shape = grid_shape(surface)
+    if shape is None:
+        return [0, 1, 2, 3]
+    cols, rows = shape
+    last = (rows + 1) * (cols + 1) - 1
+    return [0, cols, last, last - cols]
+
+
+def corner_points(surface):
+    return np.asarray(surface["points"], dtype=np.float32)[corner_indices(surface)]
+
+
+def quad_homography(pts):
+    """3x3 homography taking surface UV (0..1, v down) to canvas points of a quad."""
+    return cv2.getPerspectiveTransform(UNIT_SQUARE, np.asarray(pts, dtype=np.float32)[:4])
+
+
+def project(h, u, v):
+    x, y, w = h @ (u, v, 1.0)
+    return np.array((x / w, y / w), dtype=np.float32)
+
+
+def grid_from_quad(pts, cols, rows):
+    """Control points ((rows + 1) * (cols + 1), 2), row-major, placed on the quad's homography."""
+    u, v = np.meshgrid(np.linspace(0.0, 1.0, cols + 1), np.linspace(0.0, 1.0, rows + 1))
+    uv = np.stack([u.ravel(), v.ravel()], axis=1).astype(np.float32)
+    return cv2.perspectiveTransform(uv[None], quad_homography(pts))[0]
+
+
+def rotate_points(surface, clockwise=True):
+    """Points with the media turned a quarter (the quad's corner order rolled, or the grid rotated)."""
+    pts = np.asarray(surface["points"], dtype=np.float32)
+    shape = grid_shape(surface)
+    if shape is None:
+        return np.roll(pts, 1 if clockwise else -1, axis=0), None
+    cols, rows = shape
+    grid = pts.reshape(rows + 1, cols + 1, 2)
+    # Clockwise: the old bottom-left control point becomes the top-left
+    grid = np.rot90(grid, -1 if clockwise else 1)
+    return np.ascontiguousarray(grid).reshape(-1, 2), [rows, cols]
+
+
+def catmull_rom_weights(n_ctrl, subdivisions):
+    """(n_out, n_ctrl) weights sampling a Catmull-Rom curve through n_ctrl points.
+
+    End tangents come from mirrored points (P-1 = 2 P0 - P1), so a 2-point
+    curve is a straight line.
+    """
+    n_seg = n_ctrl - 1
+    t = np.linspace(0.0, n_seg, n_seg * subdivisions + 1)
+    seg = np.minimum(t.astype(int), n_seg - 1)
+    f = t - seg
+    basis = 0.5 * np.stack([
+        -f ** 3 + 2 * f ** 2 - f,
+        3 * f ** 3 - 5 * f ** 2 + 2,
+        -3 * f ** 3 + 4 * f ** 2 + f,
+        f ** 3 - f ** 2,
+    ], axis=1)
+    weights = np.zeros((len(t), n_ctrl))
+    for k in range(4):
+        idx = seg - 1 + k
+        b = basis[:, k]
+        low = idx < 0
+        high = idx > n_seg
+        inside = ~(low | high)
+        np.add.at(weights, (np.nonzero(inside)[0], idx[inside]), b[inside])
+        # Mirrored end points
+        rows = np.nonzero(low)[0]
+        np.add.at(weights, (rows, 0), 2 * b[low])
+        np.add.at(weights, (rows, 1), -b[low])
+        rows = np.nonzero(high)[0]
+        np.add.at(weights, (rows, n_seg), 2 * b[high])
+        np.add.at(weights, (rows, n_seg - 1), -b[high])
+    return weights
+
+
+def tessellate_grid(pts, cols, rows, canvas_height, subdivisions=MESH_SUBDIVISIONS):
+    """Smooth mesh through a control grid: (vertices (n, 4) float32 of GL x, y, u, v; indices uint32)."""
+    grid = np.asarray(pts, dtype=np.float64).reshape(rows + 1, cols + 1, 2)
+    wr = catmull_rom_weights(rows + 1, subdivisions)
+    wc = catmull_rom_weights(cols + 1, subdivisions)
+    xy = np.matmul(wc, np.tensordot(wr, grid, axes=1))  # Separable: rows, then columns
+    n_r, n_c = xy.shape[:2]
+    u, v = np.meshgrid(np.linspace(0.0, 1.0, n_c), np.linspace(0.0, 1.0, n_r))
+    vertices = np.empty((n_r, n_c, 4), dtype=np.float32)
+    vertices[..., 0] = xy[..., 0]
+    vertices[..., 1] = canvas_height - xy[..., 1]  # Top-left canvas -> GL Y
+    vertices[..., 2] = u
+    vertices[..., 3] = v
+
+    cell = (np.arange(n_r - 1)[:, None] * n_c + np.arange(n_c - 1)[None, :]).ravel()
+    indices = np.stack([cell, cell + 1, cell + n_c + 1, cell, cell + n_c + 1, cell + n_c], axis=1)
+    return vertices.reshape(-1, 4), indices.astype(np.uint32).ravel()
+
+
+class WarpCache:
+    """Homographies and tessellated meshes per surface, recomputed only when its points change.
+
+    Lookups compare the raw bytes of the points (32 bytes for a quad), so
+    in-place corner drags are picked up without per-frame math.
+    """
+
+    def __init__(self, size=WARP_CACHE_ENTRIES):
+        self.size = size
+        self.entries = OrderedDict()  # (kind, id(points)) -> (points bytes, extra, result, points)
+        self.lock = threading.Lock()
+
+    def _get(self, kind, pts, extra, build):
+        pts = np.asarray(pts)
+        key = (kind, id(pts))
+        raw = pts.tobytes()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == raw and entry[1] == extra:
+                self.entries.move_to_end(key)
+                return entry[2]
+        result = build()
+        with self.lock:
+            self.entries[key] = (raw, extra, result, pts)  # Holding `pts` keeps its id unique
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return result
+
+    def quad(self, pts, canvas_height):
+        """(forward, inverse): UV -> canvas homography and GL canvas position -> UV (for the shader).
+
+        None for a degenerate quad.
+        """
+        def build():
+            forward = quad_homography(pts)
+            flip = np.array([[1, 0, 0], [0, -1, canvas_height], [0, 0, 1]], dtype=np.float64)
+            try:
+                inverse = np.linalg.inv(forward) @ flip
+            except np.linalg.LinAlgError:
+                return None  # Degenerate quad (collinear corners): drawn with plain texcoords
+            return forward, (inverse / np.abs(inverse).max()).astype(np.float32)
+        return self._get("quad", pts, canvas_height, build)
+
+    def mesh(self, pts, grid, canvas_height):
+        cols, rows = grid
+        return self._get("mesh", pts, (cols, rows, canvas_height), lambda: tessellate_grid(pts, cols, rows, canvas_height))
+
+
+# Shared by every renderer (GL buffers are per context, see renderers.MeshBuffers)
+WARPS = WarpCache()